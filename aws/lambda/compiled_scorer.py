@@ -0,0 +1,202 @@
+"""
+Ruta de scoring compilada (sin pandas) para el Pipeline entrenado.
+
+El Pipeline de ejecutar-evaluacion-algoritmos.py es:
+    ColumnTransformer(StandardScaler -> num_cols, OneHotEncoder -> cat_cols) + clf
+
+Para un solo evento, construir un DataFrame y pasar por los chequeos del
+ColumnTransformer cuesta más que la predicción misma. Este módulo extrae una
+única vez, al cargar el modelo, los parámetros ajustados:
+- medias y escalas del StandardScaler,
+- vocabularios de categorías del OneHotEncoder,
+- el estimador final,
+y con ellos escribe el evento (dict) directamente en una fila NumPy
+preasignada.
+
+Tolerancia: las probabilidades coinciden con Pipeline.predict_proba con un
+error absoluto <= PROBA_TOLERANCE. Para árboles (Random Forest / XGBoost) se
+invoca el mismo estimador sobre la misma matriz, así que el resultado es
+idéntico; para Regresión Logística se evalúa la sigmoide directamente y la
+diferencia es solo de redondeo en float64.
+"""
+
+import copy
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Error absoluto máximo admitido frente a Pipeline.predict_proba
+PROBA_TOLERANCE = 1e-6
+
+
+class CompiledScorer:
+    """
+    Scorer de un evento a la vez, construido a partir de un Pipeline ajustado.
+
+    La fila de entrada se reutiliza entre llamadas (no es thread-safe, igual
+    que el resto del handler, que atiende un evento por invocación).
+    """
+
+    def __init__(
+        self,
+        num_cols: List[str],
+        mean: np.ndarray,
+        scale: np.ndarray,
+        cat_cols: List[str],
+        cat_offsets: List[Dict[Any, int]],
+        n_features: int,
+        estimator: Any,
+        sparse_output: bool,
+    ):
+        self.num_cols = num_cols
+        self.mean = mean
+        self.scale = scale
+        self.cat_cols = cat_cols
+        self.cat_offsets = cat_offsets
+        self.n_features = n_features
+        self.estimator = estimator
+        self.sparse_output = sparse_output
+
+        self._n_num = len(num_cols)
+        self._row = np.zeros((1, n_features), dtype=np.float64)
+
+        classes = list(estimator.classes_)
+        self._pos_idx = classes.index(1) if 1 in classes else len(classes) - 1
+
+        # Regresión logística binaria: se evalúa sin pasar por sklearn
+        coef = getattr(estimator, 'coef_', None)
+        if coef is not None and coef.shape[0] == 1 and self._pos_idx == 1:
+            self._coef = np.ascontiguousarray(coef[0], dtype=np.float64)
+            self._intercept = float(estimator.intercept_[0])
+        else:
+            self._coef = None
+            self._intercept = 0.0
+
+    def transform_event(self, event: Dict[str, Any]) -> np.ndarray:
+        """Escribe el evento en la fila preasignada y la devuelve (forma (1, n))."""
+        row = self._row
+        row.fill(0.0)
+
+        values = row[0]
+        for j, col in enumerate(self.num_cols):
+            values[j] = float(event[col])
+        values[:self._n_num] -= self.mean
+        values[:self._n_num] /= self.scale
+
+        # handle_unknown="ignore": una categoría desconocida deja su bloque en cero
+        for col, offsets in zip(self.cat_cols, self.cat_offsets):
+            pos = offsets.get(event[col])
+            if pos is not None:
+                values[pos] = 1.0
+
+        return row
+
+    def predict_proba_event(self, event: Dict[str, Any]) -> float:
+        """Probabilidad de la clase 1 (éxito) para un evento."""
+        return self.predict_proba_row(self.transform_event(event))
+
+    def predict_proba_row(self, row: np.ndarray) -> float:
+        """Probabilidad de la clase 1 para una fila ya transformada (forma (1, n))."""
+        if self._coef is not None:
+            z = float(row[0] @ self._coef) + self._intercept
+            return float(1.0 / (1.0 + np.exp(-z)))
+
+        X = row
+        if self.sparse_output:
+            from scipy import sparse
+            X = sparse.csr_matrix(row)
+        return float(self.estimator.predict_proba(X)[0, self._pos_idx])
+
+
+def _extract_layout(pre: Any) -> Optional[Tuple[List[str], np.ndarray, np.ndarray, List[str], List[Dict[Any, int]], int]]:
+    """
+    Recorre los transformers ajustados del ColumnTransformer y devuelve
+    (num_cols, mean, scale, cat_cols, cat_offsets, n_features), o None si la
+    estructura no es la que genera construir_preprocesador.
+    """
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    blocks = [(name, trans, cols) for name, trans, cols in pre.transformers_
+              if not (isinstance(trans, str) and trans == 'drop')]
+    if len(blocks) != 2:
+        return None
+
+    (_, scaler, num_cols), (_, encoder, cat_cols) = blocks
+    if not isinstance(scaler, StandardScaler) or not isinstance(encoder, OneHotEncoder):
+        return None
+    if encoder.drop is not None or getattr(encoder, 'infrequent_categories_', None):
+        return None
+    if encoder.handle_unknown != 'ignore':
+        return None
+
+    n_num = len(num_cols)
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_num)
+
+    cat_offsets = []
+    offset = n_num
+    for categories in encoder.categories_:
+        cat_offsets.append({cat: offset + k for k, cat in enumerate(categories)})
+        offset += len(categories)
+
+    return (
+        list(num_cols), np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64),
+        list(cat_cols), cat_offsets, offset,
+    )
+
+
+def _probe_event(scorer: CompiledScorer) -> Dict[str, Any]:
+    """Evento sintético con valores conocidos por el modelo, para el autochequeo."""
+    event = {col: float(m + s) for col, m, s in zip(scorer.num_cols, scorer.mean, scorer.scale)}
+    for col, offsets in zip(scorer.cat_cols, scorer.cat_offsets):
+        event[col] = next(iter(offsets)) if offsets else ''
+    return event
+
+
+def compile_pipeline(model: Any) -> Optional[CompiledScorer]:
+    """
+    Compila un Pipeline ajustado (preprocess + clf) en un CompiledScorer.
+
+    Retorna None si el modelo no tiene la estructura esperada o si el
+    autochequeo contra Pipeline.predict_proba supera PROBA_TOLERANCE; en ese
+    caso el handler sigue usando la ruta con DataFrame.
+    """
+    steps = getattr(model, 'steps', None)
+    if not steps or len(steps) != 2:
+        return None
+
+    pre, estimator = steps[0][1], steps[1][1]
+    if not hasattr(pre, 'transformers_') or not hasattr(estimator, 'predict_proba'):
+        return None
+
+    layout = _extract_layout(pre)
+    if layout is None:
+        return None
+
+    # Con una sola fila, repartir los árboles entre hilos (n_jobs=-1) cuesta más
+    # que evaluarlos; la copia superficial comparte los árboles ya ajustados.
+    if getattr(estimator, 'n_jobs', None) not in (None, 1) and hasattr(estimator, 'estimators_'):
+        estimator = copy.copy(estimator)
+        estimator.n_jobs = 1
+
+    num_cols, mean, scale, cat_cols, cat_offsets, n_features = layout
+    scorer = CompiledScorer(
+        num_cols, mean, scale, cat_cols, cat_offsets, n_features,
+        estimator, bool(getattr(pre, 'sparse_output_', False)),
+    )
+
+    # Autochequeo: la ruta compilada debe reproducir al Pipeline
+    import pandas as pd
+    probe = _probe_event(scorer)
+    expected = float(model.predict_proba(pd.DataFrame([probe], columns=num_cols + cat_cols))[0, scorer._pos_idx])
+    got = scorer.predict_proba_event(probe)
+    if abs(expected - got) > PROBA_TOLERANCE:
+        logger.warning(
+            f"Ruta compilada descartada: |{got:.8f} - {expected:.8f}| > {PROBA_TOLERANCE}"
+        )
+        return None
+
+    return scorer
@@ -0,0 +1,279 @@
+"""
+Validación de eventos dirigida por un esquema.
+
+El esquema (EventSchema) se arma una vez: campos numéricos con su rango y si
+deben ser enteros, y campos categóricos con su vocabulario opcional (las
+categorías que conoce el OneHotEncoder del modelo cargado). Al construirlo
+los chequeos se compilan a tuplas planas, así que validar no recorre listas
+de reglas ni usa try/except en el caso común.
+
+- validate(event): un solo recorrido por los campos; acepta numéricos como
+  texto ("150") y verifica rango y vocabulario. Mismo contrato que
+  validate_event: (es_válido, mensaje).
+- validate_batch(events): la misma validación por columnas con NumPy para un
+  batch completo. Retorna la máscara de filas válidas, una máscara de error
+  por campo y el mensaje (el mismo que daría validate) de cada fila inválida.
+  Con menos de ROW_WISE_MAX eventos el costo fijo de NumPy no se paga y se
+  valida fila por fila, con el mismo resultado.
+"""
+
+import math
+import sys
+from itertools import repeat
+from operator import itemgetter
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+_MISSING = object()
+_NUMBER_TYPES = (int, float)
+_FLOAT_MAX = sys.float_info.max
+
+# Por debajo de este tamaño validar fila por fila es más barato que por columnas
+ROW_WISE_MAX = 32
+
+
+class NumericField(NamedTuple):
+    name: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    integer: bool = False
+
+
+class CategoricalField(NamedTuple):
+    name: str
+    vocabulary: Optional[FrozenSet[str]] = None
+
+
+class BatchValidation(NamedTuple):
+    """Resultado de validate_batch; las máscaras tienen forma (n_eventos,)."""
+    valid: np.ndarray
+    field_errors: Dict[str, np.ndarray]
+    messages: List[Optional[str]]
+
+
+class EventSchema:
+    """Campos requeridos del evento, en el orden en que se validan."""
+
+    def __init__(self, numeric: List[NumericField], categorical: List[CategoricalField]):
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.fields = [f.name for f in self.numeric] + [f.name for f in self.categorical]
+
+        # Chequeos compilados: sin límite se usa ±float max, lo que además
+        # descarta inf (NaN falla cualquier comparación)
+        self._bounds = tuple(
+            (-_FLOAT_MAX if f.minimum is None else float(f.minimum),
+             _FLOAT_MAX if f.maximum is None else float(f.maximum), f.integer)
+            for f in self.numeric
+        )
+        self._vocabularies = tuple(f.vocabulary for f in self.categorical)
+        self._get_numeric = _tuple_getter([f.name for f in self.numeric])
+        self._get_categorical = _tuple_getter([f.name for f in self.categorical])
+        self._minimum = np.array([b[0] for b in self._bounds])
+        self._maximum = np.array([b[1] for b in self._bounds])
+        self._integer = np.array([b[2] for b in self._bounds], dtype=bool)
+
+    def with_vocabularies(self, vocabularies: Dict[str, FrozenSet[str]]) -> 'EventSchema':
+        """Copia del esquema con el vocabulario de los campos indicados."""
+        categorical = [
+            f._replace(vocabulary=vocabularies[f.name]) if f.name in vocabularies else f
+            for f in self.categorical
+        ]
+        return EventSchema(self.numeric, categorical)
+
+    # ------------------------------
+    # Un evento
+    # ------------------------------
+
+    def validate(self, event: Any) -> Tuple[bool, str]:
+        # Camino rápido: dict completo con int/float y strings válidos. Ante
+        # cualquier duda (texto numérico, faltantes, otro tipo) se delega en
+        # first_error, que arma el mensaje del primer campo inválido.
+        try:
+            numbers = self._get_numeric(event)
+            strings = self._get_categorical(event)
+        except (KeyError, TypeError):
+            return self._result(event)
+
+        for value, (minimum, maximum, integer) in zip(numbers, self._bounds):
+            value_type = type(value)
+            if value_type is float:
+                if not minimum <= value <= maximum or (integer and not value.is_integer()):
+                    return self._result(event)
+            elif value_type is not int or not minimum <= value <= maximum:
+                return self._result(event)
+
+        for value, vocabulary in zip(strings, self._vocabularies):
+            if type(value) is not str or (vocabulary is not None and value not in vocabulary):
+                return self._result(event)
+
+        return True, ""
+
+    def _result(self, event: Any) -> Tuple[bool, str]:
+        error = self.first_error(event)
+        return (False, error) if error else (True, "")
+
+    def first_error(self, event: Any) -> Optional[str]:
+        """Mensaje del primer campo inválido del evento (en el orden del esquema), o None."""
+        for _, message in self._field_errors(event):
+            return message
+        return None
+
+    def _field_errors(self, event: Any) -> Iterator[Tuple[Optional[str], str]]:
+        """(campo, mensaje) de cada campo inválido, en el orden del esquema."""
+        if not isinstance(event, dict):
+            yield None, f"El evento debe ser un objeto JSON, recibido: {type(event)}"
+            return
+
+        for spec in self.numeric:
+            value = event.get(spec.name, _MISSING)
+            if value is _MISSING:
+                yield spec.name, f"Campo requerido faltante: {spec.name}"
+                continue
+            try:
+                value = float(value)
+            except OverflowError:  # entero JSON que no entra en un float
+                yield spec.name, f"Campo '{spec.name}' debe ser un número finito, recibido: entero fuera de rango"
+                continue
+            except (ValueError, TypeError):
+                yield spec.name, f"Campo '{spec.name}' debe ser numérico, recibido: {value}"
+                continue
+            error = _range_error(spec, value)
+            if error:
+                yield spec.name, error
+
+        for spec in self.categorical:
+            value = event.get(spec.name, _MISSING)
+            if value is _MISSING:
+                yield spec.name, f"Campo requerido faltante: {spec.name}"
+            elif not isinstance(value, str):
+                yield spec.name, f"Campo '{spec.name}' debe ser string, recibido: {type(value)}"
+            elif spec.vocabulary is not None and value not in spec.vocabulary:
+                yield spec.name, (
+                    f"Campo '{spec.name}' con valor desconocido para el modelo: {value!r} "
+                    f"(válidos: {', '.join(sorted(spec.vocabulary))})"
+                )
+
+    # ------------------------------
+    # Batch por columnas
+    # ------------------------------
+
+    def validate_batch(self, events: List[Any]) -> BatchValidation:
+        n = len(events)
+        if n < ROW_WISE_MAX:
+            return self._validate_rows(events)
+
+        is_dict = np.fromiter(map(isinstance, events, repeat(dict, n)), dtype=bool, count=n)
+        rows = events if is_dict.all() else [e if isinstance(e, dict) else {} for e in events]
+
+        numeric = np.empty((n, len(self.numeric)))
+        bad_type = np.zeros(numeric.shape, dtype=bool)
+        for j, spec in enumerate(self.numeric):
+            try:
+                # Caso común: la columna completa se convierte en C sin bucle en Python
+                numeric[:, j] = np.fromiter(map(itemgetter(spec.name), rows), dtype=np.float64, count=n)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                numeric[:, j], bad_type[:, j] = _numeric_column([row.get(spec.name, _MISSING) for row in rows])
+
+        # NaN no pasa ninguna comparación: faltantes e inválidos quedan marcados
+        numeric_errors = ~((numeric >= self._minimum) & (numeric <= self._maximum))
+        numeric_errors |= self._integer & (numeric != np.floor(numeric))
+        numeric_errors |= bad_type
+        numeric_errors &= is_dict[:, None]
+
+        field_errors: Dict[str, np.ndarray] = {
+            spec.name: numeric_errors[:, j] for j, spec in enumerate(self.numeric)
+        }
+        for spec in self.categorical:
+            field_errors[spec.name] = _categorical_column_errors(rows, spec) & is_dict
+
+        valid = is_dict & ~numeric_errors.any(axis=1)
+        for spec in self.categorical:
+            valid &= ~field_errors[spec.name]
+
+        messages: List[Optional[str]] = [None] * n
+        for i in np.flatnonzero(~valid):
+            messages[i] = self.first_error(events[i])
+        return BatchValidation(valid, field_errors, messages)
+
+    def _validate_rows(self, events: List[Any]) -> BatchValidation:
+        n = len(events)
+        valid = np.ones(n, dtype=bool)
+        field_errors = {name: np.zeros(n, dtype=bool) for name in self.fields}
+        messages: List[Optional[str]] = [None] * n
+        for i, event in enumerate(events):
+            if self.validate(event)[0]:
+                continue
+            valid[i] = False
+            for name, message in self._field_errors(event):
+                if messages[i] is None:
+                    messages[i] = message
+                if name is not None:
+                    field_errors[name][i] = True
+        return BatchValidation(valid, field_errors, messages)
+
+
+# ============================================
+# Chequeos por campo
+# ============================================
+
+def _range_error(spec: NumericField, value: float) -> Optional[str]:
+    if not math.isfinite(value):
+        return f"Campo '{spec.name}' debe ser un número finito, recibido: {value}"
+    minimum = -math.inf if spec.minimum is None else spec.minimum
+    maximum = math.inf if spec.maximum is None else spec.maximum
+    if not minimum <= value <= maximum:
+        return f"Campo '{spec.name}' fuera de rango [{minimum:g}, {maximum:g}], recibido: {value:g}"
+    if spec.integer and not value.is_integer():
+        return f"Campo '{spec.name}' debe ser entero, recibido: {value:g}"
+    return None
+
+
+def _tuple_getter(names: List[str]):
+    """itemgetter que siempre retorna una tupla (también con un solo campo)."""
+    if len(names) == 1:
+        name = names[0]
+        return lambda event: (event[name],)
+    return itemgetter(*names)
+
+
+def _numeric_column(raw: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(valores float64, máscara de tipo inválido) convirtiendo valor por valor."""
+    values = np.full(len(raw), np.nan)
+    bad_type = np.zeros(len(raw), dtype=bool)
+    for i, value in enumerate(raw):
+        try:
+            values[i] = float(value)
+        except (ValueError, TypeError, OverflowError):
+            bad_type[i] = True
+    return values, bad_type
+
+
+def _categorical_column_errors(rows: List[Dict[str, Any]], spec: CategoricalField) -> np.ndarray:
+    """
+    Máscara de valores faltantes, que no son string o no están en el
+    vocabulario. Se chequean solo los valores distintos de la columna (pocos
+    en la práctica).
+    """
+    n = len(rows)
+    vocabulary = spec.vocabulary
+    try:
+        column = list(map(itemgetter(spec.name), rows))
+    except KeyError:
+        column = [row.get(spec.name, _MISSING) for row in rows]
+    try:
+        distinct = set(column)
+    except TypeError:  # valores no hashables (listas, dicts)
+        return np.fromiter(
+            (not isinstance(v, str) or (vocabulary is not None and v not in vocabulary) for v in column),
+            dtype=bool, count=n,
+        )
+
+    bad_values = {
+        v for v in distinct
+        if not isinstance(v, str) or (vocabulary is not None and v not in vocabulary)
+    }
+    if not bad_values:
+        return np.zeros(n, dtype=bool)
+    return np.fromiter((v in bad_values for v in column), dtype=bool, count=n)
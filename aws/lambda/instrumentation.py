@@ -0,0 +1,148 @@
+"""
+Instrumentación liviana del handler: tiempos por fase y métricas en
+CloudWatch Embedded Metric Format (EMF).
+
+Cada invocación abre un Invocation (start_invocation) que queda en un
+ContextVar; el código del handler marca sus fases con
+
+    with phase('predict'):
+        ...
+
+y suma contadores con count(). Fuera de una invocación (o con las métricas
+desactivadas) phase() y count() no hacen nada, así que las funciones
+auxiliares pueden usarse igual desde scripts o pruebas.
+
+Al terminar, emit() escribe en stdout una sola línea JSON en formato EMF:
+CloudWatch la convierte en métricas (tiempos en ms y contadores) sin llamadas
+a la API, y el resto de las claves quedan como campos consultables en Logs
+Insights.
+"""
+
+import json
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+_current: ContextVar[Optional['Invocation']] = ContextVar('invocation', default=None)
+
+
+class Invocation:
+    """Tiempos (ns), contadores y propiedades de una invocación."""
+
+    __slots__ = ('start_ns', 'end_ns', 'phases', 'counters', 'properties', '_token')
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = 0
+        self.phases: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self.properties: Dict[str, Any] = {}
+        self._token = None
+
+    def add_phase(self, name: str, elapsed_ns: int) -> None:
+        self.phases[name] = self.phases.get(name, 0) + elapsed_ns
+
+    @property
+    def total_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+
+class _Phase:
+    """Context manager de una fase; acumula si la fase se repite."""
+
+    __slots__ = ('name', 'invocation', 't0')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.invocation = _current.get()
+        if self.invocation is not None:
+            self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.invocation is not None:
+            self.invocation.add_phase(self.name, time.perf_counter_ns() - self.t0)
+        return False
+
+
+def phase(name: str) -> _Phase:
+    """Mide el bloque como la fase `name` de la invocación en curso."""
+    return _Phase(name)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Suma value al contador `name` de la invocación en curso."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.counters[name] = invocation.counters.get(name, 0) + value
+
+
+def set_property(name: str, value: Any) -> None:
+    """Agrega un campo (no métrica) a la línea EMF de la invocación en curso."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.properties[name] = value
+
+
+def start_invocation() -> Invocation:
+    invocation = Invocation()
+    invocation._token = _current.set(invocation)
+    return invocation
+
+
+def end_invocation(invocation: Invocation) -> None:
+    invocation.end_ns = time.perf_counter_ns()
+    if invocation._token is not None:
+        _current.reset(invocation._token)
+        invocation._token = None
+
+
+# Bloque "CloudWatchMetrics" ya serializado, por conjunto de métricas: las
+# invocaciones de un mismo modo repiten siempre las mismas fases y contadores
+_metrics_fragments: Dict[Tuple, str] = {}
+
+
+def _metrics_fragment(namespace: str, dimension_sets: List[List[str]],
+                      phase_names: Tuple[str, ...], counter_names: Tuple[str, ...]) -> str:
+    key = (namespace, tuple(map(tuple, dimension_sets)), phase_names, counter_names)
+    fragment = _metrics_fragments.get(key)
+    if fragment is None:
+        metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in phase_names]
+        metrics += [{'Name': name, 'Unit': 'Count'} for name in counter_names]
+        fragment = json.dumps(
+            [{'Namespace': namespace, 'Dimensions': dimension_sets, 'Metrics': metrics}],
+            separators=(',', ':'),
+        )
+        _metrics_fragments[key] = fragment
+    return fragment
+
+
+def format_emf(invocation: Invocation, namespace: str, dimensions: Dict[str, str],
+               dimension_sets: Optional[List[List[str]]] = None) -> str:
+    """
+    Línea EMF de la invocación: una métrica <fase>_ms por fase, total_ms y
+    cada contador (Count); dimensions y properties van como campos de primer
+    nivel.
+    """
+    record: Dict[str, Any] = dict(invocation.properties)
+    record.update(dimensions)
+    for name, elapsed_ns in invocation.phases.items():
+        record[f"{name}_ms"] = round(elapsed_ns / 1e6, 4)
+    record['total_ms'] = round(invocation.total_ns / 1e6, 4)
+    record.update(invocation.counters)
+
+    phase_names = tuple(f"{name}_ms" for name in invocation.phases) + ('total_ms',)
+    fragment = _metrics_fragment(namespace, dimension_sets or [list(dimensions)],
+                                 phase_names, tuple(invocation.counters))
+
+    body = json.dumps(record, separators=(',', ':'))
+    return f'{body[:-1]},"_aws":{{"Timestamp":{int(time.time() * 1000)},"CloudWatchMetrics":{fragment}}}}}'
+
+
+def emit(invocation: Invocation, namespace: str, dimensions: Dict[str, str],
+         dimension_sets: Optional[List[List[str]]] = None, stream: Optional[TextIO] = None) -> None:
+    """Escribe la línea EMF de la invocación (stdout por defecto)."""
+    (stream or sys.stdout).write(format_emf(invocation, namespace, dimensions, dimension_sets) + '\n')
@@ -20,21 +20,95 @@ Estructura del evento esperado:
     "retry_hora_bucket": str         # Bucket horario (madrugada, mañana, tarde, noche)
 }
 
+Modo batch: el evento también puede ser {"items": [evento, evento, ...]}.
+Cada item se valida por separado y todos los válidos se puntúan con una única
+llamada vectorizada a predict_proba. La respuesta conserva el orden de entrada
+e incluye un error por item para los inválidos, sin fallar el batch completo.
+
+Registro de modelos (A/B): con MODEL_REGISTRY_KEY (o MODEL_REGISTRY_PATH) el
+contenedor sirve las versiones de un registro.json (ver model_registry.py).
+Cada evento va a la versión de su campo opcional "model_version" o, si no lo
+trae, a una sorteada según los porcentajes de MODEL_ROUTES (o las rutas del
+registro). Las versiones se cargan al primer uso y a lo sumo
+MAX_LOADED_MODELS quedan en memoria. Cada resultado incluye "model_version",
+la versión que lo puntuó.
+
 Variables de entorno:
 - MODEL_BUCKET: Nombre del bucket S3 donde está el modelo
-- MODEL_KEY: Ruta del archivo del modelo en S3 (ej: models/mejor_modelo.pkl)
-- THRESHOLD: Umbral de decisión (0-1), por defecto 0.3
-- LOG_LEVEL: Nivel de logging (DEBUG, INFO, WARNING, ERROR)
+- MODEL_PATH: Alternativa a MODEL_BUCKET fuera de Lambda (ej. el servidor HTTP de
+  aws/server): ruta local del modelo (.pkl o .npz). Se carga sin S3 y sin
+  recarga en caliente
+- MODEL_REGISTRY_KEY: Ruta de registro.json en S3 (ej: models/registro/registro.json).
+  Activa el modo registro; los archivos de cada versión se buscan relativos
+  a esa ruta y MODEL_KEY no se usa
+- MODEL_REGISTRY_PATH: Como MODEL_REGISTRY_KEY pero con un registro local (sin S3)
+- MODEL_ROUTES: Porcentaje de tráfico por versión del registro, ej.
+  "20240601-120000-xgboost=90,20240701-090000-xgboost=10"; por defecto las
+  rutas del registro
+- MAX_LOADED_MODELS: Versiones del registro en memoria a la vez (LRU), por defecto 2
+- MODEL_KEY: Ruta del archivo del modelo en S3 (ej: models/mejor_modelo.pkl). Si
+  termina en .npz se carga el formato portable de portable_model.py, que se
+  evalúa solo con NumPy (sin sklearn, xgboost, pandas ni joblib)
+- THRESHOLD: Umbral de decisión (0-1) o "auto" (por defecto). Con "auto" se usa
+  el umbral óptimo guardado en el modelo por ejecutar-evaluacion-algoritmos.py
+  (el del registro o el atributo umbral_optimo_) y, si el modelo no lo trae, 0.3
+- MAX_BATCH_SIZE: Máximo de items aceptados en modo batch, por defecto 1000
+- VOCABULARY_FIELDS: Campos categóricos (separados por coma) cuyo valor debe
+  ser una categoría conocida por el OneHotEncoder del modelo, por defecto
+  error_categoria,retry_hora_bucket; vacío desactiva el chequeo
+- COMPILED_SCORING: Usa la ruta compilada sin pandas para eventos individuales
+  (ver compiled_scorer.py), por defecto true
+- MODEL_CACHE_DIR: Carpeta local donde se descarga el modelo, por defecto /tmp/modelos
+- MODEL_MMAP: Carga los arrays del modelo con joblib mmap_mode='r', por defecto true
+- MODEL_DOWNLOAD_PART_MB: Tamaño de cada GET por rangos al descargar el modelo
+  (ver s3_fetch.py), por defecto 8; un modelo más chico se baja con un solo GET
+- MODEL_DOWNLOAD_CONCURRENCY: GETs por rangos en paralelo, por defecto 8
+- MODEL_VERIFY_CHECKSUM: Verifica el SHA-256 (metadato sha256 del objeto o del
+  registro) o el MD5 del ETag del modelo descargado, por defecto true
+- MODEL_CHECK_TTL: Segundos entre verificaciones (head_object) de una versión
+  nueva del modelo en S3, por defecto 300; 0 desactiva la recarga en caliente
+- PREDICTION_CACHE_SIZE: Entradas de la caché LRU de probabilidades para
+  eventos repetidos (ver prediction_cache.py), por defecto 0 (desactivada). Se
+  vacía al cambiar la versión del modelo
+- CACHE_MONTO_BIN / CACHE_DELTA_HORAS_BIN: Ancho del bin con que se cuantizan
+  monto y delta_horas en la caché, por defecto 0 (valor exacto)
+- CACHE_LOG_EVERY: Cada cuántas consultas a la caché se registran los
+  contadores (hits/misses/evictions), por defecto 100; 0 no los registra
+- METRICS_ENABLED: Emite una línea CloudWatch EMF por invocación con los tiempos
+  por fase (validate, features, predict, serialize), contadores y la versión del
+  modelo (ver instrumentation.py), por defecto true
+- METRICS_NAMESPACE: Namespace de las métricas EMF, por defecto MLRetries/Inference
+- LOG_LEVEL: Nivel de logging (DEBUG, INFO, WARNING, ERROR). El evento y la
+  respuesta completos solo se serializan en los logs con DEBUG
+
+Arranque en frío: boto3, joblib y pandas se importan recién cuando se
+necesitan; el modelo se descarga con GETs por rangos en paralelo a un archivo
+preasignado en MODEL_CACHE_DIR (sin copia completa en memoria), se verifica su
+checksum y se deserializa con memory-mapping. Los tiempos de cada fase
+(import, descarga, deserialización) se registran en los logs y se adjuntan en
+la primera respuesta bajo la clave "cold_start".
 """
 
 import os
+import posixpath
+import re
 import json
 import logging
-import boto3
-import joblib
-import pandas as pd
-from io import BytesIO
-from typing import Dict, Any, Tuple
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Any, List, NamedTuple, Optional, Tuple
+
+from compiled_scorer import CompiledScorer, compile_pipeline
+from event_schema import BatchValidation, CategoricalField, EventSchema, NumericField
+from instrumentation import Invocation, count, emit, end_invocation, phase, set_property, start_invocation
+from model_registry import REGISTRY_FORMAT, ModelRegistry, parse_routes
+from portable_model import PortableModel, is_portable_key, load_portable_model
+from prediction_cache import PredictionCache
+from s3_fetch import fetch_to_file
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ============================================
 # Configuración de Logging
@@ -48,109 +122,722 @@ logger.setLevel(LOG_LEVEL)
 # Configuración de AWS S3
 # ============================================
 
-s3_client = boto3.client('s3')
-
 MODEL_BUCKET = os.environ.get('MODEL_BUCKET')
+MODEL_PATH = os.environ.get('MODEL_PATH')
 MODEL_KEY = os.environ.get('MODEL_KEY', 'models/mejor_modelo.pkl')
-THRESHOLD = float(os.environ.get('THRESHOLD', '0.3'))
-
-if not MODEL_BUCKET:
+MODEL_REGISTRY_KEY = os.environ.get('MODEL_REGISTRY_KEY')
+MODEL_REGISTRY_PATH = os.environ.get('MODEL_REGISTRY_PATH')
+MODEL_ROUTES = os.environ.get('MODEL_ROUTES', '').strip()
+MAX_LOADED_MODELS = int(os.environ.get('MAX_LOADED_MODELS', '2'))
+THRESHOLD_CONFIG = os.environ.get('THRESHOLD', 'auto').strip()
+THRESHOLD = None if THRESHOLD_CONFIG.lower() == 'auto' else float(THRESHOLD_CONFIG)
+DEFAULT_THRESHOLD = 0.3
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+VOCABULARY_FIELDS = [f.strip() for f in os.environ.get(
+    'VOCABULARY_FIELDS', 'error_categoria,retry_hora_bucket').split(',') if f.strip()]
+COMPILED_SCORING = os.environ.get('COMPILED_SCORING', 'true').lower() in ('1', 'true', 'yes')
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', '/tmp/modelos')
+MODEL_MMAP = os.environ.get('MODEL_MMAP', 'true').lower() in ('1', 'true', 'yes')
+MODEL_DOWNLOAD_PART_MB = float(os.environ.get('MODEL_DOWNLOAD_PART_MB', '8'))
+MODEL_DOWNLOAD_CONCURRENCY = int(os.environ.get('MODEL_DOWNLOAD_CONCURRENCY', '8'))
+MODEL_VERIFY_CHECKSUM = os.environ.get('MODEL_VERIFY_CHECKSUM', 'true').lower() in ('1', 'true', 'yes')
+MODEL_CHECK_TTL = float(os.environ.get('MODEL_CHECK_TTL', '300'))
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '0'))
+CACHE_MONTO_BIN = float(os.environ.get('CACHE_MONTO_BIN', '0'))
+CACHE_DELTA_HORAS_BIN = float(os.environ.get('CACHE_DELTA_HORAS_BIN', '0'))
+CACHE_LOG_EVERY = int(os.environ.get('CACHE_LOG_EVERY', '100'))
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'MLRetries/Inference')
+
+# Agregaciones de las métricas EMF: por modo y por modo + versión del modelo
+METRIC_DIMENSION_SETS = [['Mode'], ['Mode', 'ModelVersion']]
+
+if not MODEL_BUCKET and not MODEL_PATH and not MODEL_REGISTRY_PATH:
     logger.error("❌ FALTA variable de entorno MODEL_BUCKET")
     raise ValueError("Falta variable de entorno MODEL_BUCKET")
 
 logger.info(f"✓ Configuración cargada:")
-logger.info(f"  MODEL_BUCKET={MODEL_BUCKET}")
-logger.info(f"  MODEL_KEY={MODEL_KEY}")
-logger.info(f"  THRESHOLD={THRESHOLD}")
+if MODEL_REGISTRY_PATH:
+    logger.info(f"  MODEL_REGISTRY_PATH={MODEL_REGISTRY_PATH}")
+elif MODEL_REGISTRY_KEY:
+    logger.info(f"  MODEL_BUCKET={MODEL_BUCKET}")
+    logger.info(f"  MODEL_REGISTRY_KEY={MODEL_REGISTRY_KEY}")
+elif MODEL_PATH:
+    logger.info(f"  MODEL_PATH={MODEL_PATH}")
+else:
+    logger.info(f"  MODEL_BUCKET={MODEL_BUCKET}")
+    logger.info(f"  MODEL_KEY={MODEL_KEY}")
+if MODEL_REGISTRY_PATH or MODEL_REGISTRY_KEY:
+    logger.info(f"  MODEL_ROUTES={MODEL_ROUTES or '(las del registro)'}, MAX_LOADED_MODELS={MAX_LOADED_MODELS}")
+logger.info(f"  THRESHOLD={THRESHOLD_CONFIG}")
+logger.info(f"  MAX_BATCH_SIZE={MAX_BATCH_SIZE}")
+logger.info(f"  COMPILED_SCORING={COMPILED_SCORING}")
+logger.info(f"  MODEL_CACHE_DIR={MODEL_CACHE_DIR}")
+logger.info(f"  MODEL_MMAP={MODEL_MMAP}")
+logger.info(
+    f"  MODEL_DOWNLOAD_PART_MB={MODEL_DOWNLOAD_PART_MB}, MODEL_DOWNLOAD_CONCURRENCY="
+    f"{MODEL_DOWNLOAD_CONCURRENCY}, MODEL_VERIFY_CHECKSUM={MODEL_VERIFY_CHECKSUM}"
+)
+logger.info(f"  MODEL_CHECK_TTL={MODEL_CHECK_TTL}")
+logger.info(f"  VOCABULARY_FIELDS={','.join(VOCABULARY_FIELDS)}")
+logger.info(f"  PREDICTION_CACHE_SIZE={PREDICTION_CACHE_SIZE}")
+if PREDICTION_CACHE_SIZE > 0:
+    logger.info(f"  CACHE_MONTO_BIN={CACHE_MONTO_BIN}, CACHE_DELTA_HORAS_BIN={CACHE_DELTA_HORAS_BIN}")
+logger.info(f"  METRICS_ENABLED={METRICS_ENABLED}, METRICS_NAMESPACE={METRICS_NAMESPACE}")
 logger.info(f"  LOG_LEVEL={os.environ.get('LOG_LEVEL', 'INFO')}")
 
+# Columnas que espera el modelo, en el orden del entrenamiento
+NUM_COLS = ['monto', 'delta_horas', 'retry_hour', 'retry_dayofweek', 'retry_is_weekend']
+CAT_COLS = ['error_categoria', 'detalle_fail', 'retry_hora_bucket']
+FEATURE_COLS = NUM_COLS + CAT_COLS
+
+# Esquema del evento (tipos y rangos); cada modelo cargado le agrega los
+# vocabularios de su OneHotEncoder (ver model_vocabularies)
+EVENT_SCHEMA = EventSchema(
+    [
+        NumericField('monto'),
+        NumericField('delta_horas'),
+        NumericField('retry_hour', 0, 23, integer=True),
+        NumericField('retry_dayofweek', 0, 6, integer=True),
+        NumericField('retry_is_weekend', 0, 1, integer=True),
+    ],
+    [CategoricalField(col) for col in CAT_COLS],
+)
+
 # ============================================
 # Carga Global del Modelo (al inicializar Lambda)
 # ============================================
 
-_model = None
-_model_loaded = False
+class LoadedModel(NamedTuple):
+    """Modelo activo y todo lo derivado de él; se reemplaza como una unidad."""
+    model: Any
+    scorer: Optional[CompiledScorer]
+    version: str
+    local_path: str
+    threshold: float
+    cache: Optional[PredictionCache]
+    schema: EventSchema
+
+
+# El modelo activo se intercambia con una sola asignación: cada request toma
+# una referencia al inicio y la usa hasta el final, aunque entre tanto se
+# cargue una versión nueva.
+_active_model: Optional[LoadedModel] = None
+_s3_client = None
+
+# Control de la recarga en caliente
+_last_version_check = 0.0
+_reload_lock = threading.Lock()
+
+# Tiempos del arranque en frío (ms); se reportan una vez en la primera respuesta
+_cold_start_timings: Dict[str, Any] = {}
+_cold_start_reported = False
+
+
+def get_s3_client():
+    """Crea el cliente S3 la primera vez que se necesita (import diferido de boto3)."""
+    global _s3_client
+
+    if _s3_client is None:
+        import boto3
+        from botocore.config import Config
+
+        # Una conexión por GET por rangos en paralelo (el pool por defecto es de 10)
+        _s3_client = boto3.client('s3', config=Config(
+            max_pool_connections=max(10, MODEL_DOWNLOAD_CONCURRENCY + 1)))
+    return _s3_client
+
+
+def get_active_model() -> Optional[LoadedModel]:
+    """Retorna el modelo activo (o None si no se pudo cargar)."""
+    return _active_model
+
+
+def get_remote_model_version(bucket: str, key: str) -> Tuple[str, Optional[str]]:
+    """
+    Consulta (head_object) la versión actual del modelo en S3.
+
+    Retorna (version, version_id): version es el VersionId si el bucket es
+    versionado y si no el ETag; version_id se usa para descargar exactamente
+    el objeto consultado.
+    """
+    head = get_s3_client().head_object(Bucket=bucket, Key=key)
+    version_id = head.get('VersionId')
+    if version_id in (None, 'null'):
+        version_id = None
+    etag = head.get('ETag', '').strip('"')
+    return (version_id or etag), version_id
+
+
+def model_cache_path(key: str, version: str) -> str:
+    """Ruta local del modelo en caché para una versión dada."""
+    stem, ext = os.path.splitext(os.path.basename(key))
+    safe_version = re.sub(r'[^A-Za-z0-9_-]', '_', version)
+    return os.path.join(MODEL_CACHE_DIR, f"{stem}-{safe_version}{ext}")
+
+
+def _prune_model_cache(key: str, keep_path: str) -> None:
+    """Elimina de la caché las versiones anteriores del mismo modelo."""
+    stem, ext = os.path.splitext(os.path.basename(key))
+    try:
+        names = os.listdir(MODEL_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(MODEL_CACHE_DIR, name)
+        if name.startswith(f"{stem}-") and path != keep_path:
+            try:
+                # En Linux un archivo mapeado sigue siendo válido tras el unlink
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def download_model_to_file(bucket: str, key: str, local_path: str,
+                           version_id: Optional[str] = None,
+                           expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Descarga el objeto de S3 a local_path con GETs por rangos en paralelo
+    (s3_fetch.fetch_to_file): cada parte se escribe en su offset de un archivo
+    preasignado, sin materializar el modelo en memoria, y el archivo se
+    renombra al final, para no dejar un modelo a medio escribir.
+
+    Retorna las estadísticas de la descarga (bytes, partes, ms, MB/s, checksum).
+    """
+    return fetch_to_file(
+        get_s3_client(), bucket, key, local_path, version_id=version_id,
+        part_size=max(1, int(MODEL_DOWNLOAD_PART_MB * 1024 * 1024)),
+        concurrency=MODEL_DOWNLOAD_CONCURRENCY,
+        verify=MODEL_VERIFY_CHECKSUM, expected_sha256=expected_sha256,
+    )
+
+
+def _download_timings(local_path: str, download: Optional[Dict[str, Any]],
+                      elapsed_s: float) -> Dict[str, Any]:
+    """Tiempos de descarga para los logs y "cold_start" (download=None: el archivo ya estaba en caché)."""
+    if download is None:
+        return {
+            'download_ms': round(elapsed_s * 1000, 1),
+            'model_bytes': os.path.getsize(local_path),
+            'cache_hit': True,
+        }
+    return {
+        'download_ms': round(elapsed_s * 1000, 1),
+        'model_bytes': download['bytes'],
+        'cache_hit': False,
+        'download_parts': download['parts'],
+        'download_mb_s': download['download_mb_s'],
+        'checksum': download['checksum'],
+        'checksum_ms': download['checksum_ms'],
+    }
+
+
+def resolve_threshold(model: Any, registry_threshold: Optional[float] = None) -> float:
+    """
+    Umbral de decisión para un modelo: el de THRESHOLD si es numérico; con
+    "auto", el umbral óptimo del registro o el guardado junto al modelo, o
+    DEFAULT_THRESHOLD.
+    """
+    if THRESHOLD is not None:
+        return THRESHOLD
+    if registry_threshold is not None:
+        return float(registry_threshold)
+    return float(getattr(model, 'umbral_optimo_', DEFAULT_THRESHOLD))
 
 
-def load_model_from_s3():
+def _build_loaded_model(version: str, version_id: Optional[str],
+                        timings: Dict[str, Any]) -> LoadedModel:
     """
-    Carga el modelo pickled desde S3.
-    Se ejecuta una sola vez al inicializar la Lambda (código global).
+    Obtiene la versión indicada del modelo (desde la caché local si ya está,
+    si no desde S3) y la carga con _load_model_file.
     """
-    global _model, _model_loaded
+    local_path = model_cache_path(MODEL_KEY, version)
 
-    if _model_loaded:
+    t0 = time.perf_counter()
+    download = None
+    if not os.path.isfile(local_path):
+        download = download_model_to_file(MODEL_BUCKET, MODEL_KEY, local_path, version_id)
+    timings.update(_download_timings(local_path, download, time.perf_counter() - t0))
+    return _load_model_file(local_path, version, timings)
+
+
+def _load_model_file(local_path: str, version: str, timings: Dict[str, Any],
+                     registry_threshold: Optional[float] = None) -> LoadedModel:
+    """
+    Deserializa el modelo de un archivo local y compila su ruta rápida. Un
+    modelo portable (.npz) ya es su propia ruta rápida.
+    """
+    t1 = time.perf_counter()
+    if is_portable_key(local_path):
+        model = load_portable_model(local_path)
+    else:
+        import joblib
+        model = joblib.load(local_path, mmap_mode='r' if MODEL_MMAP else None)
+    t2 = time.perf_counter()
+
+    scorer = None
+    if isinstance(model, PortableModel):
+        scorer = model
+    elif COMPILED_SCORING:
+        try:
+            scorer = compile_pipeline(model)
+        except Exception as e:
+            logger.warning(f"No se pudo compilar la ruta rápida: {str(e)}")
+    t3 = time.perf_counter()
+
+    timings.update({
+        'deserialize_ms': round((t2 - t1) * 1000, 1),
+        'compile_ms': round((t3 - t2) * 1000, 1),
+    })
+    if scorer is None:
+        logger.info("Ruta de scoring compilada no disponible; se usa Pipeline.predict_proba.")
+
+    threshold = resolve_threshold(model, registry_threshold)
+    logger.info(f"Umbral de decisión para la versión {version}: {threshold}")
+
+    # Caché nueva por versión: las probabilidades del modelo anterior no se reutilizan
+    cache = None
+    if PREDICTION_CACHE_SIZE > 0:
+        cache = PredictionCache(
+            PREDICTION_CACHE_SIZE, NUM_COLS, CAT_COLS,
+            bins={'monto': CACHE_MONTO_BIN, 'delta_horas': CACHE_DELTA_HORAS_BIN},
+        )
+
+    vocabularies = model_vocabularies(model, scorer)
+    if vocabularies:
+        sizes = {col: len(categories) for col, categories in vocabularies.items()}
+        logger.info(f"Vocabularios validados (categorías por campo): {sizes}")
+
+    return LoadedModel(model=model, scorer=scorer, version=version,
+                       local_path=local_path, threshold=threshold, cache=cache,
+                       schema=EVENT_SCHEMA.with_vocabularies(vocabularies))
+
+
+def model_vocabularies(model: Any, scorer: Optional[CompiledScorer]) -> Dict[str, frozenset]:
+    """
+    Categorías que conoce el OneHotEncoder del modelo para los campos de
+    VOCABULARY_FIELDS. Vacío si el modelo no tiene la estructura esperada.
+    """
+    if scorer is not None:
+        pairs = zip(scorer.cat_cols, scorer.cat_offsets)
+    else:
+        steps = getattr(model, 'steps', None)
+        encoders = [
+            (cols, trans) for _, trans, cols in getattr(steps[0][1], 'transformers_', [])
+            if hasattr(trans, 'categories_')
+        ] if steps else []
+        if len(encoders) != 1:
+            return {}
+        cols, encoder = encoders[0]
+        pairs = zip(cols, encoder.categories_)
+    return {col: frozenset(categories) for col, categories in pairs if col in VOCABULARY_FIELDS}
+
+
+def load_model_from_s3() -> LoadedModel:
+    """
+    Carga el modelo (pickle o .npz portable) desde S3.
+    Se ejecuta al inicializar la Lambda (código global); las versiones nuevas
+    se detectan después con refresh_model_if_stale().
+
+    El archivo queda en MODEL_CACHE_DIR con la versión (VersionId/ETag) en el
+    nombre, de modo que si ya está en disco no se vuelve a descargar. Los
+    arrays NumPy guardados por joblib.dump (sin compresión) se mapean en
+    memoria en lugar de copiarse.
+    """
+    global _active_model, _last_version_check
+
+    if _active_model is not None:
         logger.info("Modelo ya cargado en memoria.")
-        return _model
+        return _active_model
 
     try:
         logger.info(f"Cargando modelo de S3: s3://{MODEL_BUCKET}/{MODEL_KEY}")
 
-        # Descargar el archivo del modelo desde S3
-        response = s3_client.get_object(Bucket=MODEL_BUCKET, Key=MODEL_KEY)
-        model_bytes = response['Body'].read()
+        t0 = time.perf_counter()
+        if not is_portable_key(MODEL_KEY):
+            import joblib  # noqa: F401  (se mide el costo del import)
+        get_s3_client()
+        t1 = time.perf_counter()
 
-        # Deserializar el modelo usando joblib
-        _model = joblib.load(BytesIO(model_bytes))
-        _model_loaded = True
+        version, version_id = get_remote_model_version(MODEL_BUCKET, MODEL_KEY)
+        _last_version_check = time.monotonic()
 
-        logger.info("✓ Modelo cargado exitosamente desde S3.")
-        return _model
+        timings: Dict[str, Any] = {'import_ms': round((t1 - t0) * 1000, 1)}
+        loaded = _build_loaded_model(version, version_id, timings)
+        _active_model = loaded
+        _prune_model_cache(MODEL_KEY, loaded.local_path)
+
+        _cold_start_timings.update(timings)
+        logger.info(
+            f"✓ Modelo cargado exitosamente desde S3 (versión {version}). "
+            f"Tiempos: {_cold_start_timings}"
+        )
+        return loaded
 
     except Exception as e:
         logger.error(f"Error al cargar el modelo desde S3: {str(e)}", exc_info=True)
         raise RuntimeError(f"No se pudo cargar el modelo desde S3: {str(e)}")
 
 
+def load_model_from_path(path: str) -> LoadedModel:
+    """
+    Carga el modelo desde un archivo local (MODEL_PATH), sin S3. Con joblib
+    mmap_mode='r' varios procesos que cargan el mismo archivo comparten sus
+    arrays a través del page cache del sistema operativo.
+    """
+    global _active_model
+
+    if _active_model is not None:
+        return _active_model
+
+    st = os.stat(path)
+    version = f"local-{st.st_mtime_ns:x}-{st.st_size:x}"
+    timings: Dict[str, Any] = {'model_bytes': st.st_size}
+    loaded = _load_model_file(path, version, timings)
+    _active_model = loaded
+
+    _cold_start_timings.update(timings)
+    logger.info(f"✓ Modelo cargado desde {path} (versión {version}). Tiempos: {timings}")
+    return loaded
+
+
+def _reload_model(version: str, version_id: Optional[str]) -> None:
+    """Carga una versión nueva y la activa; se ejecuta en un hilo aparte."""
+    global _active_model
+
+    try:
+        timings: Dict[str, Any] = {}
+        loaded = _build_loaded_model(version, version_id, timings)
+        previous = _active_model
+        _active_model = loaded
+        _prune_model_cache(MODEL_KEY, loaded.local_path)
+        logger.info(
+            f"✓ Modelo recargado: {previous.version if previous else None} -> {version}. "
+            f"Tiempos: {timings}"
+        )
+        if previous is not None and previous.cache is not None:
+            log_cache_stats(previous.cache, f"invalidada (versión {previous.version})")
+    except Exception as e:
+        logger.error(f"Error al recargar el modelo (versión {version}): {str(e)}", exc_info=True)
+    finally:
+        _reload_lock.release()
+
+
+def refresh_model_if_stale(wait: bool = False) -> None:
+    """
+    Verifica con head_object, como máximo una vez cada MODEL_CHECK_TTL
+    segundos, si el modelo en S3 cambió. Si cambió, la versión nueva se carga
+    en un hilo aparte y se activa al terminar; mientras tanto las requests
+    siguen usando el modelo anterior. Con wait=True se espera a que termine
+    (útil en pruebas locales).
+    """
+    global _last_version_check
+
+    if _registry is not None:
+        refresh_registry_if_stale(wait)
+        return
+    if MODEL_PATH or MODEL_CHECK_TTL <= 0 or _active_model is None:
+        return
+
+    now = time.monotonic()
+    if now - _last_version_check < MODEL_CHECK_TTL:
+        return
+    _last_version_check = now
+
+    try:
+        version, version_id = get_remote_model_version(MODEL_BUCKET, MODEL_KEY)
+    except Exception as e:
+        logger.warning(f"No se pudo verificar la versión del modelo: {str(e)}")
+        return
+
+    if version == _active_model.version:
+        return
+
+    # Solo una recarga a la vez
+    if not _reload_lock.acquire(blocking=False):
+        return
+
+    logger.info(f"Nueva versión del modelo detectada: {version}")
+    worker = threading.Thread(target=_reload_model, args=(version, version_id), daemon=True)
+    worker.start()
+    if wait:
+        worker.join()
+
+
+# ============================================
+# Registro de modelos (A/B)
+# ============================================
+
+# Con MODEL_REGISTRY_KEY/MODEL_REGISTRY_PATH: versiones, rutas y modelos
+# cargados. _active_model pasa a ser la versión con más tráfico (la que usan
+# /health y los eventos sin versión cuando no hay registro).
+_registry: Optional[ModelRegistry] = None
+_registry_etag: Optional[str] = None
+
+
+def get_registry() -> Optional[ModelRegistry]:
+    """Retorna el registro de modelos (o None fuera del modo registro)."""
+    return _registry
+
+
+def read_registry() -> Tuple[Dict[str, Any], str]:
+    """Lee registro.json (local o de S3). Retorna (registro, versión del archivo)."""
+    if MODEL_REGISTRY_PATH:
+        st = os.stat(MODEL_REGISTRY_PATH)
+        with open(MODEL_REGISTRY_PATH, encoding='utf-8') as f:
+            return json.load(f), f"local-{st.st_mtime_ns:x}-{st.st_size:x}"
+    response = get_s3_client().get_object(Bucket=MODEL_BUCKET, Key=MODEL_REGISTRY_KEY)
+    return json.loads(response['Body'].read()), response.get('ETag', '').strip('"')
+
+
+def _registry_routes(registry: Dict[str, Any]) -> Dict[str, float]:
+    return parse_routes(MODEL_ROUTES) if MODEL_ROUTES else registry.get('rutas', {})
+
+
+def _load_registry_entry(entry: Dict[str, Any]) -> LoadedModel:
+    """
+    Loader de ModelRegistry: carga el archivo de una versión, relativo al
+    registro. En S3 el archivo de una versión no cambia, así que la versión
+    sirve de nombre en la caché local (no hace falta head_object).
+    """
+    version = entry['version']
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    if MODEL_REGISTRY_PATH:
+        base = os.path.dirname(os.path.abspath(MODEL_REGISTRY_PATH))
+        local_path = os.path.join(base, *entry['archivo'].split('/'))
+        timings['model_bytes'] = os.path.getsize(local_path)
+    else:
+        key = posixpath.join(posixpath.dirname(MODEL_REGISTRY_KEY), entry['archivo'])
+        local_path = model_cache_path(key, version)
+        download = None
+        if not os.path.isfile(local_path):
+            download = download_model_to_file(MODEL_BUCKET, key, local_path,
+                                              expected_sha256=entry.get('sha256'))
+        timings.update(_download_timings(local_path, download, time.perf_counter() - t0))
+    loaded = _load_model_file(local_path, version, timings, entry.get('umbral'))
+    timings['load_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    if _active_model is None:
+        # la versión que se carga en el arranque: sus tiempos van a "cold_start"
+        _cold_start_timings.update(timings)
+    logger.info(f"✓ Versión {version} del registro cargada. Tiempos: {timings}")
+    return loaded
+
+
+def load_registry() -> LoadedModel:
+    """
+    Lee el registro y carga (ya en el arranque) la versión con más tráfico;
+    las demás se cargan con la primera request que las necesite.
+    """
+    global _registry, _registry_etag, _active_model, _last_version_check
+
+    if _active_model is not None:
+        return _active_model
+
+    try:
+        location = MODEL_REGISTRY_PATH or f"s3://{MODEL_BUCKET}/{MODEL_REGISTRY_KEY}"
+        logger.info(f"Cargando registro de modelos: {location}")
+
+        t0 = time.perf_counter()
+        registry, etag = read_registry()
+        _last_version_check = time.monotonic()
+        if registry.get('formato', REGISTRY_FORMAT) != REGISTRY_FORMAT:
+            raise ValueError(f"Formato de registro no soportado: {registry.get('formato')}")
+        _registry = ModelRegistry(registry.get('versiones', []), _registry_routes(registry),
+                                  _load_registry_entry, MAX_LOADED_MODELS)
+        _registry_etag = etag
+        t1 = time.perf_counter()
+
+        loaded = _registry.get(_registry.default_version)
+        _active_model = loaded
+        t2 = time.perf_counter()
+
+        _cold_start_timings.update({
+            'registry_ms': round((t1 - t0) * 1000, 1),
+            'load_ms': round((t2 - t1) * 1000, 1),
+        })
+        if len(_registry.routes) > MAX_LOADED_MODELS:
+            logger.warning(
+                f"Hay {len(_registry.routes)} versiones con tráfico y MAX_LOADED_MODELS="
+                f"{MAX_LOADED_MODELS}: las versiones se van a recargar seguido"
+            )
+        logger.info(
+            f"✓ Registro cargado: {len(_registry.entries)} versiones, rutas {_registry.routes}. "
+            f"Tiempos: {_cold_start_timings}"
+        )
+        return loaded
+
+    except Exception as e:
+        logger.error(f"Error al cargar el registro de modelos: {str(e)}", exc_info=True)
+        raise RuntimeError(f"No se pudo cargar el registro de modelos: {str(e)}")
+
+
+def _reload_registry(registry: Dict[str, Any], etag: str) -> None:
+    """Aplica un registro nuevo (versiones y rutas); se ejecuta en un hilo aparte."""
+    global _active_model, _registry_etag
+
+    try:
+        _registry.update(registry.get('versiones', []), _registry_routes(registry))
+        previous = _active_model
+        _active_model = _registry.get(_registry.default_version)
+        _registry_etag = etag
+        logger.info(
+            f"✓ Registro recargado: rutas {_registry.routes}, versión por defecto "
+            f"{previous.version if previous else None} -> {_active_model.version}"
+        )
+    except Exception as e:
+        logger.error(f"Error al recargar el registro de modelos: {str(e)}", exc_info=True)
+    finally:
+        _reload_lock.release()
+
+
+def refresh_registry_if_stale(wait: bool = False) -> None:
+    """
+    Como refresh_model_if_stale, para el registro: lo relee como máximo una
+    vez cada MODEL_CHECK_TTL segundos y, si cambió, aplica versiones y rutas
+    nuevas en un hilo aparte.
+    """
+    global _last_version_check
+
+    if MODEL_CHECK_TTL <= 0:
+        return
+
+    now = time.monotonic()
+    if now - _last_version_check < MODEL_CHECK_TTL:
+        return
+    _last_version_check = now
+
+    try:
+        registry, etag = read_registry()
+    except Exception as e:
+        logger.warning(f"No se pudo verificar el registro de modelos: {str(e)}")
+        return
+
+    if etag == _registry_etag:
+        return
+
+    if not _reload_lock.acquire(blocking=False):
+        return
+
+    logger.info(f"Nueva versión del registro de modelos detectada: {etag}")
+    worker = threading.Thread(target=_reload_registry, args=(registry, etag), daemon=True)
+    worker.start()
+    if wait:
+        worker.join()
+
+
+def resolve_model_version(event: Any) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Versión del modelo para un evento. Retorna (versión, mensaje de error).
+
+    Sin registro es la del modelo activo (el campo "model_version" se
+    ignora). Con registro es la del campo "model_version" del evento o, si no
+    lo trae, una sorteada según las rutas; la elegida se escribe en el evento
+    para que la validación y la predicción usen la misma.
+    """
+    registry = _registry
+    if registry is None:
+        active = _active_model
+        return (active.version if active is not None else None), None
+    if not isinstance(event, dict):
+        return registry.default_version, None
+
+    requested = event.get('model_version')
+    if requested is not None and not isinstance(requested, str):
+        return None, "El campo model_version debe ser texto"
+    try:
+        version = registry.choose(requested)
+    except KeyError:
+        return None, (f"model_version desconocida: {requested} "
+                      f"(disponibles: {', '.join(sorted(registry.entries))})")
+    event['model_version'] = version
+    return version, None
+
+
+def get_model(version: Optional[str]) -> Optional[LoadedModel]:
+    """Modelo que puntúa una versión (con registro la carga si no está en memoria)."""
+    registry = _registry
+    if registry is None or version is None:
+        return _active_model
+    return registry.get(version)
+
+
 # Cargar el modelo al inicializar el módulo (solo una vez)
 try:
-    _model = load_model_from_s3()
+    if MODEL_REGISTRY_PATH or MODEL_REGISTRY_KEY:
+        load_registry()
+    elif MODEL_PATH:
+        load_model_from_path(MODEL_PATH)
+    else:
+        load_model_from_s3()
     logger.info("✓ Modelo inicializado correctamente al startup de Lambda.")
 except Exception as e:
     logger.error(f"✗ Error crítico al cargar el modelo: {str(e)}")
-    _model = None
 
 
 # ============================================
 # Funciones Auxiliares
 # ============================================
 
+def _schema_for(version: Optional[str]) -> EventSchema:
+    active = get_model(version)
+    return active.schema if active is not None else EVENT_SCHEMA
+
+
 def validate_event(event: Dict[str, Any]) -> Tuple[bool, str]:
     """
-    Valida que el evento contenga todos los campos requeridos.
+    Valida el evento contra el esquema del modelo que lo va a puntuar: campos
+    requeridos, tipos (los numéricos recibidos como texto se convierten a
+    float en el evento), rangos y vocabularios conocidos.
 
     Retorna:
         (bool, str): (Es válido, Mensaje de error)
     """
-    required_numeric = [
-        'monto', 'delta_horas', 'retry_hour', 'retry_dayofweek', 'retry_is_weekend'
-    ]
-    required_categoric = [
-        'error_categoria', 'detalle_fail', 'retry_hora_bucket'
-    ]
-
-    all_required = required_numeric + required_categoric
-
-    for field in all_required:
-        if field not in event:
-            return False, f"Campo requerido faltante: {field}"
-
-    # Validaciones de tipo
-    for field in required_numeric:
-        try:
-            float(event[field])
-        except (ValueError, TypeError):
-            return False, f"Campo '{field}' debe ser numérico, recibido: {event[field]}"
-
-    # Validar que sea string
-    for field in required_categoric:
-        if not isinstance(event[field], str):
-            return False, f"Campo '{field}' debe ser string, recibido: {type(event[field])}"
-
-    return True, ""
+    version, error_msg = resolve_model_version(event)
+    if error_msg:
+        return False, error_msg
+    return _schema_for(version).validate(event)
 
 
-def prepare_features_dataframe(event: Dict[str, Any]) -> pd.DataFrame:
+def validate_events(events: List[Any]) -> BatchValidation:
+    """
+    Valida un batch por columnas. Retorna la máscara de items válidos, una
+    máscara de error por campo y el mensaje de cada item inválido (el mismo
+    que daría validate_event). Con registro, los items se validan agrupados
+    por versión, cada grupo con el esquema de su modelo.
+    """
+    if _registry is None:
+        return _schema_for(None).validate_batch(events)
+
+    groups: Dict[str, List[int]] = {}
+    version_errors: Dict[int, str] = {}
+    for i, event in enumerate(events):
+        version, error_msg = resolve_model_version(event)
+        if error_msg:
+            version_errors[i] = error_msg
+        else:
+            groups.setdefault(version, []).append(i)
+    if not version_errors and len(groups) == 1:
+        return _schema_for(next(iter(groups))).validate_batch(events)
+
+    import numpy as np
+
+    valid = np.zeros(len(events), dtype=bool)
+    field_errors = {name: np.zeros(len(events), dtype=bool) for name in EVENT_SCHEMA.fields}
+    messages: List[Optional[str]] = [None] * len(events)
+    for i, error_msg in version_errors.items():
+        messages[i] = error_msg
+    for version, idx in groups.items():
+        check = _schema_for(version).validate_batch([events[i] for i in idx])
+        valid[idx] = check.valid
+        for name, mask in check.field_errors.items():
+            field_errors[name][idx] = mask
+        for i, message in zip(idx, check.messages):
+            messages[i] = message
+    return BatchValidation(valid, field_errors, messages)
+
+
+def prepare_features_dataframe(event: Dict[str, Any]) -> 'pd.DataFrame':
     """
     Convierte el evento en un DataFrame con las características en el orden correcto.
 
@@ -158,18 +845,125 @@ def prepare_features_dataframe(event: Dict[str, Any]) -> pd.DataFrame:
     - Numéricas: monto, delta_horas, retry_hour, retry_dayofweek, retry_is_weekend
     - Categóricas: error_categoria, detalle_fail, retry_hora_bucket
     """
-    num_cols = ['monto', 'delta_horas', 'retry_hour', 'retry_dayofweek', 'retry_is_weekend']
-    cat_cols = ['error_categoria', 'detalle_fail', 'retry_hora_bucket']
+    df = prepare_features_dataframe_batch([event])
 
-    # Crear un diccionario con todos los campos
-    data = {col: [event[col]] for col in (num_cols + cat_cols)}
+    # Formatear el DataFrame cuesta más que construirlo: solo si DEBUG está activo
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"DataFrame de features preparado:\n{df}")
+    return df
 
-    # Crear DataFrame con las columnas en el orden correcto
-    df = pd.DataFrame(data)
-    df = df[num_cols + cat_cols]  # Asegurar el orden
 
-    logger.debug(f"DataFrame de features preparado:\n{df}")
-    return df
+def prepare_features_dataframe_batch(events: List[Dict[str, Any]]) -> 'pd.DataFrame':
+    """
+    Construye un único DataFrame columnar (una fila por evento) a partir de
+    eventos ya validados. Las numéricas se convierten a float de una vez por
+    columna para que predict_proba reciba tipos homogéneos.
+    """
+    import pandas as pd
+
+    data = {col: [float(e[col]) for e in events] for col in NUM_COLS}
+    data.update({col: [e[col] for e in events] for col in CAT_COLS})
+
+    # El orden del diccionario ya es el orden esperado por el modelo
+    return pd.DataFrame(data, columns=FEATURE_COLS)
+
+
+def _build_prediction(probability_success: float, threshold: float, version: str) -> Dict[str, Any]:
+    """Arma el resultado de una predicción aplicando el umbral de decisión."""
+    return {
+        'probabilidad_exito': round(probability_success, 4),
+        'reintentar': probability_success >= threshold,
+        'threshold_usado': threshold,
+        'model_version': version,
+    }
+
+
+def _model_for_version(version: Optional[str]) -> LoadedModel:
+    active = get_model(version)
+    if active is None:
+        raise RuntimeError("El modelo no está cargado. Error crítico en la inicialización.")
+    return active
+
+
+def _score_event(active: LoadedModel, event: Dict[str, Any]) -> float:
+    """Probabilidad de éxito de un evento con el modelo activo."""
+    if active.scorer is not None:
+        # Ruta rápida: el evento se escribe directo en una fila NumPy
+        with phase('features'):
+            row = active.scorer.transform_event(event)
+        with phase('predict'):
+            return active.scorer.predict_proba_row(row)
+
+    # Preparar el DataFrame de features
+    with phase('features'):
+        df = prepare_features_dataframe(event)
+
+    # Realizar predicción con predict_proba
+    # predict_proba retorna [[prob_clase_0, prob_clase_1], ...]
+    # Nos interesa la probabilidad de la clase 1 (éxito)
+    with phase('predict'):
+        probabilities = active.model.predict_proba(df)
+    return float(probabilities[0, 1])
+
+
+def _score_batch(active: LoadedModel, events: List[Dict[str, Any]]) -> List[float]:
+    """Probabilidades de éxito de un lote con una sola llamada vectorizada."""
+    if isinstance(active.model, PortableModel):
+        with phase('features'):
+            X = active.model.transform_events(events)
+        with phase('predict'):
+            probabilities = active.model.predict_proba_matrix(X)
+    else:
+        with phase('features'):
+            df = prepare_features_dataframe_batch(events)
+        with phase('predict'):
+            probabilities = active.model.predict_proba(df)[:, 1]
+    return [float(p) for p in probabilities]
+
+
+def _score_batch_cached(active: LoadedModel, cache: PredictionCache,
+                        events: List[Dict[str, Any]]) -> List[float]:
+    """
+    Como _score_batch, pero solo puntúa los eventos que no están en la caché;
+    los repetidos dentro del mismo lote se puntúan una sola vez.
+    """
+    probabilities: List[Optional[float]] = [None] * len(events)
+    pending: Dict[Any, Tuple[Dict[str, Any], List[int]]] = {}
+
+    with phase('cache'):
+        for i, event in enumerate(events):
+            key, event_to_score = cache.canonicalize(event)
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            probability = cache.get(key)
+            if probability is None:
+                pending[key] = (event_to_score, [i])
+            else:
+                probabilities[i] = probability
+
+    n_hits = len(events) - sum(len(indices) for _, indices in pending.values())
+    count('cache_hits', n_hits)
+    count('cache_misses', len(events) - n_hits)
+
+    if pending:
+        scored = _score_batch(active, [event_to_score for event_to_score, _ in pending.values()])
+        for (key, (_, indices)), probability in zip(pending.items(), scored):
+            cache.put(key, probability)
+            for i in indices:
+                probabilities[i] = probability
+
+    return probabilities
+
+
+def log_cache_stats(cache: PredictionCache, label: str = '') -> None:
+    """Registra los contadores de la caché de predicciones."""
+    stats = cache.stats()
+    logger.info(
+        f"Caché de predicciones{' ' + label if label else ''}: "
+        f"hits={stats['hits']}, misses={stats['misses']}, evictions={stats['evictions']}, "
+        f"tamaño={stats['size']}/{stats['maxsize']}, hit_rate={stats['hit_rate']:.2%}"
+    )
 
 
 def predict_retry_success(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -184,36 +978,100 @@ def predict_retry_success(event: Dict[str, Any]) -> Dict[str, Any]:
         - probabilidad_exito (float): Probabilidad de éxito (0-1)
         - reintentar (bool): Decisión binaria basada en el umbral
         - threshold_usado (float): Umbral utilizado
+        - model_version (str): Versión del modelo que puntuó el evento
     """
-    if _model is None:
-        raise RuntimeError("El modelo no está cargado. Error crítico en la inicialización.")
-
-    # Preparar el DataFrame de features
-    df = prepare_features_dataframe(event)
-
-    # Realizar predicción con predict_proba
-    # predict_proba retorna [[prob_clase_0, prob_clase_1], ...]
-    # Nos interesa la probabilidad de la clase 1 (éxito)
-    probabilities = _model.predict_proba(df)
-    probability_success = float(probabilities[0, 1])
+    version, error_msg = resolve_model_version(event)
+    if error_msg:
+        raise ValueError(error_msg)
+    active = _model_for_version(version)
+
+    cache = active.cache
+    if cache is None:
+        probability_success = _score_event(active, event)
+    else:
+        with phase('cache'):
+            key, event_to_score = cache.canonicalize(event)
+            probability_success = cache.get(key)
+        count('cache_hits' if probability_success is not None else 'cache_misses')
+        if probability_success is None:
+            probability_success = _score_event(active, event_to_score)
+            cache.put(key, probability_success)
+        if CACHE_LOG_EVERY > 0 and cache.lookups % CACHE_LOG_EVERY == 0:
+            log_cache_stats(cache)
 
     # Decisión binaria basada en el umbral
-    decision = probability_success >= THRESHOLD
-
-    logger.info(
-        f"Predicción realizada: "
-        f"monto={event['monto']}, "
-        f"error={event['error_categoria']}, "
-        f"prob_éxito={probability_success:.4f}, "
-        f"umbral={THRESHOLD}, "
-        f"reintentar={decision}"
-    )
+    with phase('serialize'):
+        result = _build_prediction(probability_success, active.threshold, active.version)
+    decision = result['reintentar']
+    count('reintentar', int(decision))
+    set_property('probabilidad_exito', result['probabilidad_exito'])
+    set_property('model_version', active.version)
+    set_property('threshold', active.threshold)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"Predicción realizada: "
+            f"monto={event['monto']}, "
+            f"error={event['error_categoria']}, "
+            f"prob_éxito={probability_success:.4f}, "
+            f"umbral={active.threshold}, "
+            f"reintentar={decision}"
+        )
+
+    return result
+
+
+def predict_retry_success_batch(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Predice un lote de eventos ya validados con una sola llamada a predict_proba
+    por versión del modelo (con registro, cada evento va a la suya).
 
-    return {
-        'probabilidad_exito': round(probability_success, 4),
-        'reintentar': decision,
-        'threshold_usado': THRESHOLD,
-    }
+    Retorna una lista de resultados (mismo formato que predict_retry_success)
+    en el mismo orden que los eventos recibidos.
+    """
+    if not events:
+        return []
+
+    groups: Dict[Optional[str], List[int]] = {}
+    if _registry is None:
+        groups[None] = list(range(len(events)))
+    else:
+        for i, event in enumerate(events):
+            version, error_msg = resolve_model_version(event)
+            if error_msg:
+                raise ValueError(error_msg)
+            groups.setdefault(version, []).append(i)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(events)
+    for version, idx in groups.items():
+        active = _model_for_version(version)
+        group = events if len(groups) == 1 else [events[i] for i in idx]
+
+        cache = active.cache
+        if cache is None:
+            probabilities = _score_batch(active, group)
+        else:
+            probabilities = _score_batch_cached(active, cache, group)
+            log_cache_stats(cache, f"(versión {active.version})" if _registry is not None else '')
+
+        with phase('serialize'):
+            for i, p in zip(idx, probabilities):
+                results[i] = _build_prediction(p, active.threshold, active.version)
+        n_retry = sum(results[i]['reintentar'] for i in idx)
+        count('reintentar', n_retry)
+
+        logger.info(
+            f"Predicción batch realizada: n={len(idx)}, "
+            f"reintentar={n_retry}, umbral={active.threshold}, versión={active.version}"
+        )
+
+    if len(groups) == 1:
+        set_property('model_version', results[0]['model_version'])
+        set_property('threshold', results[0]['threshold_usado'])
+    else:
+        set_property('model_version', 'varias')
+        set_property('model_versions', {results[idx[0]]['model_version']: len(idx) for idx in groups.values()})
+    return results
 
 
 # ============================================
@@ -237,17 +1095,85 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         "body": {
             "probabilidad_exito": 0.78,
             "reintentar": true,
-            "threshold_usado": 0.3
+            "threshold_usado": 0.3,
+            "model_version": "20240601-120000-xgboost"
         }
     }
+
+    La primera respuesta de cada contenedor incluye además "cold_start" con los
+    tiempos de carga del modelo.
     """
-    logger.info(f"Evento recibido: {json.dumps(event)}")
+    invocation = start_invocation() if METRICS_ENABLED else None
+    mode = 'batch' if isinstance(event, dict) and 'items' in event else 'single'
+    response = None
+    try:
+        refresh_model_if_stale()
+
+        if mode == 'batch':
+            response = _handle_batch(event['items'])
+        else:
+            response = _handle_single(event)
+
+        return _attach_cold_start(response)
+    finally:
+        if invocation is not None:
+            end_invocation(invocation)
+            _emit_metrics(invocation, mode, response)
+
+
+def _emit_metrics(invocation: Invocation, mode: str, response: Optional[Dict[str, Any]]) -> None:
+    """Escribe la línea EMF de la invocación; un fallo aquí no afecta la respuesta."""
+    active = _active_model
+    status = response.get('statusCode', 500) if response else 500
+
+    invocation.counters['errors'] = int(status >= 500)
+    invocation.properties['statusCode'] = status
+    if active is not None:
+        invocation.properties.setdefault('threshold', active.threshold)
+        if active.cache is not None:
+            invocation.properties['cache_size'] = len(active.cache)
+    if response and 'cold_start' in response:
+        invocation.properties['cold_start'] = response['cold_start']
+
+    # La versión que puntuó la request ('varias' si un batch usó más de una)
+    version = invocation.properties.pop('model_version', None)
+    if version is None:
+        version = active.version if active else 'sin_modelo'
+    dimensions = {'Mode': mode, 'ModelVersion': version}
+    try:
+        emit(invocation, METRICS_NAMESPACE, dimensions, METRIC_DIMENSION_SETS)
+    except Exception as e:
+        logger.warning(f"No se pudieron emitir las métricas: {str(e)}")
+
+
+def _attach_cold_start(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Adjunta los tiempos de arranque en frío solo a la primera respuesta."""
+    global _cold_start_reported
+
+    if not _cold_start_reported:
+        _cold_start_reported = True
+        if _cold_start_timings:
+            response['cold_start'] = dict(_cold_start_timings)
+    return response
 
-    # Validar que el evento sea correcto
-    is_valid, error_msg = validate_event(event)
+
+def _handle_single(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Procesa un evento individual (un reintento)."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Evento recibido: {json.dumps(event)}")
+
+    # Validar que el evento sea correcto (con registro, contra el modelo de su versión)
+    try:
+        with phase('validate'):
+            is_valid, error_msg = validate_event(event)
+    except Exception as e:
+        logger.error(f"Error al cargar el modelo del evento: {str(e)}", exc_info=True)
+        return _internal_error_response(e)
+    count('events')
 
     if not is_valid:
         logger.warning(f"Evento inválido: {error_msg}")
+        count('invalid_items')
         return {
             'statusCode': 400,
             'body': json.dumps({
@@ -260,7 +1186,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Realizar predicción
         result = predict_retry_success(event)
 
-        logger.info(f"Predicción exitosa: {json.dumps(result)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Predicción exitosa: {json.dumps(result)}")
 
         return {
             'statusCode': 200,
@@ -269,13 +1196,101 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     except Exception as e:
         logger.error(f"Error al procesar la predicción: {str(e)}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': f'Error interno en la predicción: {str(e)}',
-                'timestamp': pd.Timestamp.now().isoformat()
-            })
+        return _internal_error_response(e)
+
+
+def _internal_error_response(e: Exception) -> Dict[str, Any]:
+    return {
+        'statusCode': 500,
+        'body': json.dumps({
+            'error': f'Error interno en la predicción: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        })
+    }
+
+
+def _handle_batch(items: Any) -> Dict[str, Any]:
+    """
+    Procesa un payload {"items": [...]}.
+
+    Los items inválidos no detienen el batch: reciben su propio error y el resto
+    se puntúa en una única llamada vectorizada.
+
+    Ejemplo de respuesta:
+    {
+        "statusCode": 200,
+        "body": {
+            "resultados": [
+                {"indice": 0, "probabilidad_exito": 0.78, "reintentar": true, "threshold_usado": 0.3,
+                 "model_version": "20240601-120000-xgboost"},
+                {"indice": 1, "error": "Campo requerido faltante: monto"}
+            ],
+            "total": 2, "validos": 1, "invalidos": 1
         }
+    }
+    """
+    error_msg = check_batch_request(items)
+    if error_msg:
+        logger.warning(f"Batch inválido: {error_msg}")
+        return {'statusCode': 400, 'body': json.dumps({'error': error_msg})}
+
+    logger.info(f"Batch recibido: {len(items)} items")
+
+    try:
+        resultados, valid_idx = split_valid_items(items)
+        predictions = predict_retry_success_batch([items[i] for i in valid_idx])
+    except Exception as e:
+        logger.error(f"Error al procesar la predicción batch: {str(e)}", exc_info=True)
+        return _internal_error_response(e)
+
+    return {'statusCode': 200, 'body': build_batch_body(resultados, valid_idx, predictions)}
+
+
+def check_batch_request(items: Any) -> Optional[str]:
+    """Mensaje de error si 'items' no es un batch aceptable, o None."""
+    if not isinstance(items, list) or not items:
+        return "El campo 'items' debe ser una lista no vacía de eventos"
+    if len(items) > MAX_BATCH_SIZE:
+        return f"El batch excede MAX_BATCH_SIZE={MAX_BATCH_SIZE} (recibidos {len(items)})"
+    return None
+
+
+def split_valid_items(items: List[Any]) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+    """
+    Valida cada item. Retorna (resultados, valid_idx): resultados ya trae el
+    error de cada item inválido y None en la posición de los válidos.
+    """
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    valid_idx = []
+    with phase('validate'):
+        check = validate_events(items)
+        for i, is_valid in enumerate(check.valid.tolist()):
+            if is_valid:
+                valid_idx.append(i)
+            else:
+                resultados[i] = {'indice': i, 'error': check.messages[i]}
+    count('events', len(items))
+    count('invalid_items', len(items) - len(valid_idx))
+    return resultados, valid_idx
+
+
+def build_batch_body(resultados: List[Optional[Dict[str, Any]]], valid_idx: List[int],
+                     predictions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Completa resultados con las predicciones de los items válidos y arma el body."""
+    with phase('serialize'):
+        for i, pred in zip(valid_idx, predictions):
+            resultados[i] = {'indice': i, **pred}
+
+    n_invalid = len(resultados) - len(valid_idx)
+    if n_invalid:
+        logger.warning(f"Batch con {n_invalid} items inválidos de {len(resultados)}")
+
+    return {
+        'resultados': resultados,
+        'total': len(resultados),
+        'validos': len(valid_idx),
+        'invalidos': n_invalid,
+    }
 
 
 # ============================================
@@ -0,0 +1,163 @@
+"""
+Registro de modelos: varias versiones servidas por un mismo contenedor.
+
+El registro (registro.json, escrito por ejecutar-evaluacion-algoritmos.py)
+lista las versiones con su archivo, métricas de test y umbral óptimo, y las
+rutas de tráfico (porcentaje por versión):
+
+{
+    "formato": 1,
+    "rutas": {"20240601-120000-xgboost": 90, "20240701-090000-xgboost": 10},
+    "versiones": [
+        {"version": "20240601-120000-xgboost", "modelo": "xgboost",
+         "archivo": "20240601-120000/xgboost.pkl", "sha256": "9f86d0...", "umbral": 0.41,
+         "metricas": {"f1": 0.61, "auc_roc": 0.70, ...}, ...},
+        ...
+    ]
+}
+
+ModelRegistry carga cada versión recién cuando una request la necesita y
+mantiene a lo sumo max_loaded versiones en memoria (LRU: al cargar una más se
+descarta la usada hace más tiempo; las requests que ya tenían una referencia
+la siguen usando). La versión con más tráfico nunca se descarta, así que
+probar otras no obliga a recargar la principal. La carga corre fuera del lock: las requests de versiones ya
+cargadas no esperan, y las que piden la misma versión mientras se carga
+esperan esa única carga en lugar de repetirla.
+"""
+
+import bisect
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+REGISTRY_FORMAT = 1
+
+
+def parse_routes(spec: str) -> Dict[str, float]:
+    """'v1=90,v2=10' -> {'v1': 90.0, 'v2': 10.0}."""
+    routes = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        version, sep, weight = part.rpartition('=')
+        if not sep or not version:
+            raise ValueError(f"Ruta inválida {part!r}: use version=porcentaje")
+        routes[version.strip()] = float(weight)
+    return routes
+
+
+class ModelRegistry:
+    """Versiones del registro, ruteo por porcentaje y caché LRU de modelos cargados."""
+
+    def __init__(self, entries: List[Dict[str, Any]], routes: Dict[str, float],
+                 loader: Callable[[Dict[str, Any]], Any], max_loaded: int = 2,
+                 rng: Optional[random.Random] = None):
+        if max_loaded <= 0:
+            raise ValueError("max_loaded debe ser mayor que 0")
+        self.loader = loader
+        self.max_loaded = max_loaded
+        self._rng = rng or random.Random()
+
+        self._loaded: 'OrderedDict[str, Any]' = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+        self.update(entries, routes)
+
+    def update(self, entries: List[Dict[str, Any]], routes: Dict[str, float]) -> None:
+        """
+        Reemplaza versiones y rutas (al releer el registro). Las versiones
+        cargadas que siguen en el registro se conservan: el archivo de una
+        versión no cambia.
+        """
+        by_version = {e['version']: e for e in entries}
+        unknown = [v for v in routes if v not in by_version]
+        if unknown:
+            raise ValueError(f"Rutas a versiones que no están en el registro: {unknown}")
+        weighted = [(v, float(w)) for v, w in routes.items() if float(w) > 0]
+        if not weighted:
+            raise ValueError("Las rutas deben asignar un porcentaje > 0 a alguna versión")
+
+        cumulative, total = [], 0.0
+        for _, weight in weighted:
+            total += weight
+            cumulative.append(total)
+
+        with self._lock:
+            self.entries = by_version
+            self.routes = dict(weighted)
+            self._route_versions = [v for v, _ in weighted]
+            self._cumulative = cumulative
+            self._total = total
+            self.default_version = max(weighted, key=lambda vw: vw[1])[0]
+            for version in [v for v in self._loaded if v not in by_version]:
+                del self._loaded[version]
+
+    def choose(self, requested: Optional[str] = None) -> str:
+        """
+        Versión para una request: la pedida explícitamente (debe existir en el
+        registro) o una sorteada según los porcentajes de las rutas.
+        """
+        if requested is not None:
+            if requested not in self.entries:
+                raise KeyError(requested)
+            return requested
+        u = self._rng.random() * self._total
+        return self._route_versions[min(bisect.bisect_right(self._cumulative, u), len(self._cumulative) - 1)]
+
+    def get(self, version: str) -> Any:
+        """Modelo cargado de la versión; lo carga (una sola vez) si no está en memoria."""
+        with self._lock:
+            model = self._loaded.get(version)
+            if model is not None:
+                self._loaded.move_to_end(version)
+                self.hits += 1
+                return model
+            future = self._loading.get(version)
+            owner = future is None
+            if owner:
+                entry = self.entries[version]
+                future = self._loading[version] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            model = self.loader(entry)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[version]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[version]
+            self.loads += 1
+            if version in self.entries:
+                self._loaded[version] = model
+                while len(self._loaded) > self.max_loaded:
+                    victim = next(v for v in self._loaded if v != self.default_version)
+                    del self._loaded[victim]
+                    self.evictions += 1
+        future.set_result(model)
+        return model
+
+    def loaded_versions(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'loaded': self.loaded_versions(),
+            'max_loaded': self.max_loaded,
+            'loads': self.loads,
+            'hits': self.hits,
+            'evictions': self.evictions,
+            'routes': dict(self.routes),
+        }
@@ -0,0 +1,461 @@
+"""
+Formato portable del modelo (.npz) y evaluador en NumPy puro.
+
+mejor_modelo.pkl es un pickle de sklearn/xgboost: para cargarlo la Lambda
+necesita exactamente las mismas versiones de las librerías con las que se
+entrenó, y deserializarlo es lento. export_pipeline() vuelca el Pipeline
+ajustado (StandardScaler + OneHotEncoder + clasificador) a un .npz con solo
+arrays NumPy:
+- medias/escalas y vocabularios de categorías (el mismo layout que usa
+  compiled_scorer.py),
+- Regresión Logística: coeficientes e intercepto,
+- Random Forest / XGBoost: todos los árboles empaquetados en arrays planos
+  (hijos, feature, umbral, valor de la hoja).
+
+load_portable_model() lo lee con np.load y devuelve un PortableModel, que
+evalúa eventos sin importar sklearn, xgboost, pandas ni joblib.
+
+Exportar un modelo ya guardado:
+    python aws/lambda/portable_model.py models/mejor_modelo.pkl [models/mejor_modelo.npz]
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from compiled_scorer import PROBA_TOLERANCE, CompiledScorer, _extract_layout
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+PORTABLE_EXTENSION = '.npz'
+
+KIND_LOGISTIC = 'logistic'
+KIND_FOREST = 'forest'
+KIND_XGBOOST = 'xgboost'
+
+# Filas de X_check comparadas al exportar (muestra si hay más) y, de ellas,
+# cuántas pasan también por la ruta de eventos (un dict por fila)
+PARITY_CHECK_ROWS = 10_000
+EVENT_CHECK_ROWS = 500
+
+
+def is_portable_key(key: str) -> bool:
+    """True si la ruta/clave apunta a un modelo en formato portable."""
+    return key.lower().endswith(PORTABLE_EXTENSION)
+
+
+# ============================================
+# Estimadores en NumPy
+# ============================================
+
+class LinearModel:
+    """Regresión logística binaria (clase positiva = 1)."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef_ = coef.reshape(1, -1)
+        self.intercept_ = np.array([intercept])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        z = X @ self.coef_[0] + self.intercept_[0]
+        p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+
+class TreeEnsemble:
+    """
+    Conjunto de árboles binarios empaquetados en arrays planos. Los índices de
+    hijos son globales (left < 0 marca una hoja) y roots tiene el nodo raíz de
+    cada árbol.
+
+    - forest: va a la izquierda si x <= umbral; la probabilidad es el promedio
+      de las hojas (fracción de la clase 1), como RandomForestClassifier.
+    - xgboost: va a la izquierda si x < umbral; un valor faltante sigue
+      default_left; la probabilidad es sigmoide(base_margin + suma de hojas).
+
+    Ambas librerías comparan las features en float32, así que X se redondea a
+    float32 antes de recorrer los árboles.
+    """
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, kind: str, left: np.ndarray, right: np.ndarray, feature: np.ndarray,
+                 threshold: np.ndarray, value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 default_left: Optional[np.ndarray] = None, base_margin: float = 0.0,
+                 zero_is_missing: bool = False):
+        self.kind = kind
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.default_left = default_left
+        self.base_margin = base_margin
+        # Con salida dispersa del ColumnTransformer, XGBoost trata los ceros
+        # no almacenados como faltantes
+        self.zero_is_missing = zero_is_missing
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Valor de la hoja alcanzada en cada árbol, forma (n_filas, n_arboles)."""
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+        rows = np.arange(X.shape[0])[:, None]
+
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left >= 0
+            if not internal.any():
+                break
+            x = X[rows, self.feature[nodes]]
+            if self.kind == KIND_XGBOOST:
+                go_left = x < self.threshold[nodes]
+                missing = np.isnan(x)
+                if self.zero_is_missing:
+                    missing |= x == 0.0
+                go_left = np.where(missing, self.default_left[nodes], go_left)
+            else:
+                go_left = x <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+
+        return self.value[nodes]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.leaf_values(X)
+        if self.kind == KIND_XGBOOST:
+            p = 1.0 / (1.0 + np.exp(-(self.base_margin + leaves.sum(axis=1))))
+        else:
+            p = leaves.mean(axis=1)
+        return np.column_stack([1.0 - p, p])
+
+
+class PortableModel(CompiledScorer):
+    """
+    Modelo cargado desde un .npz. Para un evento usa la misma fila
+    preasignada que CompiledScorer; para un lote arma la matriz completa.
+    """
+
+    def __init__(self, num_cols, mean, scale, cat_cols, cat_offsets, n_features, estimator,
+                 kind: str, threshold: Optional[float] = None):
+        super().__init__(num_cols, mean, scale, cat_cols, cat_offsets, n_features, estimator,
+                         sparse_output=False)
+        self.kind = kind
+        if threshold is not None:
+            # Mismo atributo que deja ejecutar-evaluacion-algoritmos.py en el Pipeline
+            self.umbral_optimo_ = threshold
+
+    def transform_events(self, events: List[Dict[str, Any]]) -> np.ndarray:
+        """Matriz de features (n_eventos, n_features) para un lote de eventos."""
+        X = np.zeros((len(events), self.n_features), dtype=np.float64)
+        if not events:
+            return X
+
+        num = np.array([[float(e[col]) for col in self.num_cols] for e in events], dtype=np.float64)
+        X[:, :self._n_num] = (num - self.mean) / self.scale
+
+        for col, offsets in zip(self.cat_cols, self.cat_offsets):
+            for i, e in enumerate(events):
+                pos = offsets.get(e[col])
+                if pos is not None:
+                    X[i, pos] = 1.0
+        return X
+
+    def transform_columns(self, data: Any) -> np.ndarray:
+        """
+        Matriz de features para datos columnares (un DataFrame o un dict de
+        arrays con las columnas del modelo). Cada categoría distinta se busca
+        una sola vez, así que escala a millones de filas.
+        """
+        n = len(data[self.num_cols[0]])
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        if not n:
+            return X
+
+        num = np.column_stack([np.asarray(data[col], dtype=np.float64) for col in self.num_cols])
+        X[:, :self._n_num] = (num - self.mean) / self.scale
+
+        rows = np.arange(n)
+        for col, offsets in zip(self.cat_cols, self.cat_offsets):
+            uniques, inverse = np.unique(np.asarray(data[col], dtype=object), return_inverse=True)
+            positions = np.array([offsets.get(u, -1) for u in uniques], dtype=np.int64)[inverse]
+            known = positions >= 0
+            X[rows[known], positions[known]] = 1.0
+        return X
+
+    def predict_proba_events(self, events: List[Dict[str, Any]]) -> np.ndarray:
+        """Probabilidad de la clase 1 (éxito) para cada evento del lote."""
+        return self.predict_proba_matrix(self.transform_events(events))
+
+    def predict_proba_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidad de la clase 1 para una matriz ya transformada."""
+        if self._coef is not None:
+            return 1.0 / (1.0 + np.exp(-(X @ self._coef + self._intercept)))
+        return self.estimator.predict_proba(X)[:, self._pos_idx]
+
+
+# ============================================
+# Exportación (requiere sklearn / xgboost)
+# ============================================
+
+def _forest_arrays(clf: Any) -> Dict[str, np.ndarray]:
+    """Empaqueta los árboles de un RandomForestClassifier ajustado."""
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for est in clf.estimators_:
+        tree = est.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left < 0
+
+        counts = tree.value[:, 0, :]
+        proba = counts[:, 1] / counts.sum(axis=1)
+
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        values.append(proba.astype(np.float64))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'tree_left': np.concatenate(lefts),
+        'tree_right': np.concatenate(rights),
+        'tree_feature': np.concatenate(features),
+        'tree_threshold': np.concatenate(thresholds),
+        'tree_value': np.concatenate(values),
+        'tree_roots': np.array(roots, dtype=np.int32),
+        'tree_max_depth': np.array(max_depth),
+    }
+
+
+def _xgboost_arrays(clf: Any) -> Dict[str, np.ndarray]:
+    """Empaqueta los árboles de un XGBClassifier binario (booster gbtree)."""
+    import json
+
+    booster = clf.get_booster()
+    config = json.loads(booster.save_raw(raw_format='json'))
+    learner = config['learner']
+    gbm = learner['gradient_booster']
+    if gbm.get('name') != 'gbtree':
+        raise ValueError(f"Booster no soportado: {gbm.get('name')}")
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Objetivo no soportado: {objective}")
+
+    base_score = float(learner['learner_model_param']['base_score'])
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    lefts, rights, features, thresholds, values, defaults, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for tree in gbm['model']['trees']:
+        left = np.array(tree['left_children'], dtype=np.int32)
+        right = np.array(tree['right_children'], dtype=np.int32)
+        cond = np.array(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+        is_leaf = left < 0
+
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        features.append(np.where(is_leaf, 0, np.array(tree['split_indices'], dtype=np.int32)))
+        thresholds.append(cond)
+        # En las hojas split_conditions guarda el valor de la hoja
+        values.append(np.where(is_leaf, cond, 0.0))
+        defaults.append(np.array(tree['default_left'], dtype=bool))
+        roots.append(offset)
+        offset += len(left)
+        max_depth = max(max_depth, _tree_depth(left, right))
+
+    return {
+        'tree_left': np.concatenate(lefts),
+        'tree_right': np.concatenate(rights),
+        'tree_feature': np.concatenate(features),
+        'tree_threshold': np.concatenate(thresholds),
+        'tree_value': np.concatenate(values),
+        'tree_default_left': np.concatenate(defaults),
+        'tree_roots': np.array(roots, dtype=np.int32),
+        'tree_max_depth': np.array(max_depth),
+        'base_margin': np.array(base_margin),
+    }
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Profundidad de un árbol dado por sus arrays de hijos (raíz = nodo 0)."""
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        if left[node] >= 0:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def _pipeline_arrays(model: Any) -> Dict[str, np.ndarray]:
+    """Arrays del .npz para un Pipeline (preprocess + clf) ajustado."""
+    steps = getattr(model, 'steps', None)
+    if not steps or len(steps) != 2:
+        raise ValueError("Se esperaba un Pipeline de dos pasos (preprocess + clf)")
+    pre, clf = steps[0][1], steps[1][1]
+
+    layout = _extract_layout(pre)
+    if layout is None:
+        raise ValueError("El preprocesador no es StandardScaler + OneHotEncoder(handle_unknown='ignore')")
+    num_cols, mean, scale, cat_cols, cat_offsets, n_features = layout
+
+    if [int(c) for c in clf.classes_] != [0, 1]:
+        raise ValueError(f"Se esperaban las clases [0, 1], no {list(clf.classes_)}")
+
+    categories = [list(offsets) for offsets in cat_offsets]
+    if not all(isinstance(c, str) for cats in categories for c in cats):
+        raise ValueError("Las categorías deben ser texto")
+
+    arrays = {
+        'format_version': np.array(FORMAT_VERSION),
+        'num_cols': np.array(num_cols, dtype=str),
+        'mean': mean,
+        'scale': scale,
+        'cat_cols': np.array(cat_cols, dtype=str),
+        'categories': np.array([c for cats in categories for c in cats], dtype=str),
+        'categories_len': np.array([len(cats) for cats in categories], dtype=np.int64),
+        'n_features': np.array(n_features),
+    }
+
+    umbral = getattr(model, 'umbral_optimo_', None)
+    if umbral is not None:
+        arrays['threshold'] = np.array(float(umbral))
+
+    if hasattr(clf, 'coef_'):
+        if clf.coef_.shape[0] != 1:
+            raise ValueError("Solo se soporta regresión logística binaria")
+        arrays.update({
+            'kind': np.array(KIND_LOGISTIC),
+            'coef': np.asarray(clf.coef_[0], dtype=np.float64),
+            'intercept': np.array(float(clf.intercept_[0])),
+        })
+    elif hasattr(clf, 'estimators_') and all(hasattr(e, 'tree_') for e in clf.estimators_):
+        arrays.update(_forest_arrays(clf), kind=np.array(KIND_FOREST))
+    elif hasattr(clf, 'get_booster'):
+        arrays.update(_xgboost_arrays(clf), kind=np.array(KIND_XGBOOST),
+                      zero_is_missing=np.array(bool(getattr(pre, 'sparse_output_', False))))
+    else:
+        raise ValueError(f"Clasificador no soportado: {type(clf).__name__}")
+
+    return arrays
+
+
+def _model_from_arrays(data: Any) -> PortableModel:
+    """Construye el PortableModel a partir de los arrays (dict o NpzFile)."""
+    version = int(data['format_version'])
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {version} (se esperaba {FORMAT_VERSION})")
+
+    num_cols = [str(c) for c in data['num_cols']]
+    cat_cols = [str(c) for c in data['cat_cols']]
+    n_num = len(num_cols)
+
+    cat_offsets = []
+    start, offset = 0, n_num
+    for n in data['categories_len']:
+        cats = data['categories'][start:start + int(n)]
+        cat_offsets.append({str(c): offset + k for k, c in enumerate(cats)})
+        start += int(n)
+        offset += int(n)
+
+    kind = str(data['kind'])
+    if kind == KIND_LOGISTIC:
+        estimator = LinearModel(np.asarray(data['coef'], dtype=np.float64), float(data['intercept']))
+    elif kind in (KIND_FOREST, KIND_XGBOOST):
+        is_xgb = kind == KIND_XGBOOST
+        estimator = TreeEnsemble(
+            kind,
+            left=data['tree_left'], right=data['tree_right'], feature=data['tree_feature'],
+            threshold=data['tree_threshold'], value=data['tree_value'], roots=data['tree_roots'],
+            max_depth=int(data['tree_max_depth']),
+            default_left=data['tree_default_left'] if is_xgb else None,
+            base_margin=float(data['base_margin']) if is_xgb else 0.0,
+            zero_is_missing=bool(data['zero_is_missing']) if is_xgb else False,
+        )
+    else:
+        raise ValueError(f"Tipo de modelo desconocido: {kind}")
+
+    threshold = float(data['threshold']) if 'threshold' in data else None
+    return PortableModel(
+        num_cols, np.asarray(data['mean'], dtype=np.float64), np.asarray(data['scale'], dtype=np.float64),
+        cat_cols, cat_offsets, int(data['n_features']), estimator, kind, threshold,
+    )
+
+
+def load_portable_model(path: str) -> PortableModel:
+    """Lee un .npz generado por export_pipeline (solo NumPy, sin pickle)."""
+    with np.load(path, allow_pickle=False) as data:
+        return _model_from_arrays({name: data[name] for name in data.files})
+
+
+def max_abs_diff(model: Any, portable: PortableModel, X_check: Any) -> float:
+    """
+    Máxima diferencia absoluta de probabilidad entre el Pipeline y el
+    portable: sobre todo X_check por la ruta columnar (transform_columns) y
+    sobre sus primeras EVENT_CHECK_ROWS filas por la de eventos (la que usa
+    la Lambda).
+    """
+    if not len(X_check):
+        return 0.0
+    expected = model.predict_proba(X_check)[:, 1]
+    got = portable.predict_proba_matrix(portable.transform_columns(X_check))
+    events = X_check.iloc[:EVENT_CHECK_ROWS].to_dict(orient='records')
+    got_events = portable.predict_proba_events(events)
+    return float(max(np.max(np.abs(expected - got)),
+                     np.max(np.abs(expected[:len(events)] - got_events))))
+
+
+def export_pipeline(model: Any, path: str, X_check: Any = None,
+                    check_rows: int = PARITY_CHECK_ROWS) -> Dict[str, Any]:
+    """
+    Exporta un Pipeline ajustado a path (.npz sin comprimir).
+
+    Antes de escribir compara el evaluador NumPy contra model.predict_proba
+    sobre X_check (DataFrame con las columnas del modelo; si no se da, un
+    evento sintético) y lanza ValueError si la diferencia supera
+    PROBA_TOLERANCE. Si X_check tiene más de check_rows filas se compara una
+    muestra aleatoria fija de ese tamaño, para que el costo no crezca con el
+    test. Retorna {kind, n_bytes, max_abs_diff}.
+    """
+    import os
+    import pandas as pd
+    from compiled_scorer import _probe_event
+
+    arrays = _pipeline_arrays(model)
+    portable = _model_from_arrays(arrays)
+
+    if X_check is None:
+        X_check = pd.DataFrame([_probe_event(portable)], columns=portable.num_cols + portable.cat_cols)
+    elif len(X_check) > check_rows:
+        X_check = X_check.sample(n=check_rows, random_state=0)
+    diff = max_abs_diff(model, portable, X_check)
+    if diff > PROBA_TOLERANCE:
+        raise ValueError(f"El modelo portable no reproduce al Pipeline: diferencia {diff:.2e} > {PROBA_TOLERANCE}")
+
+    tmp_path = f"{path}.part.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+    return {'kind': str(arrays['kind']), 'n_bytes': os.path.getsize(path), 'max_abs_diff': diff}
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    import joblib
+
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python portable_model.py <modelo.pkl> [salida.npz]")
+        sys.exit(1)
+
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) == 3 else os.path.splitext(src)[0] + PORTABLE_EXTENSION
+    info = export_pipeline(joblib.load(src), dst)
+    print(f"✓ {src} → {dst} ({info['kind']}, {info['n_bytes'] / 1024:.1f} KiB, "
+          f"diferencia máx. {info['max_abs_diff']:.2e})")
@@ -0,0 +1,97 @@
+"""
+Caché LRU de probabilidades para eventos repetidos.
+
+En una tormenta de reintentos llegan muchos eventos con la misma combinación
+(error_categoria, detalle_fail, retry_hora_bucket, retry_hour, ...) y solo
+cambia un poco el monto. Con la caché, un contenedor caliente puntúa cada
+combinación una vez: la clave es la tupla canónica de features (numéricas
+como float, categóricas tal cual) y el valor la probabilidad de éxito.
+
+Cuantización opcional: con un bin > 0 para una columna numérica (ej. monto
+cada 10), el valor se redondea al múltiplo más cercano del bin tanto en la
+clave como en el evento que se puntúa. Así todos los eventos del mismo bin
+reciben exactamente la misma probabilidad, sin importar cuál llegó primero.
+
+La caché pertenece a una versión del modelo: el handler crea una nueva con
+cada modelo cargado, lo que la invalida al cambiar de versión.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class PredictionCache:
+    """LRU acotado (maxsize entradas) con contadores de hits/misses/evictions."""
+
+    def __init__(self, maxsize: int, num_cols: List[str], cat_cols: List[str],
+                 bins: Optional[Dict[str, float]] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize debe ser mayor que 0")
+        self.maxsize = maxsize
+        self.num_cols = num_cols
+        self.cat_cols = cat_cols
+        self.bins = {col: float(b) for col, b in (bins or {}).items() if b and b > 0}
+
+        self._data: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def canonicalize(self, event: Dict[str, Any]) -> Tuple[Hashable, Dict[str, Any]]:
+        """
+        Retorna (clave, evento a puntuar). El evento es el mismo objeto salvo
+        que alguna columna se cuantice; en ese caso es una copia con los
+        valores redondeados al bin.
+        """
+        values = []
+        quantized = None
+        for col in self.num_cols:
+            value = float(event[col])
+            step = self.bins.get(col)
+            if step is not None:
+                value = round(value / step) * step
+                if quantized is None:
+                    quantized = dict(event)
+                quantized[col] = value
+            values.append(value)
+
+        key = tuple(values) + tuple(event[col] for col in self.cat_cols)
+        return key, (quantized if quantized is not None else event)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: float) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.lookups
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
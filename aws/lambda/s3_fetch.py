@@ -0,0 +1,204 @@
+"""
+Descarga de artefactos de S3 con GETs por rangos en paralelo.
+
+Un GET secuencial queda limitado por el ancho de banda de una sola conexión
+(del orden de 100 MB/s hacia S3), y con un modelo grande (ej. un random
+forest de profundidad ilimitada) esa descarga domina el arranque en frío.
+fetch_to_file reparte el objeto en partes de part_size bytes y las pide con
+varias conexiones a la vez:
+
+1. El primer GET pide la parte 0 con Range. Sus headers traen el tamaño
+   total (Content-Range), así que un objeto que entra en una parte se
+   descarga con ese único GET, sin head_object previo; si no, las demás
+   partes se piden apenas llegan esos headers, mientras se lee la parte 0.
+2. El archivo destino se preasigna con el tamaño total y cada parte se
+   escribe en su offset con os.pwrite a medida que llega (sin armar el
+   objeto en memoria). Al terminar se renombra, de modo que nunca queda un
+   modelo a medio escribir, y el archivo se puede mapear con mmap.
+3. Las partes restantes se piden con If-Match (el ETag de la parte 0), o con
+   VersionId si se indicó: si el objeto se reemplaza durante la descarga, S3
+   responde 412 en lugar de mezclar dos versiones.
+4. Mientras llegan las partes se calcula el checksum en orden (releyendo
+   del page cache cada parte ya completa) y al final se compara con el
+   esperado. Si no coincide, el archivo se descarta y se lanza
+   ChecksumMismatch.
+
+Checksum esperado, en este orden: el que se pasa (ej. el "sha256" de una
+versión del registro), el metadato x-amz-meta-sha256 del objeto (lo agrega
+scripts/upload-model.sh) o el ETag cuando es un MD5 (objetos subidos en un
+solo PUT y sin SSE-KMS). Los objetos subidos en partes sin metadato no se
+verifican.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+# Bloques leídos del body de cada GET y releídos del archivo para el checksum
+READ_CHUNK_SIZE = 1024 * 1024
+PART_ATTEMPTS = 3
+
+_MD5_ETAG = re.compile(r'[0-9a-f]{32}')
+
+
+class ChecksumMismatch(ValueError):
+    """El checksum del archivo descargado no coincide con el esperado."""
+
+
+def _total_size(response: Dict[str, Any]) -> int:
+    content_range = response.get('ContentRange')  # 'bytes 0-8388607/123456789'
+    if content_range:
+        return int(content_range.rsplit('/', 1)[1])
+    if 'ContentLength' not in response:
+        # S3 siempre los envía; un cliente sustituto (ej. en benchmarks) puede no hacerlo
+        raise IOError("La respuesta de get_object no trae ContentRange ni ContentLength: "
+                      "no se puede saber el tamaño del objeto")
+    return int(response['ContentLength'])
+
+
+def expected_checksum(response: Dict[str, Any],
+                      expected_sha256: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(algoritmo, hex esperado) para un objeto, o (None, None) si no hay con qué verificar."""
+    if expected_sha256:
+        return 'sha256', expected_sha256.lower()
+    metadata_sha256 = (response.get('Metadata') or {}).get('sha256')
+    if metadata_sha256:
+        return 'sha256', metadata_sha256.lower()
+    etag = response.get('ETag', '').strip('"')
+    if _MD5_ETAG.fullmatch(etag) and response.get('ServerSideEncryption') != 'aws:kms':
+        return 'md5', etag
+    return None, None
+
+
+def _write_body(fd: int, body: Any, offset: int, expected_bytes: int) -> None:
+    position = offset
+    for chunk in body.iter_chunks(chunk_size=READ_CHUNK_SIZE):
+        os.pwrite(fd, chunk, position)
+        position += len(chunk)
+    if position - offset != expected_bytes:
+        raise IOError(f"Parte incompleta en el offset {offset}: "
+                      f"{position - offset} de {expected_bytes} bytes")
+
+
+def _fetch_part(client: Any, params: Dict[str, Any], fd: int, start: int, end: int) -> None:
+    """GET de bytes start..end (inclusive) escrito en su offset; reintenta cortes de lectura."""
+    for attempt in range(PART_ATTEMPTS):
+        try:
+            response = client.get_object(Range=f'bytes={start}-{end}', **params)
+            _write_body(fd, response['Body'], start, end - start + 1)
+            return
+        except Exception:
+            if attempt == PART_ATTEMPTS - 1:
+                raise
+
+
+def _hash_range(hasher: Any, fd: int, start: int, end: int) -> None:
+    position = start
+    while position < end:
+        chunk = os.pread(fd, min(READ_CHUNK_SIZE, end - position), position)
+        if not chunk:
+            raise IOError(f"Fin de archivo inesperado en el offset {position}")
+        hasher.update(chunk)
+        position += len(chunk)
+
+
+def fetch_to_file(client: Any, bucket: str, key: str, local_path: str,
+                  version_id: Optional[str] = None, part_size: int = DEFAULT_PART_SIZE,
+                  concurrency: int = DEFAULT_CONCURRENCY, verify: bool = True,
+                  expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Descarga s3://bucket/key a local_path con GETs por rangos en paralelo (ver
+    el docstring del módulo). Con concurrency=1 las partes se piden de a una.
+
+    Retorna estadísticas de la descarga: bytes, partes, milisegundos,
+    MB/s y el checksum verificado (None si no se verificó).
+    """
+    if part_size <= 0:
+        raise ValueError("part_size debe ser mayor que 0")
+    os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+    tmp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.part"
+
+    params: Dict[str, Any] = {'Bucket': bucket, 'Key': key}
+    if version_id:
+        params['VersionId'] = version_id
+
+    t0 = time.perf_counter()
+    try:
+        first = client.get_object(Range=f'bytes=0-{part_size - 1}', **params)
+    except Exception as e:
+        # Un objeto vacío no admite Range (416 InvalidRange)
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'InvalidRange':
+            raise
+        first = client.get_object(**params)
+    size = _total_size(first)
+    n_parts = max(1, -(-size // part_size))
+    if not version_id and first.get('ETag'):
+        params['IfMatch'] = first['ETag']
+
+    algorithm, expected = expected_checksum(first, expected_sha256) if verify else (None, None)
+    hasher = hashlib.new(algorithm) if algorithm else None
+    hash_s = 0.0
+
+    fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Preasignado: cada parte se escribe en su offset cuando llega
+        os.ftruncate(fd, size)
+        if n_parts == 1:
+            _write_body(fd, first['Body'], 0, size)
+            if hasher is not None:
+                t_hash = time.perf_counter()
+                _hash_range(hasher, fd, 0, size)
+                hash_s += time.perf_counter() - t_hash
+        else:
+            # El body de la parte 0 se lee en el pool junto con las demás partes
+            pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, n_parts)))
+            try:
+                pending = {pool.submit(_write_body, fd, first['Body'], 0, part_size): 0}
+                for i in range(1, n_parts):
+                    end = min((i + 1) * part_size, size) - 1
+                    pending[pool.submit(_fetch_part, client, params, fd, i * part_size, end)] = i
+                done_parts = set()
+                next_to_hash = 0
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                        done_parts.add(pending.pop(future))
+                    # checksum en orden de las partes ya completas, mientras llegan las demás
+                    if hasher is not None:
+                        t_hash = time.perf_counter()
+                        while next_to_hash in done_parts:
+                            _hash_range(hasher, fd, next_to_hash * part_size,
+                                        min((next_to_hash + 1) * part_size, size))
+                            next_to_hash += 1
+                        hash_s += time.perf_counter() - t_hash
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    os.close(fd)
+
+    if hasher is not None and hasher.hexdigest() != expected:
+        os.remove(tmp_path)
+        raise ChecksumMismatch(
+            f"s3://{bucket}/{key}: {algorithm} {hasher.hexdigest()} distinto del esperado {expected}"
+        )
+    os.replace(tmp_path, local_path)
+
+    seconds = time.perf_counter() - t0
+    return {
+        'bytes': size,
+        'parts': n_parts,
+        'download_ms': round(seconds * 1000, 1),
+        'download_mb_s': round(size / 1e6 / seconds, 1) if seconds > 0 else None,
+        'checksum': algorithm,
+        'checksum_ms': round(hash_s * 1000, 1),
+    }
@@ -52,7 +52,8 @@ export class MlRetriesStack extends cdk.Stack {
         environment: {
           MODEL_BUCKET: modelBucket.bucketName,
           MODEL_KEY: 'models/mejor_modelo.pkl',
-          THRESHOLD: '0.1',
+          // 'auto': usa el umbral óptimo guardado con el modelo
+          THRESHOLD: 'auto',
           LOG_LEVEL: 'DEBUG',
         },
         logGroup: lambdaLogGroup,
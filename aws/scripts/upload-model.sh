@@ -46,11 +46,27 @@ echo "✓ Modelo encontrado: $MODEL_SOURCE"
 echo "  Tamaño: $(du -h $MODEL_SOURCE | cut -f1)"
 echo ""
 
+# SHA-256 como metadato del objeto: la Lambda lo verifica al descargar. El
+# ETag no sirve para archivos grandes (aws s3 cp los sube en partes)
+sha256_de() {
+  (sha256sum "$1" 2>/dev/null || shasum -a 256 "$1") | cut -d' ' -f1
+}
+
 # Subir el modelo
 echo "Subiendo modelo a S3..."
 aws s3 cp "$MODEL_SOURCE" "s3://${BUCKET_NAME}/models/mejor_modelo.pkl" \
+  --metadata "sha256=$(sha256_de "$MODEL_SOURCE")" \
   --region "${REGION}"
 
+# Formato portable (.npz), si se exportó: la Lambda lo usa con MODEL_KEY=models/mejor_modelo.npz
+MODEL_SOURCE_NPZ="../models/mejor_modelo.npz"
+if [ -f "$MODEL_SOURCE_NPZ" ]; then
+  echo "Subiendo modelo portable a S3..."
+  aws s3 cp "$MODEL_SOURCE_NPZ" "s3://${BUCKET_NAME}/models/mejor_modelo.npz" \
+    --metadata "sha256=$(sha256_de "$MODEL_SOURCE_NPZ")" \
+    --region "${REGION}"
+fi
+
 echo ""
 echo "✓ Modelo subido exitosamente"
 echo ""
@@ -0,0 +1,364 @@
+"""
+Servidor HTTP de inferencia para despliegues de alto QPS (fuera de Lambda).
+
+Reutiliza el código de aws/lambda/lambda_predict_reintento.py (validate_event,
+predict_retry_success_batch, carga del modelo, caché de predicciones), así que
+las probabilidades y el formato de los resultados son los mismos que en la
+Lambda. Es una app ASGI sin frameworks: solo necesita uvicorn para servirse.
+
+Endpoints:
+- POST /predict  con un evento   -> {"probabilidad_exito", "reintentar", "threshold_usado", "model_version"}
+                 con {"items": [...]} -> {"resultados": [...], "total", "validos", "invalidos"}
+- GET  /health   -> versión y umbral del modelo activo (y del registro, si hay)
+
+Micro-batching: las requests concurrentes no se puntúan de a una. Cada request
+valida sus eventos en el event loop y los encola; MicroBatcher junta lo que
+llegue durante SERVER_MAX_WAIT_MS (o hasta SERVER_MAX_BATCH eventos) y lo
+puntúa con una única llamada a predict_retry_success_batch en un hilo aparte.
+Mientras ese lote se puntúa, las requests siguientes se acumulan para el
+próximo, de modo que bajo carga el tamaño del lote crece solo.
+
+Varios procesos (--workers) cargan cada uno el modelo desde MODEL_PATH. Con
+un .pkl guardado sin compresión y MODEL_MMAP=true (por defecto) los arrays
+se mapean con joblib mmap_mode='r' y los workers comparten las mismas páginas
+del page cache en lugar de tener una copia cada uno. Un .npz no se puede
+mapear (np.load lee cada array completo) y queda una copia por worker.
+
+Con un registro de modelos (--registry o MODEL_REGISTRY_PATH/MODEL_REGISTRY_KEY)
+cada evento se puntúa con la versión que le toca (ver lambda_predict_reintento.py).
+La validación, que puede tener que cargar esa versión, corre entonces en un
+hilo aparte: mientras una versión nueva se carga, el event loop y el lote en
+curso siguen atendiendo a las versiones ya cargadas.
+
+Variables de entorno (además de las de lambda_predict_reintento.py):
+- MODEL_PATH: Modelo local (.pkl o .npz); sin ella se usa MODEL_BUCKET/MODEL_KEY
+  de S3, con la misma recarga en caliente que la Lambda
+- SERVER_MAX_WAIT_MS: Espera máxima para completar un lote, por defecto 2
+- SERVER_MAX_BATCH: Eventos máximos por lote, por defecto 256
+
+Uso:
+    pip install -r aws/server/requirements.txt
+    python aws/server/inference_server.py --model models/mejor_modelo.pkl --workers 4
+    python aws/server/inference_server.py --registry models/registro/registro.json
+    uvicorn inference_server:app --app-dir aws/server     # con MODEL_PATH en el entorno
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DIR_SERVER = os.path.dirname(os.path.abspath(__file__))
+DIR_LAMBDA = os.path.join(os.path.dirname(DIR_SERVER), 'lambda')
+
+MAX_WAIT_MS = float(os.environ.get('SERVER_MAX_WAIT_MS', '2'))
+MAX_BATCH = int(os.environ.get('SERVER_MAX_BATCH', '256'))
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+logger = logging.getLogger('inference_server')
+
+# Módulo de la Lambda; se importa en el arranque (lifespan) de cada worker,
+# después de que la CLI dejó la configuración en el entorno
+handler = None
+batcher: Optional['MicroBatcher'] = None
+
+
+# ============================================
+# Micro-batching
+# ============================================
+
+class MicroBatcher:
+    """
+    Junta los eventos de requests concurrentes y los puntúa en lotes.
+
+    score_fn recibe la lista de eventos de todo el lote y retorna un resultado
+    por evento, en el mismo orden; corre en un único hilo para no bloquear el
+    event loop.
+    """
+
+    def __init__(self, score_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 max_batch: int, max_wait_ms: float):
+        self.score_fn = score_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.queue: 'asyncio.Queue[Tuple[List[Dict[str, Any]], asyncio.Future]]' = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+        self.batches = 0
+        self.events = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Encola los eventos de una request y espera sus resultados."""
+        if not events:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((events, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[Dict[str, Any]], asyncio.Future]]:
+        """Espera la primera request y suma las que lleguen dentro de max_wait."""
+        loop = asyncio.get_running_loop()
+        entries = [await self.queue.get()]
+        n_events = len(entries[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while n_events < self.max_batch:
+            try:
+                entry = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            entries.append(entry)
+            n_events += len(entry[0])
+        return entries
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            entries = await self._collect()
+            events = [event for request_events, _ in entries for event in request_events]
+            try:
+                results = await loop.run_in_executor(self.executor, self.score_fn, events)
+            except Exception as e:
+                logger.error(f"Error al puntuar un lote de {len(events)} eventos: {str(e)}", exc_info=True)
+                for _, future in entries:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.events += len(events)
+            start = 0
+            for request_events, future in entries:
+                end = start + len(request_events)
+                if not future.done():
+                    future.set_result(results[start:end])
+                start = end
+
+
+def score_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Puntúa un lote con el modelo activo (verificando antes si hay versión
+    nueva). Un lote de un solo evento va por la ruta compilada sin pandas.
+    """
+    handler.refresh_model_if_stale()
+    if len(events) == 1:
+        return [handler.predict_retry_success(events[0])]
+    return handler.predict_retry_success_batch(events)
+
+
+# ============================================
+# Endpoints
+# ============================================
+
+async def _validate(fn: Callable, *args) -> Any:
+    """
+    Corre una validación del handler. Con registro puede cargar la versión del
+    evento, así que va a un hilo para no frenar el event loop.
+    """
+    if handler.get_registry() is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def predict(payload: Any) -> Tuple[int, Dict[str, Any]]:
+    """Evento simple o {"items": [...]}, con las mismas validaciones que la Lambda."""
+    if isinstance(payload, dict) and 'items' in payload:
+        items = payload['items']
+        error_msg = handler.check_batch_request(items)
+        if error_msg:
+            return 400, {'error': error_msg}
+        resultados, valid_idx = await _validate(handler.split_valid_items, items)
+        predictions = await batcher.submit([items[i] for i in valid_idx])
+        return 200, handler.build_batch_body(resultados, valid_idx, predictions)
+
+    if not isinstance(payload, dict):
+        return 400, {'error': 'El body debe ser un objeto JSON'}
+    is_valid, error_msg = await _validate(handler.validate_event, payload)
+    if not is_valid:
+        return 400, {'error': error_msg, 'evento_recibido': payload}
+    return 200, (await batcher.submit([payload]))[0]
+
+
+def health() -> Tuple[int, Dict[str, Any]]:
+    active = handler.get_active_model()
+    if active is None:
+        return 503, {'status': 'sin_modelo'}
+    body = {
+        'status': 'ok',
+        'model_version': active.version,
+        'threshold': active.threshold,
+        'pid': os.getpid(),
+        'lotes': batcher.batches,
+        'eventos': batcher.events,
+    }
+    registry = handler.get_registry()
+    if registry is not None:
+        body['registro'] = registry.stats()
+    return 200, body
+
+
+# ============================================
+# App ASGI
+# ============================================
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError(f"Body mayor a {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_json(send, status: int, body: Dict[str, Any]) -> None:
+    data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': data})
+
+
+async def _lifespan(receive, send) -> None:
+    global handler, batcher
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                if DIR_LAMBDA not in sys.path:
+                    sys.path.insert(0, DIR_LAMBDA)
+                import lambda_predict_reintento
+                handler = lambda_predict_reintento
+                if handler.get_active_model() is None:
+                    raise RuntimeError("No se pudo cargar el modelo")
+                batcher = MicroBatcher(score_events, MAX_BATCH, MAX_WAIT_MS)
+                batcher.start()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            logger.warning(
+                f"Worker {os.getpid()} listo: modelo {handler.get_active_model().version}, "
+                f"max_wait={MAX_WAIT_MS}ms, max_batch={MAX_BATCH}"
+            )
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if batcher is not None:
+                await batcher.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if path == '/health' and method == 'GET':
+        await _send_json(send, *health())
+        return
+    if path != '/predict':
+        await _send_json(send, 404, {'error': f'Ruta no encontrada: {path}'})
+        return
+    if method != 'POST':
+        await _send_json(send, 405, {'error': 'Usar POST /predict'})
+        return
+
+    try:
+        payload = json.loads(await _read_body(receive))
+    except ValueError as e:
+        await _send_json(send, 400, {'error': f'JSON inválido: {str(e)}'})
+        return
+
+    try:
+        status, body = await predict(payload)
+    except Exception as e:
+        logger.error(f"Error al procesar la predicción: {str(e)}", exc_info=True)
+        status, body = 500, {'error': f'Error interno en la predicción: {str(e)}'}
+    await _send_json(send, status, body)
+
+
+# ============================================
+# CLI
+# ============================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.environ.get('MODEL_PATH'),
+                        help='modelo local (.pkl o .npz); por defecto MODEL_PATH')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_PATH'),
+                        help='registro.json local con varias versiones (en lugar de --model)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='procesos que atienden requests (cada uno carga el modelo)')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='espera máxima para completar un lote')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH,
+                        help='eventos máximos por lote')
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'WARNING'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.model and not args.registry and not os.environ.get('MODEL_BUCKET'):
+        raise SystemExit("Indicar --model o --registry (o MODEL_PATH / MODEL_BUCKET en el entorno)")
+    if args.model and not os.path.isfile(args.model):
+        raise SystemExit(f"No existe el modelo: {args.model}")
+    if args.registry and not os.path.isfile(args.registry):
+        raise SystemExit(f"No existe el registro: {args.registry}")
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Falta uvicorn: pip install -r aws/server/requirements.txt")
+
+    # Los workers heredan la configuración por el entorno
+    if args.model:
+        os.environ['MODEL_PATH'] = os.path.abspath(args.model)
+    if args.registry:
+        os.environ['MODEL_REGISTRY_PATH'] = os.path.abspath(args.registry)
+    os.environ['SERVER_MAX_WAIT_MS'] = str(args.max_wait_ms)
+    os.environ['SERVER_MAX_BATCH'] = str(args.max_batch)
+    os.environ['LOG_LEVEL'] = args.log_level.upper()
+
+    uvicorn.run(
+        'inference_server:app', app_dir=DIR_SERVER, host=args.host, port=args.port,
+        workers=args.workers, log_level=args.log_level.lower(), access_log=False,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark y chequeo de equivalencia de construir_pares.
+
+Compara la implementación columnar de ejecutar-evaluacion-algoritmos.py con
+la implementación original (bucle por suscripción con iloc), incluida abajo
+como referencia:
+1. Equivalencia: varias semillas de datos aleatorios (incluye 201 seguidos,
+   rachas de fallos, suscripciones de 1 intento y fechas repetidas).
+2. Escalabilidad: tiempo de ambas versiones según el número de filas.
+
+Uso:
+    python benchmarks/bench_construir_pares.py
+    python benchmarks/bench_construir_pares.py --filas 10000 100000 1000000 --sin-referencia
+"""
+
+import argparse
+import importlib.util
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_spec = importlib.util.spec_from_file_location(
+    "evaluacion", os.path.join(RAIZ, "ejecutar-evaluacion-algoritmos.py")
+)
+evaluacion = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(evaluacion)
+
+
+# ==============================
+# Implementación de referencia (original)
+# ==============================
+
+def construir_pares_referencia(df: pd.DataFrame) -> pd.DataFrame:
+    pares = []
+    for sid, g in df.groupby("id_suscripcion"):
+        g = g.sort_values("fecha").reset_index(drop=True)
+        i = 0
+        while i < len(g) - 1:
+            fail = g.iloc[i]
+            if int(fail["http_status_code"]) == 201:
+                i += 1
+                continue
+            second = g.iloc[i + 1]
+            pares.append(
+                {
+                    "id_suscripcion": sid,
+                    "fecha_fail": fail["fecha"],
+                    "fecha_second": second["fecha"],
+                    "monto": float(fail["monto"]),
+                    "http_fail": int(fail["http_status_code"]),
+                    "detalle_fail": str(fail["detalle"]),
+                    "http_second": int(second["http_status_code"]),
+                }
+            )
+            i += 2
+
+    df_pares = pd.DataFrame(pares)
+    if df_pares.empty:
+        raise ValueError("No se encontraron pares (fallo + segundo intento).")
+
+    df_pares["target_exito_second"] = (df_pares["http_second"] == 201).astype(int)
+    df_pares["delta_horas"] = (
+        df_pares["fecha_second"] - df_pares["fecha_fail"]
+    ).dt.total_seconds() / 3600.0
+    df_pares["delta_horas"] = df_pares["delta_horas"].clip(lower=0)
+    df_pares["retry_hour"] = df_pares["fecha_second"].dt.hour
+    df_pares["retry_dayofweek"] = df_pares["fecha_second"].dt.dayofweek
+    df_pares["retry_is_weekend"] = df_pares["retry_dayofweek"].isin([5, 6]).astype(int)
+
+    def cat_http(code: int) -> str:
+        if 400 <= code < 500:
+            return "cliente_4xx"
+        elif 500 <= code < 600:
+            return "servicio_5xx"
+        elif code == 201:
+            return "exito_201"
+        else:
+            return f"otro_{int(code)}"
+
+    df_pares["error_categoria"] = df_pares["http_fail"].apply(cat_http)
+
+    def bucket_hora(h: int) -> str:
+        if 0 <= h < 6:
+            return "madrugada"
+        elif 6 <= h < 12:
+            return "manana"
+        elif 12 <= h < 18:
+            return "tarde"
+        else:
+            return "noche"
+
+    df_pares["retry_hora_bucket"] = df_pares["retry_hour"].apply(bucket_hora)
+
+    return df_pares
+
+
+# ==============================
+# Datos aleatorios
+# ==============================
+
+def generar_intentos(n_filas: int, seed: int, max_intentos: int = 12) -> pd.DataFrame:
+    """
+    Log de intentos ya limpio (como el que retorna cargar_y_limpiar). Con
+    max_intentos <= 16 el sort por grupo de la referencia es estable, así que
+    las fechas repetidas dan el mismo orden en ambas versiones.
+    """
+    rng = np.random.default_rng(seed)
+    tam = rng.integers(1, max_intentos + 1, size=max(1, n_filas // ((max_intentos + 1) // 2)))
+    tam = tam[np.cumsum(tam) <= n_filas] if tam.sum() > n_filas else tam
+    n = int(tam.sum())
+
+    ids = np.repeat(np.arange(len(tam)), tam)
+    base = pd.Timestamp("2025-01-01")
+    # resolución de 1 hora en un rango corto: genera fechas repetidas
+    fecha = base + pd.to_timedelta(rng.integers(0, 24 * 60, size=n), unit="h")
+    status = rng.choice([201, 400, 402, 404, 500, 503, 302], size=n, p=[0.35, 0.2, 0.1, 0.1, 0.1, 0.1, 0.05])
+    detalle = rng.choice(["Fondos insuficientes", "Tarjeta vencida", "Timeout", "", "Rechazo"], size=n)
+
+    df = pd.DataFrame({
+        "id_suscripcion": ids,
+        "fecha": fecha,
+        "monto": rng.uniform(5, 500, size=n).round(2),
+        "http_status_code": status.astype(float),
+        "detalle": detalle,
+    })
+    return df.sort_values(["id_suscripcion", "fecha"]).reset_index(drop=True)
+
+
+def verificar_equivalencia(semillas: int = 20, n_filas: int = 3000) -> None:
+    for seed in range(semillas):
+        df = generar_intentos(n_filas, seed)
+        esperado = construir_pares_referencia(df)
+        obtenido = evaluacion.construir_pares(df)
+        pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=True)
+    print(f"✓ Equivalencia verificada en {semillas} semillas de {n_filas} filas")
+
+
+def medir(fn, df: pd.DataFrame) -> float:
+    t0 = time.perf_counter()
+    fn(df)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--sin-referencia", action="store_true",
+                        help="no medir la implementación original (lenta en tamaños grandes)")
+    args = parser.parse_args()
+
+    verificar_equivalencia()
+
+    print(f"\n{'filas':>12} {'referencia (s)':>16} {'columnar (s)':>14} {'speedup':>9}")
+    for n in args.filas:
+        df = generar_intentos(n, seed=0)
+        t_new = medir(evaluacion.construir_pares, df)
+        if args.sin_referencia:
+            print(f"{len(df):>12} {'-':>16} {t_new:>14.3f} {'-':>9}")
+        else:
+            t_ref = medir(construir_pares_referencia, df)
+            print(f"{len(df):>12} {t_ref:>16.3f} {t_new:>14.3f} {t_ref / t_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Memoria de la validación cruzada en paralelo: matriz compartida vs. copias.
+
+Arma X_train desde un log sintético (log_sintetico.py) como main() de
+ejecutar-evaluacion-algoritmos.py y corre la CV de las familias de --modelos
+con cada cantidad de --jobs, de dos formas:
+
+- compartida: validacion_cruzada_compartida (la matriz codificada se escribe
+  una vez en un .npy y los procesos ajustan sobre vistas mapeadas).
+- copias: cada tarea (familia x fold) recibe X_train por pickle y ajusta el
+  Pipeline completo (preprocesador incluido) sobre su fold.
+
+Cada corrida va en un subproceso limpio; un hilo muestrea cada 50 ms la
+suma de PSS (/proc/<pid>/smaps_rollup) del proceso y todos sus
+descendientes. PSS reparte las páginas compartidas entre los procesos que
+las mapean, así que la matriz mapeada se cuenta una sola vez. Solo Linux.
+
+Uso:
+    python benchmarks/bench_cv_compartida.py
+    python benchmarks/bench_cv_compartida.py --filas 2000000 --jobs 1 2 4 --salida cv.json
+    python benchmarks/bench_cv_compartida.py --modelos random_forest xgboost --folds 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from log_sintetico import generar_log
+
+MODOS = ("compartida", "copias")
+
+
+def _pss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linea in f:
+                if linea.startswith("Pss:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:  # el proceso terminó
+        pass
+    return 0.0
+
+
+def _descendientes(pid: int) -> List[int]:
+    hijos: Dict[int, List[int]] = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        hijos.setdefault(int(campos[1]), []).append(int(entrada))
+    pendientes, encontrados = [pid], []
+    while pendientes:
+        actual = pendientes.pop()
+        for hijo in hijos.get(actual, []):
+            encontrados.append(hijo)
+            pendientes.append(hijo)
+    return encontrados
+
+
+class MuestreadorPSS:
+    """Pico de la suma de PSS del proceso actual y sus descendientes."""
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.pico_mb = 0.0
+        self.max_procesos = 1
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self) -> None:
+        propio = os.getpid()
+        while not self._parar.is_set():
+            pids = [propio] + _descendientes(propio)
+            self.pico_mb = max(self.pico_mb, sum(_pss_mb(p) for p in pids))
+            self.max_procesos = max(self.max_procesos, len(pids))
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+
+def _ajustar_fold_copia(nombre: str, modelo, X_train, y_train, fold: int, train, test) -> Dict:
+    from sklearn.base import clone
+    from sklearn.metrics import roc_auc_score
+
+    modelo = clone(modelo)
+    if "clf__n_jobs" in modelo.get_params():
+        modelo.set_params(clf__n_jobs=1)
+    modelo.fit(X_train.iloc[train], y_train.iloc[train])
+    proba = modelo.predict_proba(X_train.iloc[test])[:, 1]
+    return {"modelo": nombre, "fold": fold, "auc_roc": roc_auc_score(y_train.iloc[test], proba)}
+
+
+def cv_copias(modelos, X_train, y_train, familias, cv_folds: int, jobs: int) -> List[Dict]:
+    """Referencia: CV en un pool de procesos pasando X_train (DataFrame) a cada tarea."""
+    import joblib
+    from sklearn.model_selection import StratifiedKFold
+
+    cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
+    folds = list(cv.split(np.zeros(len(y_train)), y_train))
+    return joblib.Parallel(n_jobs=jobs, backend="loky")(
+        joblib.delayed(_ajustar_fold_copia)(nombre, modelos[nombre], X_train, y_train, i, train, test)
+        for nombre in familias for i, (train, test) in enumerate(folds)
+    )
+
+
+def medir(path_log: str, modo: str, jobs: int, familias: List[str], cv_folds: int) -> Dict:
+    """X_train desde path_log y una corrida de CV en este proceso."""
+    from sklearn.model_selection import train_test_split
+
+    from bench_construir_pares import evaluacion
+
+    df_pares = evaluacion.construir_pares(evaluacion.cargar_y_limpiar(path_log))
+    X, y, num_cols, cat_cols = evaluacion.preparar_features(df_pares)
+    del df_pares
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    del X, y
+    modelos = evaluacion.construir_modelos(num_cols, cat_cols)
+
+    with tempfile.TemporaryDirectory(prefix="bench_cv_") as dir_cache, MuestreadorPSS() as muestreador:
+        base_mb = _pss_mb(os.getpid())
+        t0 = time.perf_counter()
+        if modo == "compartida":
+            res = evaluacion.validacion_cruzada_compartida(
+                modelos, num_cols, cat_cols, X_train, y_train,
+                cv_folds=cv_folds, jobs=jobs, familias=familias, dir_cache=dir_cache,
+            ).to_dict("records")
+        else:
+            res = cv_copias(modelos, X_train, y_train, familias, cv_folds, jobs)
+        segundos = time.perf_counter() - t0
+
+    return {
+        "modo": modo,
+        "jobs": jobs,
+        "filas_train": len(X_train),
+        "segundos": round(segundos, 2),
+        "pss_inicio_mb": round(base_mb, 1),
+        "pss_pico_mb": round(muestreador.pico_mb, 1),
+        "procesos": muestreador.max_procesos,
+        "auc_media": round(float(np.mean([r["auc_roc"] for r in res])), 4),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000, help="intentos del log sintético")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modelos", nargs="+", default=["xgboost"],
+                        help="familias de la CV (random_forest, xgboost)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="archivo JSON de resultados")
+    parser.add_argument("--medir", default=None, help=argparse.SUPPRESS)  # uso interno (subproceso)
+    parser.add_argument("--modo", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.medir:
+        json.dump(medir(args.medir, args.modo, args.jobs[0], args.modelos, args.folds), sys.stdout)
+        return
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="bench_cv_log_") as tmp:
+        path_log = os.path.join(tmp, "intentos.parquet")
+        generar_log(filas=args.filas, seed=args.seed).to_parquet(path_log, index=False)
+
+        print(f"{'modo':<12} {'jobs':>5} {'procesos':>9} {'seg':>9} {'PSS inicio MB':>14} {'PSS pico MB':>12} {'AUC':>7}")
+        for jobs in args.jobs:
+            for modo in args.modos:
+                salida = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--medir", path_log, "--modo", modo,
+                     "--jobs", str(jobs), "--folds", str(args.folds), "--modelos", *args.modelos],
+                    check=True, stdout=subprocess.PIPE, text=True,
+                ).stdout
+                r = json.loads(salida.strip().splitlines()[-1])
+                resultados.append(r)
+                print(f"{r['modo']:<12} {r['jobs']:>5} {r['procesos']:>9} {r['segundos']:>9.1f} "
+                      f"{r['pss_inicio_mb']:>14.1f} {r['pss_pico_mb']:>12.1f} {r['auc_media']:>7.4f}")
+
+    if args.salida:
+        from bench_inferencia import commit_actual, entorno
+
+        reporte = {
+            "commit": commit_actual(),
+            "entorno": entorno(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("salida", "medir", "modo")},
+            "resultados": resultados,
+        }
+        with open(args.salida, "w") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
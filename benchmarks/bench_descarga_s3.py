@@ -0,0 +1,331 @@
+"""
+Descarga del modelo desde S3: un GET secuencial vs. GETs por rangos en paralelo.
+
+Levanta un S3 local (un servidor HTTP con el subconjunto de la API que usa
+la Lambda: GET con Range e If-Match, HEAD) que sirve los objetos desde una
+carpeta temporal, con latencia por request y ancho de banda por conexión
+configurables para parecerse a S3 visto desde una Lambda (por defecto 20 ms
+hasta el primer byte y 90 MB/s por conexión; --mb-s-conexion 0 quita el
+límite y mide solo el costo de CPU local). boto3 se conecta con
+endpoint_url y credenciales ficticias.
+
+Para cada objeto mide:
+- get_simple: un get_object leído por bloques a un archivo (la descarga
+  anterior de la Lambda), sin checksum.
+- rangos xN: s3_fetch.fetch_to_file con N GETs en paralelo y verificación
+  SHA-256 (metadato sha256 del objeto), que es lo que hace ahora la Lambda.
+
+Con --archivo se sirve un modelo real (ej. models/mejor_modelo.pkl) en lugar
+de bytes aleatorios y, además, se mide el arranque en frío completo de
+lambda_predict_reintento.py (import, descarga, deserialización) en un
+subproceso por concurrencia.
+
+Uso:
+    python benchmarks/bench_descarga_s3.py
+    python benchmarks/bench_descarga_s3.py --mb 16 150 --concurrencia 1 4 8 16
+    python benchmarks/bench_descarga_s3.py --archivo models/mejor_modelo.pkl --salida descarga.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bench_inferencia import DIR_LAMBDA
+
+sys.path.insert(0, DIR_LAMBDA)
+from s3_fetch import fetch_to_file  # noqa: E402
+
+BUCKET = "bench-modelos"
+BLOQUE_ENVIO = 64 * 1024
+
+
+# ============================================
+# S3 local
+# ============================================
+
+class _ManejadorS3(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # conexiones persistentes, como S3
+
+    def log_message(self, *args):
+        pass
+
+    def _error(self, status: int, code: str) -> None:
+        body = f"<Error><Code>{code}</Code><Message>{code}</Message></Error>".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _responder(self) -> None:
+        servidor = self.server
+        _, bucket, key = self.path.split("?", 1)[0].split("/", 2)
+        objeto = servidor.objetos.get(key) if bucket == BUCKET else None
+        time.sleep(servidor.latencia_s)
+        if objeto is None:
+            self._error(404, "NoSuchKey")
+            return
+        if self.headers.get("If-Match") not in (None, objeto["etag"]):
+            self._error(412, "PreconditionFailed")
+            return
+
+        tamano = objeto["bytes"]
+        inicio, fin, status = 0, tamano - 1, 200
+        rango = self.headers.get("Range")
+        if rango:
+            m = re.fullmatch(r"bytes=(\d+)-(\d*)", rango)
+            inicio = int(m.group(1))
+            fin = min(int(m.group(2)) if m.group(2) else tamano - 1, tamano - 1)
+            if inicio >= tamano:
+                self._error(416, "InvalidRange")
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(fin - inicio + 1))
+        self.send_header("ETag", objeto["etag"])
+        self.send_header("Last-Modified", formatdate(usegmt=True))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("x-amz-meta-sha256", objeto["sha256"])
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamano}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        with open(objeto["path"], "rb") as f:
+            f.seek(inicio)
+            restante = fin - inicio + 1
+            t0, enviados = time.perf_counter(), 0
+            while restante > 0:
+                bloque = f.read(min(BLOQUE_ENVIO, restante))
+                self.wfile.write(bloque)
+                restante -= len(bloque)
+                enviados += len(bloque)
+                if servidor.bytes_s:
+                    atraso = enviados / servidor.bytes_s - (time.perf_counter() - t0)
+                    if atraso > 0:
+                        time.sleep(atraso)
+
+    do_GET = _responder
+    do_HEAD = _responder
+
+
+class S3Local:
+    """Servidor S3 local en un hilo; objetos servidos desde archivos."""
+
+    def __init__(self, latencia_ms: float, mb_s_conexion: float):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorS3)
+        self.servidor.daemon_threads = True
+        self.servidor.objetos = {}
+        self.servidor.latencia_s = latencia_ms / 1000
+        self.servidor.bytes_s = mb_s_conexion * 1e6
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def agregar(self, key: str, path: str) -> Dict:
+        md5, sha256 = hashlib.md5(), hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                md5.update(bloque)
+                sha256.update(bloque)
+        objeto = {"path": path, "bytes": os.path.getsize(path),
+                  "etag": f'"{md5.hexdigest()}"', "sha256": sha256.hexdigest()}
+        self.servidor.objetos[key] = objeto
+        return objeto
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def cliente_s3(url: str, conexiones: int):
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3", endpoint_url=url, region_name="us-east-1",
+        aws_access_key_id="bench", aws_secret_access_key="bench",
+        config=Config(s3={"addressing_style": "path"}, max_pool_connections=max(10, conexiones + 1)),
+    )
+
+
+# ============================================
+# Mediciones
+# ============================================
+
+def descarga_simple(cliente, key: str, destino: str) -> Dict:
+    """Referencia: un get_object leído por bloques de 1 MiB a un archivo."""
+    t0 = time.perf_counter()
+    respuesta = cliente.get_object(Bucket=BUCKET, Key=key)
+    n = 0
+    with open(destino, "wb") as f:
+        for bloque in respuesta["Body"].iter_chunks(chunk_size=1024 * 1024):
+            f.write(bloque)
+            n += len(bloque)
+    return {"bytes": n, "parts": 1, "download_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "checksum": None, "checksum_ms": 0.0}
+
+
+def medir_descargas(s3: S3Local, key: str, concurrencias: List[int], part_mb: float,
+                    repeticiones: int, dir_destino: str) -> List[Dict]:
+    cliente = cliente_s3(s3.url, max(concurrencias))
+    destino = os.path.join(dir_destino, "modelo.bin")
+    esperado = s3.servidor.objetos[key]["sha256"]
+    metodos = [("get_simple", None)] + [(f"rangos x{c}", c) for c in concurrencias]
+
+    filas = []
+    for metodo, concurrencia in metodos:
+        tiempos, stats = [], None
+        for _ in range(repeticiones):
+            if os.path.exists(destino):
+                os.remove(destino)
+            if concurrencia is None:
+                stats = descarga_simple(cliente, key, destino)
+            else:
+                stats = fetch_to_file(cliente, BUCKET, key, destino, concurrency=concurrencia,
+                                      part_size=int(part_mb * 1024 * 1024))
+            tiempos.append(stats["download_ms"])
+        if concurrencia is not None:
+            with open(destino, "rb") as f:
+                assert hashlib.sha256(f.read()).hexdigest() == esperado
+        ms = float(np.median(tiempos))
+        filas.append({
+            "metodo": metodo,
+            "partes": stats["parts"],
+            "ms": round(ms, 1),
+            "mb_s": round(stats["bytes"] / 1e6 / (ms / 1000), 1),
+            "checksum": stats["checksum"],
+            "checksum_ms": stats["checksum_ms"],
+        })
+    return filas
+
+
+_SCRIPT_ARRANQUE = """
+import json, sys
+sys.path.insert(0, {dir_lambda!r})
+import lambda_predict_reintento as h
+assert h.get_active_model() is not None
+print(json.dumps(h._cold_start_timings))
+"""
+
+
+def medir_arranque(s3: S3Local, key: str, concurrencia: int, part_mb: float, dir_cache: str) -> Dict:
+    """Arranque en frío de la Lambda (import del handler con el modelo en el S3 local)."""
+    shutil.rmtree(dir_cache, ignore_errors=True)
+    entorno_lambda = dict(
+        os.environ,
+        MODEL_BUCKET=BUCKET, MODEL_KEY=key, MODEL_CACHE_DIR=dir_cache,
+        AWS_ENDPOINT_URL_S3=s3.url, AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench",
+        AWS_DEFAULT_REGION="us-east-1",
+        MODEL_DOWNLOAD_CONCURRENCY=str(concurrencia), MODEL_DOWNLOAD_PART_MB=str(part_mb),
+        LOG_LEVEL="WARNING", METRICS_ENABLED="false",
+    )
+    t0 = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_ARRANQUE.format(dir_lambda=DIR_LAMBDA)],
+        check=True, stdout=subprocess.PIPE, text=True, env=entorno_lambda,
+    ).stdout
+    tiempos = json.loads(salida.strip().splitlines()[-1])
+    tiempos["proceso_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return tiempos
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[4, 64, 256],
+                        help="tamaños de los objetos aleatorios (MB)")
+    parser.add_argument("--archivo", default=None,
+                        help="modelo real a servir (en lugar de --mb); mide también el arranque en frío")
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--part-mb", type=float, default=8, help="tamaño de cada GET por rangos (MiB)")
+    parser.add_argument("--latencia-ms", type=float, default=20, help="latencia por request del S3 local")
+    parser.add_argument("--mb-s-conexion", type=float, default=90,
+                        help="ancho de banda por conexión del S3 local (MB/s); 0 sin límite")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default=None, help="archivo JSON de resultados")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    resultados, arranques = [], []
+
+    with tempfile.TemporaryDirectory(prefix="bench_s3_") as tmp, \
+            S3Local(args.latencia_ms, args.mb_s_conexion) as s3:
+        objetos: Dict[str, Optional[float]] = {}
+        if args.archivo:
+            key = "models/" + os.path.basename(args.archivo)
+            s3.agregar(key, os.path.abspath(args.archivo))
+            objetos[key] = None
+        else:
+            rng = np.random.default_rng(0)
+            for mb in args.mb:
+                path = os.path.join(tmp, f"objeto_{mb:g}mb.bin")
+                with open(path, "wb") as f:
+                    f.write(rng.bytes(int(mb * 1e6)))
+                key = f"models/objeto_{mb:g}mb.bin"
+                s3.agregar(key, path)
+                objetos[key] = mb
+
+        print(f"S3 local: latencia {args.latencia_ms:g} ms, "
+              f"{args.mb_s_conexion:g} MB/s por conexión" if args.mb_s_conexion
+              else f"S3 local: latencia {args.latencia_ms:g} ms, sin límite de ancho de banda")
+        for key in objetos:
+            mb = s3.servidor.objetos[key]["bytes"] / 1e6
+            filas = medir_descargas(s3, key, args.concurrencia, args.part_mb, args.repeticiones, tmp)
+            base = filas[0]["ms"]
+            print(f"\n=== {key} ({mb:.1f} MB, partes de {args.part_mb:g} MiB) ===")
+            print(f"{'método':<14} {'partes':>7} {'ms':>9} {'MB/s':>8} {'checksum ms':>12} {'speedup':>8}")
+            for f in filas:
+                print(f"{f['metodo']:<14} {f['partes']:>7} {f['ms']:>9.1f} {f['mb_s']:>8.1f} "
+                      f"{f['checksum_ms']:>12.1f} {base / f['ms']:>7.2f}x")
+            resultados.append({"key": key, "mb": round(mb, 1), "descargas": filas})
+
+        if args.archivo:
+            key = next(iter(objetos))
+            print("\n=== Arranque en frío de la Lambda (cold_start) ===")
+            print(f"{'concurrencia':>12} {'descarga ms':>12} {'MB/s':>8} {'checksum ms':>12} "
+                  f"{'deserializar ms':>16} {'proceso ms':>11}")
+            for c in args.concurrencia:
+                t = medir_arranque(s3, key, c, args.part_mb, os.path.join(tmp, "cache_lambda"))
+                arranques.append({"concurrencia": c, **t})
+                print(f"{c:>12} {t['download_ms']:>12.1f} {t['download_mb_s']:>8.1f} {t['checksum_ms']:>12.1f} "
+                      f"{t['deserialize_ms']:>16.1f} {t['proceso_ms']:>11.1f}")
+
+    if args.salida:
+        from bench_inferencia import commit_actual, entorno
+
+        reporte = {
+            "commit": commit_actual(),
+            "entorno": entorno(),
+            "config": {k: v for k, v in vars(args).items() if k != "salida"},
+            "resultados": resultados,
+            "arranque_en_frio": arranques,
+        }
+        with open(args.salida, "w") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
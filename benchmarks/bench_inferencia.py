@@ -0,0 +1,430 @@
+"""
+Micro-benchmark de la ruta de inferencia (aws/lambda/lambda_predict_reintento.py).
+
+Carga el handler con un modelo desde un archivo local: S3 se reemplaza por
+S3Local, que atiende head_object/get_object (con Range e IfMatch, como los
+pide la descarga por rangos de s3_fetch) leyendo del disco, así que no hace
+falta red ni credenciales. Para cada modelo y cada tamaño de batch mide
+latencia (p50/p95/p99) y throughput de:
+- validate_event              (validate_events sobre todo el batch si batch > 1)
+- prepare_features_dataframe  (prepare_features_dataframe_batch si batch > 1)
+- predict_retry_success       (predict_retry_success_batch si batch > 1)
+- lambda_handler              (evento simple o payload {"items": [...]})
+
+Sin --modelos se entrenan las familias de ejecutar-evaluacion-algoritmos.py
+(logistic_regression, random_forest y xgboost si está instalado) sobre pares
+sintéticos; con --portable se mide además su exportación .npz. El resultado
+se escribe en JSON con el commit y las versiones de las librerías, para
+comparar corridas entre commits con --comparar.
+
+Uso:
+    python benchmarks/bench_inferencia.py
+    python benchmarks/bench_inferencia.py --batch 1 10 100 1000 --salida actual.json
+    python benchmarks/bench_inferencia.py --modelos rf=models/mejor_modelo.pkl
+    python benchmarks/bench_inferencia.py --portable
+    python benchmarks/bench_inferencia.py --salida nuevo.json --comparar actual.json
+"""
+
+import argparse
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from bench_construir_pares import RAIZ, evaluacion, generar_intentos
+
+DIR_LAMBDA = os.path.join(RAIZ, "aws", "lambda")
+BUCKET_LOCAL = "bench-local"
+KEY_MODELO = "models/mejor_modelo"
+
+PERCENTILES = (50, 95, 99)
+
+
+# ==============================
+# S3 local (sustituto de boto3)
+# ==============================
+
+class _BodyLocal:
+    """Bytes [inicio, fin] (inclusive) del archivo, leídos por bloques."""
+
+    def __init__(self, path: str, inicio: int, fin: int):
+        self.path = path
+        self.inicio = inicio
+        self.fin = fin
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024):
+        with open(self.path, "rb") as f:
+            f.seek(self.inicio)
+            restante = self.fin - self.inicio + 1
+            while restante > 0:
+                chunk = f.read(min(chunk_size, restante))
+                if not chunk:
+                    return
+                restante -= len(chunk)
+                yield chunk
+
+
+class _ErrorS3(Exception):
+    """Error con la forma de botocore.exceptions.ClientError (response["Error"]["Code"])."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class S3Local:
+    """
+    Cliente S3 mínimo: cada objeto bucket/key es el archivo raiz/key.
+    get_object atiende Range e IfMatch y responde ContentLength, ContentRange
+    y ETag (el MD5 del contenido, como un PUT simple), que es lo que usa
+    s3_fetch.fetch_to_file.
+    """
+
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+        self._etags: Dict[Tuple[str, int, int], str] = {}
+
+    def _path(self, Key: str) -> str:
+        return os.path.join(self.raiz, Key)
+
+    def _etag(self, path: str, st: os.stat_result) -> str:
+        # MD5 calculado una vez por versión del archivo (MODEL_CHECK_TTL=0 hace un head por invocación)
+        clave = (path, st.st_mtime_ns, st.st_size)
+        if clave not in self._etags:
+            md5 = hashlib.md5()
+            with open(path, "rb") as f:
+                for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(bloque)
+            self._etags[clave] = f'"{md5.hexdigest()}"'
+        return self._etags[clave]
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        path = self._path(Key)
+        st = os.stat(path)
+        return {"ETag": self._etag(path, st), "ContentLength": st.st_size}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None,
+                   IfMatch: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        path = self._path(Key)
+        st = os.stat(path)
+        etag = self._etag(path, st)
+        if IfMatch is not None and IfMatch != etag:
+            raise _ErrorS3("PreconditionFailed")
+
+        tamano = st.st_size
+        respuesta = {"ETag": etag}
+        inicio, fin = 0, tamano - 1
+        if Range is not None:
+            desde, _, hasta = Range.removeprefix("bytes=").partition("-")
+            inicio = int(desde)
+            fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+            if inicio >= tamano:
+                raise _ErrorS3("InvalidRange")
+            respuesta["ContentRange"] = f"bytes {inicio}-{fin}/{tamano}"
+        respuesta["ContentLength"] = fin - inicio + 1
+        respuesta["Body"] = _BodyLocal(path, inicio, fin)
+        return respuesta
+
+
+def cargar_handler(path_modelo: str, dir_trabajo: str):
+    """
+    Importa lambda_predict_reintento sirviendo path_modelo desde S3Local.
+    Cada llamada crea una instancia nueva del módulo (un contenedor nuevo).
+    """
+    raiz_s3 = os.path.join(dir_trabajo, "s3")
+    # la extensión decide el formato (.pkl o .npz portable) en el handler
+    key = KEY_MODELO + os.path.splitext(path_modelo)[1]
+    destino = os.path.join(raiz_s3, key)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    if os.path.lexists(destino):
+        os.remove(destino)
+    os.symlink(os.path.abspath(path_modelo), destino)
+
+    os.environ.update({
+        "MODEL_BUCKET": BUCKET_LOCAL,
+        "MODEL_KEY": key,
+        "MODEL_CACHE_DIR": os.path.join(dir_trabajo, "cache"),
+        "MODEL_CHECK_TTL": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    boto3_local = types.ModuleType("boto3")
+    boto3_local.client = lambda servicio, **kwargs: S3Local(raiz_s3)
+
+    if DIR_LAMBDA not in sys.path:
+        sys.path.insert(0, DIR_LAMBDA)
+    boto3_real = sys.modules.get("boto3")
+    sys.modules["boto3"] = boto3_local
+    try:
+        sys.modules.pop("lambda_predict_reintento", None)
+        handler = importlib.import_module("lambda_predict_reintento")
+    finally:
+        if boto3_real is not None:
+            sys.modules["boto3"] = boto3_real
+        else:
+            sys.modules.pop("boto3", None)
+
+    if handler.get_active_model() is None:
+        raise RuntimeError(f"No se pudo cargar el modelo {path_modelo}")
+    return handler
+
+
+# ==============================
+# Modelos y eventos de prueba
+# ==============================
+
+def datos_sinteticos(n_filas: int, seed: int):
+    df_pares = evaluacion.construir_pares(generar_intentos(n_filas, seed))
+    X, y, num_cols, cat_cols = evaluacion.preparar_features(df_pares)
+    return X, y, num_cols, cat_cols
+
+
+def entrenar_modelos(X, y, num_cols, cat_cols, dir_salida: str, portable: bool = False) -> Dict[str, str]:
+    """
+    Entrena las familias del script principal y las guarda como .pkl. Con
+    portable=True también se exporta cada una a .npz como "<nombre>_portable".
+    """
+    rutas = {}
+    for nombre, modelo in evaluacion.construir_modelos(num_cols, cat_cols).items():
+        t0 = time.perf_counter()
+        modelo.fit(X, y)
+        rutas[nombre] = os.path.join(dir_salida, f"{nombre}.pkl")
+        joblib.dump(modelo, rutas[nombre], compress=0)
+        print(f"  {nombre}: entrenado en {time.perf_counter() - t0:.1f}s")
+        if portable:
+            rutas[f"{nombre}_portable"] = os.path.join(dir_salida, f"{nombre}.npz")
+            evaluacion.exportar_modelo_portable(modelo, rutas[f"{nombre}_portable"], X)
+    return rutas
+
+
+def eventos_desde_features(X, n: int, seed: int) -> List[Dict[str, Any]]:
+    """Eventos como los que recibe la Lambda (tipos nativos de Python)."""
+    idx = np.random.default_rng(seed).integers(0, len(X), size=n)
+    registros = X.iloc[idx].to_dict(orient="records")
+    return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in r.items()} for r in registros]
+
+
+# ==============================
+# Medición
+# ==============================
+
+def medir_llamadas(fn: Callable[[], Any], repeticiones: int, calentamiento: int) -> np.ndarray:
+    """
+    Latencia (ms) de cada una de las repeticiones de fn(). Las líneas EMF que
+    el handler escribe en stdout se descartan (se mide su costo, no se imprimen).
+    """
+    tiempos = np.empty(repeticiones, dtype=np.float64)
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for _ in range(calentamiento):
+            fn()
+        for i in range(repeticiones):
+            t0 = time.perf_counter_ns()
+            fn()
+            tiempos[i] = time.perf_counter_ns() - t0
+    return tiempos / 1e6
+
+
+def resumir(tiempos_ms: np.ndarray, batch: int) -> Dict[str, float]:
+    resumen = {f"p{p}_ms": round(float(np.percentile(tiempos_ms, p)), 4) for p in PERCENTILES}
+    resumen["media_ms"] = round(float(tiempos_ms.mean()), 4)
+    resumen["throughput_eventos_s"] = round(batch * len(tiempos_ms) / (tiempos_ms.sum() / 1000.0), 1)
+    return resumen
+
+
+def llamadas_por_funcion(handler, eventos: List[Dict[str, Any]]) -> Dict[str, Callable[[], Any]]:
+    """Una llamada por función para procesar el batch completo de eventos."""
+    if len(eventos) == 1:
+        evento = eventos[0]
+        return {
+            "validate_event": lambda: handler.validate_event(evento),
+            "prepare_features_dataframe": lambda: handler.prepare_features_dataframe(evento),
+            "predict_retry_success": lambda: handler.predict_retry_success(evento),
+            "lambda_handler": lambda: handler.lambda_handler(evento, None),
+        }
+    payload = {"items": eventos}
+    return {
+        "validate_event": lambda: handler.validate_events(eventos),
+        "prepare_features_dataframe": lambda: handler.prepare_features_dataframe_batch(eventos),
+        "predict_retry_success": lambda: handler.predict_retry_success_batch(eventos),
+        "lambda_handler": lambda: handler.lambda_handler(payload, None),
+    }
+
+
+def repeticiones_para(batch: int, repeticiones: int, max_eventos: int) -> int:
+    """Limita el total de eventos por medición en batches grandes (mínimo 20 repeticiones)."""
+    return max(20, min(repeticiones, max_eventos // batch))
+
+
+def benchmark_modelo(nombre: str, path_modelo: str, X, batches: List[int], args) -> List[Dict[str, Any]]:
+    with tempfile.TemporaryDirectory(prefix="bench_inferencia_") as dir_trabajo:
+        handler = cargar_handler(path_modelo, dir_trabajo)
+        activo = handler.get_active_model()
+        print(f"\n=== {nombre} (ruta compilada: {activo.scorer is not None}) ===")
+        print(f"{'función':<28} {'batch':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'eventos/s':>11}")
+
+        # la primera respuesta lleva cold_start; no debe caer dentro de la medición
+        medir_llamadas(lambda: handler.lambda_handler(eventos_desde_features(X, 1, args.seed)[0], None), 1, 0)
+
+        resultados = []
+        for batch in batches:
+            eventos = eventos_desde_features(X, batch, args.seed + batch)
+            reps = repeticiones_para(batch, args.repeticiones, args.max_eventos)
+            for funcion, fn in llamadas_por_funcion(handler, eventos).items():
+                tiempos = medir_llamadas(fn, reps, args.calentamiento)
+                fila = {
+                    "modelo": nombre,
+                    "funcion": funcion,
+                    "batch": batch,
+                    "repeticiones": reps,
+                    "ruta_compilada": activo.scorer is not None,
+                    **resumir(tiempos, batch),
+                }
+                resultados.append(fila)
+                print(f"{funcion:<28} {batch:>6} {fila['p50_ms']:>9.3f} {fila['p95_ms']:>9.3f} "
+                      f"{fila['p99_ms']:>9.3f} {fila['throughput_eventos_s']:>11.1f}")
+    return resultados
+
+
+# ==============================
+# Metadatos y comparación
+# ==============================
+
+def commit_actual() -> str:
+    try:
+        out = subprocess.run(["git", "-C", RAIZ, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def entorno() -> Dict[str, Any]:
+    versiones = {}
+    for lib in ("numpy", "pandas", "sklearn", "xgboost", "joblib"):
+        try:
+            versiones[lib] = importlib.import_module(lib).__version__
+        except ImportError:
+            versiones[lib] = None
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "librerias": versiones,
+    }
+
+
+def comparar(actual: List[Dict[str, Any]], path_anterior: str, tolerancia: float) -> int:
+    """
+    Imprime el cambio de p50/p95 frente a una corrida anterior y retorna cuántas
+    mediciones empeoraron más que la tolerancia (fracción, ej. 0.10 = 10%).
+    """
+    with open(path_anterior) as f:
+        anterior = json.load(f)
+    base = {(r["modelo"], r["funcion"], r["batch"]): r for r in anterior["resultados"]}
+
+    print(f"\n=== Comparación contra {path_anterior} (commit {anterior.get('commit')}) ===")
+    print(f"{'modelo':<20} {'función':<28} {'batch':>6} {'p50':>8} {'p95':>8}")
+    regresiones = 0
+    for r in actual:
+        previo = base.get((r["modelo"], r["funcion"], r["batch"]))
+        if previo is None:
+            continue
+        d50 = r["p50_ms"] / previo["p50_ms"] - 1 if previo["p50_ms"] else 0.0
+        d95 = r["p95_ms"] / previo["p95_ms"] - 1 if previo["p95_ms"] else 0.0
+        marca = ""
+        if d50 > tolerancia:
+            regresiones += 1
+            marca = "  ← regresión"
+        print(f"{r['modelo']:<20} {r['funcion']:<28} {r['batch']:>6} {d50:>+8.1%} {d95:>+8.1%}{marca}")
+    print(f"Regresiones de p50 > {tolerancia:.0%}: {regresiones}")
+    return regresiones
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelos", nargs="+", default=None, metavar="NOMBRE=RUTA",
+                        help="modelos .pkl a medir (por defecto se entrenan las familias sobre datos sintéticos)")
+    parser.add_argument("--portable", action="store_true",
+                        help="medir también cada modelo entrenado exportado a .npz (portable_model.py)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="tamaños de batch a medir")
+    parser.add_argument("--repeticiones", type=int, default=200,
+                        help="llamadas medidas por función y batch")
+    parser.add_argument("--max-eventos", type=int, default=20_000,
+                        help="tope de eventos por medición; reduce las repeticiones de batches grandes")
+    parser.add_argument("--calentamiento", type=int, default=5,
+                        help="llamadas previas sin medir")
+    parser.add_argument("--filas", type=int, default=20_000,
+                        help="filas del log sintético usado para entrenar y generar eventos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", default=None,
+                        help="archivo JSON de resultados (por defecto bench_inferencia-<commit>.json)")
+    parser.add_argument("--comparar", default=None, metavar="JSON",
+                        help="JSON de una corrida anterior contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="empeoramiento de p50 a partir del cual se marca regresión")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    X, y, num_cols, cat_cols = datos_sinteticos(args.filas, args.seed)
+    print(f"Pares sintéticos: {len(X)}")
+
+    with tempfile.TemporaryDirectory(prefix="bench_modelos_") as dir_modelos:
+        if args.modelos:
+            rutas = dict(m.split("=", 1) if "=" in m else (os.path.splitext(os.path.basename(m))[0], m)
+                         for m in args.modelos)
+            faltantes = [p for p in rutas.values() if not os.path.isfile(p)]
+            if faltantes:
+                raise SystemExit(f"No existe el modelo: {', '.join(faltantes)}")
+        else:
+            print("Entrenando modelos...")
+            rutas = entrenar_modelos(X, y, num_cols, cat_cols, dir_modelos, args.portable)
+
+        resultados = []
+        for nombre, path_modelo in rutas.items():
+            resultados.extend(benchmark_modelo(nombre, path_modelo, X, args.batch, args))
+
+    commit = commit_actual()
+    reporte = {
+        "commit": commit,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": entorno(),
+        "config": {
+            "batch": args.batch,
+            "repeticiones": args.repeticiones,
+            "max_eventos": args.max_eventos,
+            "calentamiento": args.calentamiento,
+            "filas": args.filas,
+            "seed": args.seed,
+            "modelos": sorted(rutas) if args.modelos else "sinteticos",
+        },
+        "resultados": resultados,
+    }
+
+    salida = args.salida or f"bench_inferencia-{commit}.json"
+    with open(salida, "w") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        regresiones = comparar(resultados, args.comparar, args.tolerancia)
+        sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Costo de la instrumentación del handler (aws/lambda/instrumentation.py).
+
+1. Presupuesto: mide el ciclo completo de una invocación instrumentada tal
+   como la usa lambda_handler (start_invocation, 5 fases, contadores,
+   propiedades, end_invocation y la línea EMF serializada) sin trabajo real
+   adentro. Falla (exit 1) si la mediana supera --presupuesto-us.
+2. Handler: latencia p50 de lambda_handler con METRICS_ENABLED=false y true
+   sobre el mismo modelo, como referencia del impacto de punta a punta. Antes
+   de medir se verifica que responda 200 (y escriba la línea EMF con las
+   métricas activadas); si no, falla (exit 1).
+
+Uso:
+    python benchmarks/bench_instrumentacion.py
+    python benchmarks/bench_instrumentacion.py --presupuesto-us 30 --repeticiones 50000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench_inferencia import DIR_LAMBDA, cargar_handler, datos_sinteticos, entrenar_modelos, eventos_desde_features
+
+sys.path.insert(0, DIR_LAMBDA)
+import instrumentation  # noqa: E402
+
+FASES = ("validate", "cache", "features", "predict", "serialize")
+
+
+class _Descartar:
+    """Stream que descarta lo escrito (sin costo de E/S en la medición)."""
+
+    def write(self, texto: str) -> int:
+        return len(texto)
+
+
+def ciclo_instrumentado(stream) -> None:
+    invocation = instrumentation.start_invocation()
+    for nombre in FASES:
+        with instrumentation.phase(nombre):
+            pass
+    instrumentation.count("events")
+    instrumentation.count("cache_hits")
+    instrumentation.count("reintentar")
+    instrumentation.set_property("probabilidad_exito", 0.5)
+    instrumentation.end_invocation(invocation)
+    invocation.counters["errors"] = 0
+    invocation.properties["statusCode"] = 200
+    instrumentation.emit(
+        invocation, "Bench/Instrumentacion", {"Mode": "single", "ModelVersion": "v1"},
+        [["Mode"], ["Mode", "ModelVersion"]], stream=stream,
+    )
+
+
+def medir_ciclo(repeticiones: int) -> np.ndarray:
+    """Duración (µs) de cada ciclo instrumentado."""
+    stream = _Descartar()
+    for _ in range(1000):
+        ciclo_instrumentado(stream)
+    tiempos = np.empty(repeticiones)
+    for i in range(repeticiones):
+        t0 = time.perf_counter_ns()
+        ciclo_instrumentado(stream)
+        tiempos[i] = time.perf_counter_ns() - t0
+    return tiempos / 1000.0
+
+
+def verificar_handler(handler, evento, metricas: bool) -> None:
+    """
+    Antes de medir: el handler debe responder 200 y, con métricas, escribir la
+    línea EMF. Si no, se estaría midiendo la ruta de error (exit 1).
+    """
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        respuesta = handler.lambda_handler(evento, None)
+    emf = any('"_aws"' in linea for linea in salida.getvalue().splitlines())
+    if respuesta.get("statusCode") != 200 or emf != metricas:
+        print(f"✗ lambda_handler no responde como se espera (statusCode={respuesta.get('statusCode')}, "
+              f"línea EMF={'sí' if emf else 'no'} con METRICS_ENABLED={str(metricas).lower()}): "
+              f"{str(respuesta.get('body'))[:300]}")
+        sys.exit(1)
+
+
+def medir_handler(path_modelo: str, evento, metricas: bool, repeticiones: int) -> float:
+    """p50 (µs) de lambda_handler con las métricas activadas o no."""
+    os.environ["METRICS_ENABLED"] = "true" if metricas else "false"
+    with tempfile.TemporaryDirectory(prefix="bench_instr_") as dir_trabajo:
+        handler = cargar_handler(path_modelo, dir_trabajo)
+        verificar_handler(handler, evento, metricas)
+        tiempos = np.empty(repeticiones)
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            for _ in range(50):
+                handler.lambda_handler(evento, None)
+            for i in range(repeticiones):
+                t0 = time.perf_counter_ns()
+                handler.lambda_handler(evento, None)
+                tiempos[i] = time.perf_counter_ns() - t0
+    return float(np.median(tiempos) / 1000.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presupuesto-us", type=float, default=50.0,
+                        help="máximo admitido (µs) para la mediana del ciclo instrumentado")
+    parser.add_argument("--repeticiones", type=int, default=20_000)
+    parser.add_argument("--repeticiones-handler", type=int, default=2_000)
+    parser.add_argument("--sin-handler", action="store_true",
+                        help="medir solo el ciclo instrumentado (sin entrenar un modelo)")
+    args = parser.parse_args()
+
+    tiempos = medir_ciclo(args.repeticiones)
+    p50, p99 = np.percentile(tiempos, [50, 99])
+    print(f"Ciclo instrumentado: p50={p50:.2f} µs, p99={p99:.2f} µs (presupuesto {args.presupuesto_us:.0f} µs)")
+
+    if not args.sin_handler:
+        X, y, num_cols, cat_cols = datos_sinteticos(5_000, seed=0)
+        with tempfile.TemporaryDirectory(prefix="bench_modelos_") as dir_modelos:
+            rutas = entrenar_modelos(X, y, num_cols, cat_cols, dir_modelos)
+            evento = eventos_desde_features(X, 1, seed=0)[0]
+            sin = medir_handler(rutas["logistic_regression"], evento, False, args.repeticiones_handler)
+            con = medir_handler(rutas["logistic_regression"], evento, True, args.repeticiones_handler)
+        print(f"lambda_handler (logistic_regression, evento simple): "
+              f"p50 sin métricas={sin:.1f} µs, con métricas={con:.1f} µs (+{con - sin:.1f} µs)")
+
+    if p50 > args.presupuesto_us:
+        print(f"✗ La instrumentación excede el presupuesto: {p50:.2f} µs > {args.presupuesto_us:.0f} µs")
+        sys.exit(1)
+    print("✓ Instrumentación dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Pico de memoria (RSS) del pipeline de datos de ejecutar-evaluacion-algoritmos.py.
+
+Genera un log sintético de intentos (generar_intentos de
+bench_construir_pares, guardado como Parquet) y lo procesa en un subproceso
+limpio, etapa por etapa, como lo hace main():
+
+    cargar_y_limpiar -> construir_pares -> preparar_features
+    -> train_test_split -> fit_transform del preprocesador (ColumnTransformer)
+
+Después de cada etapa reporta el tiempo, el RSS actual y el pico de RSS del
+proceso (VmHWM, acumulado desde el inicio). Solo Linux (lee /proc).
+
+Uso:
+    python benchmarks/bench_memoria.py
+    python benchmarks/bench_memoria.py --filas 10000000 --salida memoria.json
+    python benchmarks/bench_memoria.py --log intentos.parquet
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_construir_pares import generar_intentos
+
+
+def _status_mb(campo: str) -> float:
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1]) / 1024  # kB
+    raise KeyError(campo)
+
+
+def rss_actual_mb() -> float:
+    return _status_mb("VmRSS")
+
+
+def rss_pico_mb() -> float:
+    # VmHWM y no ru_maxrss: este último arrastra el pico del proceso padre
+    return _status_mb("VmHWM")
+
+
+def medir(path_log: str) -> list:
+    """Corre las etapas sobre path_log en este proceso y retorna una fila por etapa."""
+    from sklearn.model_selection import train_test_split
+
+    from bench_construir_pares import evaluacion
+
+    etapas = []
+    t0 = time.perf_counter()
+
+    def registrar(nombre: str, filas: int) -> None:
+        nonlocal t0
+        etapas.append({
+            "etapa": nombre,
+            "filas": filas,
+            "segundos": round(time.perf_counter() - t0, 2),
+            "rss_mb": round(rss_actual_mb(), 1),
+            "pico_mb": round(rss_pico_mb(), 1),
+        })
+        t0 = time.perf_counter()
+
+    registrar("inicio", 0)
+    df = evaluacion.cargar_y_limpiar(path_log)
+    registrar("cargar_y_limpiar", len(df))
+
+    df_pares = evaluacion.construir_pares(df)
+    del df
+    registrar("construir_pares", len(df_pares))
+
+    X, y, num_cols, cat_cols = evaluacion.preparar_features(df_pares)
+    del df_pares
+    registrar("preparar_features", len(X))
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    del X, y
+    registrar("train_test_split", len(X_train))
+
+    Xt = evaluacion.construir_preprocesador(num_cols, cat_cols).fit_transform(X_train)
+    registrar("preprocesador", Xt.shape[0])
+    return etapas
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000, help="intentos del log sintético")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default=None, help="log de intentos existente (en lugar del sintético)")
+    parser.add_argument("--salida", default=None, help="archivo JSON de resultados")
+    parser.add_argument("--medir", default=None, help=argparse.SUPPRESS)  # uso interno (subproceso)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.medir:
+        json.dump(medir(args.medir), sys.stdout)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench_memoria_") as tmp:
+        path_log = args.log
+        if path_log is None:
+            path_log = os.path.join(tmp, "intentos.parquet")
+            t0 = time.perf_counter()
+            generar_intentos(args.filas, args.seed).to_parquet(path_log, index=False)
+            print(f"Log sintético: {args.filas} intentos en {time.perf_counter() - t0:.1f}s")
+
+        # subproceso: el pico de RSS no incluye la generación del log
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--medir", path_log],
+            check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        etapas = json.loads(salida.strip().splitlines()[-1])
+
+    print(f"\n{'etapa':<20} {'filas':>12} {'seg':>8} {'RSS MB':>10} {'pico MB':>10}")
+    for e in etapas:
+        print(f"{e['etapa']:<20} {e['filas']:>12} {e['segundos']:>8.2f} {e['rss_mb']:>10.1f} {e['pico_mb']:>10.1f}")
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump({"filas": args.filas, "log": args.log, "etapas": etapas}, f, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Paridad y costo de carga del modelo portable (.npz) frente al pickle.
+
+Para cada familia de ejecutar-evaluacion-algoritmos.py entrenada sobre pares
+sintéticos:
+1. Paridad: |p_pickle - p_portable| <= PROBA_TOLERANCE sobre eventos no vistos
+   en el entrenamiento, tanto en lote (predict_proba_events y
+   transform_columns) como de a uno (predict_proba_event), incluidas
+   categorías desconocidas.
+2. Carga: tamaño en disco y tiempo de joblib.load vs load_portable_model.
+3. Dependencias: en un proceso aparte, cargar y evaluar el .npz no debe
+   importar sklearn, xgboost, pandas ni joblib.
+
+Con --detalle-categorias N el detalle toma N valores distintos, lo que hace
+que el ColumnTransformer produzca una matriz dispersa (en XGBoost los ceros
+pasan a ser valores faltantes).
+
+Uso:
+    python benchmarks/bench_modelo_portable.py
+    python benchmarks/bench_modelo_portable.py --detalle-categorias 300
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from bench_inferencia import DIR_LAMBDA, datos_sinteticos, eventos_desde_features
+from bench_construir_pares import evaluacion
+
+sys.path.insert(0, DIR_LAMBDA)
+from compiled_scorer import PROBA_TOLERANCE  # noqa: E402
+from portable_model import load_portable_model  # noqa: E402
+
+LIBRERIAS_PROHIBIDAS = ("sklearn", "xgboost", "pandas", "joblib")
+
+SCRIPT_SIN_DEPENDENCIAS = """
+import sys
+sys.path.insert(0, {dir_lambda!r})
+from portable_model import load_portable_model
+m = load_portable_model({path!r})
+m.predict_proba_event({evento!r})
+m.predict_proba_events([{evento!r}] * 10)
+print(",".join(sorted({{k.split(".")[0] for k in sys.modules}} & set({prohibidas!r}))))
+"""
+
+
+def con_detalle_variado(X, n_categorias: int, seed: int):
+    rng = np.random.default_rng(seed)
+    X = X.copy()
+    X["detalle_fail"] = [f"detalle_{v}" for v in rng.integers(0, n_categorias, size=len(X))]
+    return X
+
+
+def medir_carga(fn, path: str, repeticiones: int = 5) -> float:
+    """Mediana (ms) de cargar el archivo."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn(path)
+        tiempos.append(time.perf_counter() - t0)
+    return float(np.median(tiempos) * 1000)
+
+
+def verificar_sin_dependencias(path: str, evento) -> str:
+    """Importadas (de LIBRERIAS_PROHIBIDAS) al cargar y evaluar el .npz en otro proceso."""
+    codigo = SCRIPT_SIN_DEPENDENCIAS.format(
+        dir_lambda=DIR_LAMBDA, path=path, evento=evento, prohibidas=LIBRERIAS_PROHIBIDAS,
+    )
+    out = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    return out.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--eventos", type=int, default=2_000,
+                        help="eventos no vistos para la paridad en lote")
+    parser.add_argument("--eventos-individuales", type=int, default=200,
+                        help="eventos para la paridad de a uno (predict_proba_event)")
+    parser.add_argument("--detalle-categorias", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    X, y, num_cols, cat_cols = datos_sinteticos(args.filas, args.seed)
+    X_nuevo, _, _, _ = datos_sinteticos(args.filas, args.seed + 1)
+    if args.detalle_categorias:
+        X = con_detalle_variado(X, args.detalle_categorias, args.seed)
+        X_nuevo = con_detalle_variado(X_nuevo, args.detalle_categorias, args.seed + 1)
+
+    eventos = eventos_desde_features(X_nuevo, args.eventos, args.seed)
+    # categorías que el modelo nunca vio: el bloque one-hot queda en cero
+    for i, e in enumerate(eventos[::50]):
+        e["detalle_fail"] = f"desconocido_{i}"
+        e["error_categoria"] = "otro_999"
+    X_eventos = pd.DataFrame(eventos, columns=num_cols + cat_cols)
+
+    print(f"Pares de entrenamiento: {len(X)} | eventos de paridad: {len(eventos)}")
+    print(f"\n{'modelo':<22} {'disperso':>8} {'dif. lote':>10} {'dif. evento':>12} "
+          f"{'pkl KiB':>9} {'npz KiB':>9} {'load pkl ms':>12} {'load npz ms':>12} {'importa':>10}")
+
+    fallas = 0
+    with tempfile.TemporaryDirectory(prefix="bench_portable_") as tmp:
+        for nombre, modelo in evaluacion.construir_modelos(num_cols, cat_cols).items():
+            modelo.fit(X, y)
+            path_pkl = os.path.join(tmp, f"{nombre}.pkl")
+            path_npz = os.path.join(tmp, f"{nombre}.npz")
+            joblib.dump(modelo, path_pkl, compress=0)
+            evaluacion.exportar_modelo_portable(modelo, path_npz, X)
+
+            portable = load_portable_model(path_npz)
+            esperado = modelo.predict_proba(X_eventos)[:, 1]
+            dif_lote = max(
+                float(np.max(np.abs(esperado - portable.predict_proba_events(eventos)))),
+                float(np.max(np.abs(esperado - portable.predict_proba_matrix(portable.transform_columns(X_eventos))))),
+            )
+            dif_evento = max(
+                abs(esperado[i] - portable.predict_proba_event(eventos[i]))
+                for i in range(min(args.eventos_individuales, len(eventos)))
+            )
+
+            importadas = verificar_sin_dependencias(path_npz, eventos[0])
+            ok = dif_lote <= PROBA_TOLERANCE and dif_evento <= PROBA_TOLERANCE and not importadas
+            fallas += not ok
+
+            print(
+                f"{nombre:<22} {str(modelo.steps[0][1].sparse_output_):>8} {dif_lote:>10.1e} {dif_evento:>12.1e} "
+                f"{os.path.getsize(path_pkl) / 1024:>9.1f} {os.path.getsize(path_npz) / 1024:>9.1f} "
+                f"{medir_carga(joblib.load, path_pkl):>12.2f} {medir_carga(load_portable_model, path_npz):>12.2f} "
+                f"{importadas or '-':>10}{'' if ok else '  ✗'}"
+            )
+
+    if fallas:
+        print(f"\n✗ {fallas} modelo(s) sin paridad (tolerancia {PROBA_TOLERANCE}) o con dependencias")
+        sys.exit(1)
+    print(f"\n✓ Paridad dentro de {PROBA_TOLERANCE} y evaluación sin sklearn/xgboost/pandas/joblib")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark end-to-end del pipeline sobre logs sintéticos (log_sintetico.py).
+
+Para cada tamaño de --filas genera un log con las columnas del export real y
+lo procesa en un subproceso limpio, etapa por etapa como main() de
+ejecutar-evaluacion-algoritmos.py:
+
+    cargar_y_limpiar -> construir_pares -> preparar_features -> train_test_split
+    -> entrenamiento (una etapa por modelo) -> inferencia (predict_proba del test)
+
+Por etapa reporta segundos, filas/s y el pico de RSS acumulado (VmHWM).
+Entrenar random_forest o xgboost con 10M de intentos lleva mucho más que la
+regresión logística: por eso --modelos es logistic_regression por defecto.
+Con --formato xlsx los tamaños que no entran en una hoja se omiten.
+
+Uso:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --filas 10000 1000000 --modelos logistic_regression xgboost
+    python benchmarks/bench_pipeline.py --filas 100000 --formato csv --salida pipeline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from bench_memoria import rss_pico_mb
+from log_sintetico import MAX_FILAS_EXCEL, escribir_log, generar_log
+
+EXTENSIONES = {"parquet": ".parquet", "csv": ".csv", "xlsx": ".xlsx"}
+
+
+def medir(path_log: str, modelos: List[str]) -> List[Dict[str, Any]]:
+    """Corre las etapas sobre path_log en este proceso y retorna una fila por etapa."""
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+
+    from bench_construir_pares import evaluacion
+
+    etapas = []
+
+    def etapa(nombre: str, fn, *args, filas_de=len):
+        t0 = time.perf_counter()
+        resultado = fn(*args)
+        segundos = time.perf_counter() - t0
+        filas = filas_de(resultado)
+        etapas.append({
+            "etapa": nombre,
+            "filas": filas,
+            "segundos": round(segundos, 3),
+            "filas_s": round(filas / segundos, 1) if segundos > 0 else None,
+            "pico_mb": round(rss_pico_mb(), 1),
+        })
+        return resultado
+
+    def primer_elemento(r):
+        return len(r[0])
+
+    def split(X, y):
+        return train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+
+    df = etapa("cargar_y_limpiar", evaluacion.cargar_y_limpiar, path_log)
+    df_pares = etapa("construir_pares", evaluacion.construir_pares, df)
+    del df
+    X, y, num_cols, cat_cols = etapa("preparar_features", evaluacion.preparar_features, df_pares,
+                                     filas_de=primer_elemento)
+    del df_pares
+    X_train, X_test, y_train, y_test = etapa("train_test_split", split, X, y, filas_de=primer_elemento)
+    del X, y
+
+    familias = evaluacion.construir_modelos(num_cols, cat_cols)
+    for nombre in modelos:
+        if nombre not in familias:
+            raise SystemExit(f"Modelo desconocido: {nombre} (disponibles: {', '.join(familias)})")
+        modelo = familias[nombre]
+        etapa(f"entrenar:{nombre}", modelo.fit, X_train, y_train, filas_de=lambda _: len(X_train))
+        proba = etapa(f"inferencia:{nombre}", modelo.predict_proba, X_test)[:, 1]
+        etapas[-1]["auc"] = round(float(roc_auc_score(y_test, proba)), 4)
+    return etapas
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000],
+                        help="intentos de cada log sintético")
+    parser.add_argument("--modelos", nargs="+", default=["logistic_regression"],
+                        help="familias a entrenar (logistic_regression, random_forest, xgboost)")
+    parser.add_argument("--formato", choices=list(EXTENSIONES), default="parquet",
+                        help="formato del log que lee cargar_y_limpiar")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="archivo JSON de resultados")
+    parser.add_argument("--medir", default=None, help=argparse.SUPPRESS)  # uso interno (subproceso)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.medir:
+        json.dump(medir(args.medir, args.modelos), sys.stdout)
+        return
+
+    resultados = []
+    for filas in args.filas:
+        if args.formato == "xlsx" and filas > MAX_FILAS_EXCEL:
+            print(f"\n{filas} filas: se omite (un Excel admite hasta {MAX_FILAS_EXCEL})")
+            continue
+
+        with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+            path_log = os.path.join(tmp, "intentos" + EXTENSIONES[args.formato])
+            t0 = time.perf_counter()
+            escribir_log(generar_log(filas=filas, seed=args.seed), path_log)
+            t_generar = time.perf_counter() - t0
+
+            # subproceso: tiempos y memoria sin el costo de generar el log
+            salida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--medir", path_log, "--modelos", *args.modelos],
+                check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+            etapas = json.loads(salida.strip().splitlines()[-1])
+
+        total = sum(e["segundos"] for e in etapas)
+        print(f"\n=== {filas} intentos ({args.formato}; log generado en {t_generar:.1f}s) ===")
+        print(f"{'etapa':<32} {'filas':>11} {'seg':>9} {'filas/s':>12} {'pico MB':>9}")
+        for e in etapas:
+            extra = f"  AUC {e['auc']:.4f}" if "auc" in e else ""
+            print(f"{e['etapa']:<32} {e['filas']:>11} {e['segundos']:>9.2f} "
+                  f"{e['filas_s'] or 0:>12,.0f} {e['pico_mb']:>9.1f}{extra}")
+        print(f"{'total':<32} {'':>11} {total:>9.2f}")
+        resultados.append({"filas": filas, "generar_s": round(t_generar, 2), "etapas": etapas})
+
+    if args.salida:
+        from bench_inferencia import commit_actual, entorno
+
+        reporte = {
+            "commit": commit_actual(),
+            "entorno": entorno(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("salida", "medir")},
+            "resultados": resultados,
+        }
+        with open(args.salida, "w") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Paridad y latencia de la ruta compilada (aws/lambda/compiled_scorer.py)
+frente a Pipeline.predict_proba.
+
+Entrena sobre pares sintéticos las tres familias de
+ejecutar-evaluacion-algoritmos.py (logistic_regression, random_forest y
+xgboost), compila cada Pipeline con compile_pipeline y compara, evento por
+evento, |p_pipeline - p_compilada| sobre eventos no vistos en el
+entrenamiento: valores numéricos con decimales que no entran en float32,
+valores fuera del rango de entrenamiento y categorías desconocidas.
+
+Termina con código 1 si alguna familia no compila, si falta xgboost o si la
+diferencia máxima supera PROBA_TOLERANCE.
+
+Uso:
+    python benchmarks/bench_scorer_compilado.py
+    python benchmarks/bench_scorer_compilado.py --eventos 2000 --detalle-categorias 300
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_inferencia import DIR_LAMBDA, datos_sinteticos, eventos_desde_features
+from bench_construir_pares import evaluacion
+from bench_modelo_portable import con_detalle_variado
+
+sys.path.insert(0, DIR_LAMBDA)
+from compiled_scorer import PROBA_TOLERANCE, compile_pipeline  # noqa: E402
+
+FAMILIAS = ("logistic_regression", "random_forest", "xgboost")
+
+
+def eventos_de_paridad(X_nuevo, n: int, seed: int):
+    """Eventos no vistos, con casos borde cada 10 / 25 / 50 eventos."""
+    rng = np.random.default_rng(seed)
+    eventos = eventos_desde_features(X_nuevo, n, seed)
+    for e in eventos[::10]:
+        # decimales que no se representan en float32
+        e["monto"] = float(e["monto"]) + float(rng.uniform(0, 1)) * 1e-3
+        e["delta_horas"] = float(e["delta_horas"]) + 1 / 3
+    for e in eventos[::25]:
+        # fuera del rango de entrenamiento
+        e["monto"] = float(e["monto"]) * 1000
+        e["delta_horas"] = -float(e["delta_horas"])
+    for i, e in enumerate(eventos[::50]):
+        # categorías que el modelo nunca vio: el bloque one-hot queda en cero
+        e["detalle_fail"] = f"desconocido_{i}"
+        e["error_categoria"] = "otro_999"
+    return eventos
+
+
+def mediana_ms(fn, eventos) -> float:
+    tiempos = []
+    for e in eventos:
+        t0 = time.perf_counter()
+        fn(e)
+        tiempos.append(time.perf_counter() - t0)
+    return float(np.median(tiempos) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--eventos", type=int, default=500,
+                        help="eventos no vistos para la paridad (de a uno)")
+    parser.add_argument("--eventos-latencia", type=int, default=100,
+                        help="eventos para la mediana de latencia de cada ruta")
+    parser.add_argument("--detalle-categorias", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    X, y, num_cols, cat_cols = datos_sinteticos(args.filas, args.seed)
+    X_nuevo, _, _, _ = datos_sinteticos(args.filas, args.seed + 1)
+    if args.detalle_categorias:
+        X = con_detalle_variado(X, args.detalle_categorias, args.seed)
+        X_nuevo = con_detalle_variado(X_nuevo, args.detalle_categorias, args.seed + 1)
+
+    eventos = eventos_de_paridad(X_nuevo, args.eventos, args.seed)
+    X_eventos = pd.DataFrame(eventos, columns=num_cols + cat_cols)
+    muestra_latencia = eventos[:args.eventos_latencia]
+
+    print(f"Pares de entrenamiento: {len(X)} | eventos de paridad: {len(eventos)}")
+    print(f"\n{'modelo':<22} {'disperso':>8} {'dif. máx':>10} {'pipeline ms':>12} {'compilada ms':>13}")
+
+    modelos = evaluacion.construir_modelos(num_cols, cat_cols)
+    fallas = [f"{nombre}: no disponible (¿xgboost instalado?)" for nombre in FAMILIAS if nombre not in modelos]
+    for nombre, modelo in modelos.items():
+        modelo.fit(X, y)
+        scorer = compile_pipeline(modelo)
+        if scorer is None:
+            fallas.append(f"{nombre}: compile_pipeline no compiló el Pipeline")
+            print(f"{nombre:<22} {'-':>8} {'-':>10} {'-':>12} {'-':>13}  ✗")
+            continue
+
+        esperado = modelo.predict_proba(X_eventos)[:, 1]
+        obtenido = np.array([scorer.predict_proba_event(e) for e in eventos])
+        dif = float(np.max(np.abs(esperado - obtenido)))
+        ok = dif <= PROBA_TOLERANCE
+        if not ok:
+            fallas.append(f"{nombre}: diferencia máx. {dif:.1e} > {PROBA_TOLERANCE}")
+
+        ms_pipeline = mediana_ms(
+            lambda e: modelo.predict_proba(pd.DataFrame([e], columns=num_cols + cat_cols)), muestra_latencia
+        )
+        ms_compilada = mediana_ms(scorer.predict_proba_event, muestra_latencia)
+        print(
+            f"{nombre:<22} {str(scorer.sparse_output):>8} {dif:>10.1e} "
+            f"{ms_pipeline:>12.3f} {ms_compilada:>13.3f}{'' if ok else '  ✗'}"
+        )
+
+    if fallas:
+        print(f"\n✗ Ruta compilada sin paridad (tolerancia {PROBA_TOLERANCE}):")
+        for falla in fallas:
+            print(f"  - {falla}")
+        sys.exit(1)
+    print(f"\n✓ Paridad dentro de {PROBA_TOLERANCE} en {', '.join(FAMILIAS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Prueba de carga del servidor HTTP de inferencia (aws/server/inference_server.py).
+
+Abre --concurrencia conexiones keep-alive y cada una envía POST /predict en
+bucle durante --duracion segundos (cliente HTTP/1.1 mínimo sobre asyncio, sin
+dependencias). Reporta QPS, eventos/s y latencia p50/p95/p99/p99.9, y cuántos
+lotes armó el servidor (GET /health) para ver el efecto del micro-batching.
+
+Sin --url levanta el servidor en un subproceso con --modelo o, si no se
+indica, con una regresión logística entrenada sobre pares sintéticos.
+
+Uso:
+    python benchmarks/bench_servidor.py
+    python benchmarks/bench_servidor.py --concurrencia 64 --workers 2 --max-wait-ms 5
+    python benchmarks/bench_servidor.py --items 50 --salida servidor.json
+    python benchmarks/bench_servidor.py --url http://127.0.0.1:8080 --duracion 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from bench_construir_pares import RAIZ
+from bench_inferencia import commit_actual, datos_sinteticos, entorno, eventos_desde_features
+
+SCRIPT_SERVIDOR = os.path.join(RAIZ, "aws", "server", "inference_server.py")
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+# ==============================
+# Cliente HTTP keep-alive
+# ==============================
+
+class Conexion:
+    """Una conexión HTTP/1.1 persistente (solo lo necesario para /predict y /health)."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def abrir(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def pedir(self, metodo: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+        cabecera = (
+            f"{metodo} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode()
+        self.writer.write(cabecera + body)
+        linea_estado = await self.reader.readline()
+        if not linea_estado:
+            raise ConnectionError("El servidor cerró la conexión")
+        status = int(linea_estado.split()[1])
+        largo = 0
+        while True:
+            linea = await self.reader.readline()
+            if linea in (b"\r\n", b""):
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            if nombre.strip().lower() == "content-length":
+                largo = int(valor)
+        return status, await self.reader.readexactly(largo)
+
+    def cerrar(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def obtener_json(host: str, port: int, path: str) -> Dict[str, Any]:
+    conexion = Conexion(host, port)
+    await conexion.abrir()
+    try:
+        _, body = await conexion.pedir("GET", path)
+    finally:
+        conexion.cerrar()
+    return json.loads(body)
+
+
+async def cliente(host: str, port: int, cuerpos: List[bytes], fin: float,
+                  latencias: List[float], errores: List[int]) -> None:
+    conexion = Conexion(host, port)
+    await conexion.abrir()
+    i = 0
+    try:
+        while time.perf_counter() < fin:
+            t0 = time.perf_counter_ns()
+            status, _ = await conexion.pedir("POST", "/predict", cuerpos[i % len(cuerpos)])
+            latencias.append((time.perf_counter_ns() - t0) / 1e6)
+            if status != 200:
+                errores.append(status)
+            i += 1
+    finally:
+        conexion.cerrar()
+
+
+async def carga(host: str, port: int, cuerpos: List[bytes], concurrencia: int,
+                duracion: float, calentamiento: float) -> Dict[str, Any]:
+    """Corre los clientes; las requests del calentamiento no se cuentan."""
+    if calentamiento > 0:
+        fin = time.perf_counter() + calentamiento
+        await asyncio.gather(*(cliente(host, port, cuerpos, fin, [], []) for _ in range(concurrencia)))
+
+    antes = await obtener_json(host, port, "/health")
+    latencias: List[float] = []
+    errores: List[int] = []
+    t0 = time.perf_counter()
+    fin = t0 + duracion
+    await asyncio.gather(*(cliente(host, port, cuerpos, fin, latencias, errores) for _ in range(concurrencia)))
+    transcurrido = time.perf_counter() - t0
+    despues = await obtener_json(host, port, "/health")
+
+    return {
+        "latencias_ms": np.array(latencias),
+        "errores": len(errores),
+        "segundos": transcurrido,
+        # con varios workers /health responde uno cualquiera: es solo indicativo
+        "lotes": despues.get("lotes", 0) - antes.get("lotes", 0) if despues.get("pid") == antes.get("pid") else None,
+        "eventos_servidor": despues.get("eventos", 0) - antes.get("eventos", 0)
+        if despues.get("pid") == antes.get("pid") else None,
+    }
+
+
+# ==============================
+# Servidor local
+# ==============================
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_servidor(host: str, port: int, proceso: subprocess.Popen, timeout: float = 120.0) -> None:
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit(f"El servidor terminó con código {proceso.returncode}")
+        try:
+            asyncio.run(obtener_json(host, port, "/health"))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("El servidor no respondió a tiempo")
+
+
+def levantar_servidor(path_modelo: str, args) -> Tuple[subprocess.Popen, int]:
+    port = puerto_libre()
+    comando = [
+        sys.executable, SCRIPT_SERVIDOR, "--model", path_modelo, "--port", str(port),
+        "--workers", str(args.workers), "--max-wait-ms", str(args.max_wait_ms),
+        "--max-batch", str(args.max_batch),
+    ]
+    proceso = subprocess.Popen(comando)
+    esperar_servidor("127.0.0.1", port, proceso)
+    return proceso, port
+
+
+def modelo_sintetico(dir_salida: str, X, y, num_cols, cat_cols) -> str:
+    import joblib
+    from bench_construir_pares import evaluacion
+
+    modelo = evaluacion.construir_modelos(num_cols, cat_cols)["logistic_regression"]
+    modelo.fit(X, y)
+    path = os.path.join(dir_salida, "logistic_regression.pkl")
+    joblib.dump(modelo, path, compress=0)
+    return path
+
+
+# ==============================
+# Reporte
+# ==============================
+
+def resumir(resultado: Dict[str, Any], items: int) -> Dict[str, Any]:
+    latencias = resultado["latencias_ms"]
+    n = len(latencias)
+    resumen = {f"p{p}_ms": round(float(np.percentile(latencias, p)), 3) for p in PERCENTILES}
+    resumen.update({
+        "requests": n,
+        "errores": resultado["errores"],
+        "qps": round(n / resultado["segundos"], 1),
+        "eventos_s": round(n * items / resultado["segundos"], 1),
+    })
+    if resultado["lotes"]:
+        resumen["eventos_por_lote"] = round(resultado["eventos_servidor"] / resultado["lotes"], 2)
+    return resumen
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="servidor ya levantado (si no, se levanta uno local)")
+    parser.add_argument("--modelo", default=None, help="modelo .pkl/.npz para el servidor local")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 16, 64],
+                        help="conexiones simultáneas (una corrida por valor)")
+    parser.add_argument("--items", type=int, default=1,
+                        help="eventos por request; con más de 1 se envía {\"items\": [...]}")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos medidos por corrida")
+    parser.add_argument("--calentamiento", type=float, default=2.0)
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="archivo JSON de resultados")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    X, y, num_cols, cat_cols = datos_sinteticos(args.filas, args.seed)
+    eventos = eventos_desde_features(X, 1000 * args.items, args.seed)
+    if args.items > 1:
+        cuerpos = [json.dumps({"items": eventos[i:i + args.items]}).encode()
+                   for i in range(0, len(eventos), args.items)]
+    else:
+        cuerpos = [json.dumps(e).encode() for e in eventos]
+
+    proceso = None
+    with tempfile.TemporaryDirectory(prefix="bench_servidor_") as tmp:
+        try:
+            if args.url:
+                partes = urlsplit(args.url)
+                host, port = partes.hostname, partes.port or 80
+            else:
+                path_modelo = args.modelo or modelo_sintetico(tmp, X, y, num_cols, cat_cols)
+                proceso, port = levantar_servidor(path_modelo, args)
+                host = "127.0.0.1"
+
+            print(f"\n{'conexiones':>10} {'QPS':>9} {'eventos/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+                  f"{'p99 ms':>8} {'p99.9 ms':>9} {'ev/lote':>8} {'errores':>8}")
+            resultados = []
+            for concurrencia in args.concurrencia:
+                resultado = asyncio.run(carga(host, port, cuerpos, concurrencia, args.duracion, args.calentamiento))
+                resumen = {"concurrencia": concurrencia, **resumir(resultado, args.items)}
+                resultados.append(resumen)
+                print(f"{concurrencia:>10} {resumen['qps']:>9.1f} {resumen['eventos_s']:>10.1f} "
+                      f"{resumen['p50_ms']:>8.2f} {resumen['p95_ms']:>8.2f} {resumen['p99_ms']:>8.2f} "
+                      f"{resumen['p99.9_ms']:>9.2f} {resumen.get('eventos_por_lote', '-'):>8} {resumen['errores']:>8}")
+        finally:
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait(timeout=30)
+
+    if args.salida:
+        reporte = {
+            "commit": commit_actual(),
+            "entorno": entorno(),
+            "config": {k: v for k, v in vars(args).items() if k != "salida"},
+            "resultados": resultados,
+        }
+        with open(args.salida, "w") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Generador de logs sintéticos de intentos de pago.
+
+Produce un log con las mismas columnas que reconoce detectar_columna en
+ejecutar-evaluacion-algoritmos.py (fecha, ID Suscripcion, monto,
+http_status_code, detalle), ordenado por fecha como un export cronológico,
+para medir el pipeline a escala sin el suscripciones.xlsx privado.
+
+Modelo de generación (vectorizado, sin bucles por suscripción):
+- Cada suscripción tiene 1 + Poisson(intentos_medios - 1) intentos (hasta
+  max_intentos), un monto fijo (lognormal) y un error "propio" elegido según
+  la mezcla de errores; sus fallos usan ese error con probabilidad
+  PROB_ERROR_PROPIO y otro de la mezcla en el resto.
+- El primer intento cae en un instante uniforme de los `dias` desde
+  fecha_inicio; los siguientes, a una distancia exponencial de media
+  horas_entre_intentos.
+- Cada intento es exitoso (201) con probabilidad logística: la tasa base
+  tasa_exito ajustada por el error de la suscripción, la franja horaria, las
+  horas desde el intento anterior y el monto. Así las variables del modelo
+  tienen señal.
+- El detalle es el texto del error (falta con prob_detalle_faltante y en los
+  201).
+
+Uso:
+    python benchmarks/log_sintetico.py --filas 1000000 --salida intentos.parquet
+    python benchmarks/log_sintetico.py --suscripciones 5000 --intentos-medios 6 --salida intentos.xlsx
+    python benchmarks/log_sintetico.py --filas 100000 --tasa-exito 0.5 --errores 402=0.6 503=0.4 --salida intentos.csv
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# http_status_code -> (detalle, peso en la mezcla, efecto sobre el log-odds de éxito)
+ERRORES = {
+    402: ("Fondos insuficientes", 0.35, 0.3),
+    400: ("Tarjeta rechazada", 0.15, -0.6),
+    404: ("Tarjeta no encontrada", 0.05, -1.5),
+    422: ("Tarjeta vencida", 0.10, -1.2),
+    500: ("Error interno del procesador", 0.15, 0.8),
+    503: ("Servicio no disponible", 0.10, 1.0),
+    504: ("Timeout", 0.10, 0.7),
+}
+PROB_ERROR_PROPIO = 0.8
+
+# Efecto de la franja horaria del intento (madrugada, manana, tarde, noche)
+EFECTO_FRANJA = np.array([-0.5, 0.4, 0.2, -0.1])
+
+# Filas máximas de una hoja de Excel (sin contar la cabecera)
+MAX_FILAS_EXCEL = 1_048_575
+
+
+def _logit(p: float) -> float:
+    return float(np.log(p / (1 - p)))
+
+
+def generar_log(n_suscripciones: Optional[int] = None, filas: Optional[int] = None,
+                intentos_medios: float = 4.0, max_intentos: int = 24, tasa_exito: float = 0.35,
+                errores: Optional[Dict[int, float]] = None, horas_entre_intentos: float = 24.0,
+                fecha_inicio: str = "2024-01-01", dias: int = 365,
+                prob_detalle_faltante: float = 0.02, seed: int = 0) -> pd.DataFrame:
+    """
+    Log sintético de intentos ordenado por fecha. Se indica n_suscripciones o
+    filas: con filas se generan las suscripciones necesarias y el log se
+    recorta a exactamente esa cantidad de intentos. errores reemplaza los
+    pesos de la mezcla ({http_status_code: peso}; códigos fuera de ERRORES
+    llevan detalle genérico y efecto 0).
+    """
+    if (n_suscripciones is None) == (filas is None):
+        raise ValueError("Indique n_suscripciones o filas (uno de los dos)")
+    if intentos_medios < 1:
+        raise ValueError("intentos_medios debe ser >= 1")
+    if not 0 < tasa_exito < 1:
+        raise ValueError("tasa_exito debe estar entre 0 y 1")
+
+    rng = np.random.default_rng(seed)
+    if filas is not None:
+        n_suscripciones = max(1, int(np.ceil(filas / intentos_medios * 1.05)))
+
+    pesos = errores or {code: peso for code, (_, peso, _) in ERRORES.items()}
+    codigos = np.array(list(pesos), dtype=np.int64)
+    prob_codigo = np.array(list(pesos.values()), dtype=float)
+    prob_codigo /= prob_codigo.sum()
+    detalles = np.array([ERRORES.get(c, (f"Error {c}",))[0] for c in codigos], dtype=object)
+    efecto_codigo = np.array([ERRORES[c][2] if c in ERRORES else 0.0 for c in codigos])
+
+    # --- suscripciones ---
+    tam = 1 + rng.poisson(intentos_medios - 1, size=n_suscripciones)
+    np.minimum(tam, max_intentos, out=tam)
+    if filas is not None:
+        while tam.sum() < filas:  # poco probable con el margen de 5%
+            tam = np.concatenate([tam, 1 + rng.poisson(intentos_medios - 1, size=n_suscripciones // 10 + 1)])
+            np.minimum(tam, max_intentos, out=tam)
+        corte = np.cumsum(tam)
+        ultima = int(np.searchsorted(corte, filas))
+        tam = tam[:ultima + 1].copy()
+        tam[-1] -= int(corte[ultima] - filas)
+        n_suscripciones = len(tam)
+
+    monto_sus = np.round(np.exp(rng.normal(3.3, 0.6, size=n_suscripciones)), 2)
+    error_sus = rng.choice(len(codigos), size=n_suscripciones, p=prob_codigo)
+    inicio_sus = rng.uniform(0, dias * 24.0, size=n_suscripciones)
+
+    # --- intentos ---
+    n = int(tam.sum())
+    sus = np.repeat(np.arange(n_suscripciones), tam)
+    primero = np.zeros(n, dtype=bool)
+    primero[np.cumsum(tam)[:-1]] = True
+    primero[0] = True
+
+    gap = rng.exponential(horas_entre_intentos, size=n)
+    gap[primero] = 0.0
+    # horas desde el inicio de la suscripción: suma acumulada reiniciada por grupo
+    acumulado = np.cumsum(gap)
+    horas = inicio_sus[sus] + acumulado - np.repeat(acumulado[primero], tam)
+    segundos = np.round(horas * 3600).astype(np.int64)
+    fecha = pd.Timestamp(fecha_inicio) + pd.to_timedelta(segundos, unit="s")
+
+    franja = fecha.hour.to_numpy() // 6
+    monto = monto_sus[sus]
+
+    propio = rng.random(n) < PROB_ERROR_PROPIO
+    error = np.where(propio, error_sus[sus], rng.choice(len(codigos), size=n, p=prob_codigo))
+
+    log_odds = (
+        _logit(tasa_exito)
+        + np.where(primero, 0.0, efecto_codigo[error_sus[sus]])
+        + EFECTO_FRANJA[franja]
+        + np.where(primero, 0.0, 0.25 * np.log1p(gap) - 0.6)
+        - 0.4 * (monto > 60)
+    )
+    exito = rng.random(n) < 1 / (1 + np.exp(-log_odds))
+
+    status = np.where(exito, 201, codigos[error])
+    detalle = detalles[error]
+    detalle[exito | (rng.random(n) < prob_detalle_faltante)] = None
+
+    df = pd.DataFrame({
+        "fecha": fecha,
+        "ID Suscripcion": sus + 100_000,
+        "monto": monto,
+        "http_status_code": status,
+        "detalle": detalle,
+    })
+    return df.sort_values("fecha", kind="mergesort", ignore_index=True)
+
+
+def escribir_log(df: pd.DataFrame, path: str) -> None:
+    """Escribe el log en .csv (.csv.gz), .parquet o .xlsx según la extensión."""
+    nombre = path.lower()
+    if nombre.endswith((".parquet", ".pq")):
+        df.to_parquet(path, index=False)
+    elif nombre.endswith((".csv", ".csv.gz")):
+        df.to_csv(path, index=False)
+    elif nombre.endswith(".xlsx"):
+        if len(df) > MAX_FILAS_EXCEL:
+            raise ValueError(f"Un Excel admite hasta {MAX_FILAS_EXCEL} filas (el log tiene {len(df)}); use .parquet o .csv")
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Formato no soportado: {path} (use .csv, .parquet o .xlsx)")
+
+
+def _parse_errores(valores) -> Optional[Dict[int, float]]:
+    if not valores:
+        return None
+    errores = {}
+    for valor in valores:
+        codigo, _, peso = valor.partition("=")
+        errores[int(codigo)] = float(peso)
+    return errores
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    tamanio = parser.add_mutually_exclusive_group(required=True)
+    tamanio.add_argument("--filas", type=int, help="intentos del log (exactos)")
+    tamanio.add_argument("--suscripciones", type=int, help="suscripciones del log")
+    parser.add_argument("--salida", required=True, help="archivo .csv, .parquet o .xlsx")
+    parser.add_argument("--intentos-medios", type=float, default=4.0, help="intentos por suscripción (media)")
+    parser.add_argument("--max-intentos", type=int, default=24)
+    parser.add_argument("--tasa-exito", type=float, default=0.35, help="tasa base de éxito de un intento")
+    parser.add_argument("--errores", nargs="+", default=None, metavar="HTTP=PESO",
+                        help="mezcla de errores (por defecto la de ERRORES)")
+    parser.add_argument("--horas-entre-intentos", type=float, default=24.0)
+    parser.add_argument("--fecha-inicio", default="2024-01-01")
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    t0 = time.perf_counter()
+    df = generar_log(
+        n_suscripciones=args.suscripciones, filas=args.filas,
+        intentos_medios=args.intentos_medios, max_intentos=args.max_intentos,
+        tasa_exito=args.tasa_exito, errores=_parse_errores(args.errores),
+        horas_entre_intentos=args.horas_entre_intentos,
+        fecha_inicio=args.fecha_inicio, dias=args.dias, seed=args.seed,
+    )
+    t1 = time.perf_counter()
+    escribir_log(df, args.salida)
+    t2 = time.perf_counter()
+
+    n_sus = df["ID Suscripcion"].nunique()
+    print(f"Log sintético: {len(df)} intentos de {n_sus} suscripciones "
+          f"({(df['http_status_code'] == 201).mean():.1%} exitosos)")
+    print(f"Generado en {t1 - t0:.1f}s, escrito en {t2 - t1:.1f}s -> {args.salida} "
+          f"({os.path.getsize(args.salida) / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,10 @@ Script de evaluación de algoritmos para tesis:
 """
 
 import os
-from typing import List, Tuple, Dict
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Dict
 
 import numpy as np
 import pandas as pd
@@ -40,6 +43,27 @@ except ImportError:
 
 EXCEL_PATH = "suscripciones.xlsx"  # usar el archivo
 
+# Nombres aceptados para cada columna del log de intentos (sin distinguir mayúsculas)
+COLUMNAS_POSIBLES = {
+    "fecha": ["fecha"],
+    "id_suscripcion": ["ID Suscripcion", "ID Suscripción", "id_suscripcion"],
+    "monto": ["monto"],
+    "http_status_code": ["http_status_code", "status_code"],
+    "detalle": ["detalle", "descripcion_error"],
+}
+COLUMNAS_OPCIONALES = {"detalle"}
+
+# Formato esperado de la fecha cuando llega como texto (CSV); lo que no lo
+# cumpla se interpreta con la inferencia general de pandas
+FORMATO_FECHA = "ISO8601"
+
+# Con menos filas la limpieza en paralelo no compensa el costo de los procesos
+MIN_FILAS_LIMPIEZA_PARALELA = 200_000
+
+FORMATOS_EXCEL = (".xlsx", ".xls")
+FORMATOS_CSV = (".csv", ".csv.gz")
+FORMATOS_PARQUET = (".parquet", ".pq")
+
 
 def detectar_columna(df: pd.DataFrame, posibles: List[str], requerido=True) -> str:
     cols_lower = {c.lower(): c for c in df.columns}
@@ -51,129 +75,840 @@ def detectar_columna(df: pd.DataFrame, posibles: List[str], requerido=True) -> s
     return None
 
 
-def cargar_y_limpiar(path_excel: str) -> pd.DataFrame:
-    if not os.path.isfile(path_excel):
-        raise FileNotFoundError(f"No se encontró {path_excel}")
+def _es_columna_candidata(col) -> bool:
+    """True si el nombre de columna coincide con alguno de COLUMNAS_POSIBLES."""
+    nombre = str(col).lower()
+    return any(nombre == p.lower() for posibles in COLUMNAS_POSIBLES.values() for p in posibles)
 
-    df = pd.read_excel(path_excel)
 
-    col_fecha = detectar_columna(df, ["fecha"])
-    col_id = detectar_columna(df, ["ID Suscripcion", "ID Suscripción", "id_suscripcion"])
-    col_monto = detectar_columna(df, ["monto"])
-    col_http = detectar_columna(df, ["http_status_code", "status_code"])
-    col_detalle = detectar_columna(df, ["detalle", "descripcion_error"], requerido=False)
+def _tiene_extension(path: str, extensiones: Tuple[str, ...]) -> bool:
+    return path.lower().endswith(extensiones)
 
-    df[col_fecha] = pd.to_datetime(df[col_fecha], errors="coerce")
-    df[col_monto] = pd.to_numeric(df[col_monto], errors="coerce")
-    df[col_http] = pd.to_numeric(df[col_http], errors="coerce")
 
-    df = df.dropna(subset=[col_fecha, col_id, col_monto, col_http])
-    df = df.drop_duplicates()
+def leer_intentos(path: str) -> pd.DataFrame:
+    """
+    Lee el log de intentos desde Excel, CSV o Parquet, proyectando solo las
+    columnas que reconoce detectar_columna (el resto no se carga).
 
-    df = df.rename(
-        columns={
-            col_fecha: "fecha",
-            col_id: "id_suscripcion",
-            col_monto: "monto",
-            col_http: "http_status_code",
-        }
-    )
+    Para un Excel se usa la caché Parquet generada con --convertir-parquet si
+    sigue vigente (ver cache_parquet_vigente).
+    """
+    if _tiene_extension(path, FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+
+        nombres = pq.read_schema(path).names
+        columnas = [c for c in nombres if _es_columna_candidata(c)]
+        return pd.read_parquet(path, columns=columnas)
+
+    if _tiene_extension(path, FORMATOS_CSV):
+        return pd.read_csv(path, usecols=_es_columna_candidata)
+
+    if _tiene_extension(path, FORMATOS_EXCEL):
+        path_cache = ruta_cache_parquet(path)
+        if cache_parquet_vigente(path, path_cache):
+            print(f"Usando caché Parquet: {path_cache}")
+            return leer_intentos(path_cache)
+        return pd.read_excel(path, usecols=_es_columna_candidata)
+
+    raise ValueError(f"Formato no soportado: {path} (use .xlsx, .csv o .parquet)")
+
+
+def compactar_tipos(df: pd.DataFrame, col_id: str, col_detalle: str = None) -> pd.DataFrame:
+    """Id y detalle como category (muchos valores repetidos)."""
+    df[col_id] = df[col_id].astype("category")
     if col_detalle:
-        df = df.rename(columns={col_detalle: "detalle"})
-    else:
+        df[col_detalle] = df[col_detalle].astype("category")
+    return df
+
+
+# ------------------------------
+# Caché Parquet de un Excel
+# ------------------------------
+
+def ruta_cache_parquet(path_excel: str) -> str:
+    """suscripciones.xlsx -> suscripciones.parquet (en la misma carpeta)."""
+    return os.path.splitext(path_excel)[0] + ".parquet"
+
+
+def _hash_archivo(path: str, bloque: int = 1 << 20) -> str:
+    import hashlib
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _leer_meta_cache(path_cache: str) -> Dict:
+    import json
+
+    try:
+        with open(path_cache + ".meta.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _escribir_meta_cache(path_cache: str, meta: Dict) -> None:
+    import json
+
+    with open(path_cache + ".meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def cache_parquet_vigente(path_origen: str, path_cache: str) -> bool:
+    """
+    La caché es vigente si el origen tiene el mismo mtime y tamaño que al
+    convertir. Si solo cambió el mtime (p.ej. el archivo se copió), se
+    compara el hash SHA-256 y, si coincide, se actualiza el mtime guardado.
+    """
+    if not os.path.isfile(path_cache):
+        return False
+    meta = _leer_meta_cache(path_cache)
+    if not meta:
+        return False
+
+    st = os.stat(path_origen)
+    if meta.get("size") != st.st_size:
+        return False
+    if meta.get("mtime_ns") == st.st_mtime_ns:
+        return True
+
+    if meta.get("sha256") != _hash_archivo(path_origen):
+        return False
+    meta["mtime_ns"] = st.st_mtime_ns
+    _escribir_meta_cache(path_cache, meta)
+    return True
+
+
+def convertir_a_parquet(path_excel: str, forzar: bool = False) -> str:
+    """
+    Conversión única del export Excel a Parquet (junto al Excel). Solo se
+    guardan las columnas reconocidas, con id/detalle como category. Se
+    rehace si el Excel cambió (mtime/hash) o con forzar=True.
+    """
+    if not os.path.isfile(path_excel):
+        raise FileNotFoundError(f"No se encontró {path_excel}")
+
+    path_cache = ruta_cache_parquet(path_excel)
+    if not forzar and cache_parquet_vigente(path_excel, path_cache):
+        print(f"Caché Parquet vigente: {path_cache}")
+        return path_cache
+
+    df = pd.read_excel(path_excel, usecols=_es_columna_candidata)
+    col_id = detectar_columna(df, COLUMNAS_POSIBLES["id_suscripcion"])
+    col_detalle = detectar_columna(df, COLUMNAS_POSIBLES["detalle"], requerido=False)
+    if col_detalle:
+        df[col_detalle] = df[col_detalle].astype(str).where(df[col_detalle].notna())
+    df = compactar_tipos(df, col_id, col_detalle)
+
+    tmp_path = path_cache + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path_cache)
+
+    st = os.stat(path_excel)
+    _escribir_meta_cache(path_cache, {
+        "origen": os.path.basename(path_excel),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": _hash_archivo(path_excel),
+    })
+    print(f"Excel convertido a Parquet: {path_cache} ({len(df)} filas)")
+    return path_cache
+
+
+def _convertir_fechas(serie: pd.Series) -> pd.Series:
+    """
+    Fechas con FORMATO_FECHA (una sola pasada, sin inferir el formato fila a
+    fila); solo los valores que no lo cumplen pasan por la inferencia
+    general. Inválidas -> NaT. Si ya son datetime no se tocan.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    fechas = pd.to_datetime(serie, format=FORMATO_FECHA, errors="coerce")
+    fallidas = (fechas.isna() & serie.notna()).to_numpy()
+    if fallidas.any():
+        import warnings
+
+        with warnings.catch_warnings():  # el aviso de "formato no inferido" es esperado aquí
+            warnings.simplefilter("ignore", UserWarning)
+            fechas[fallidas] = pd.to_datetime(serie[fallidas], errors="coerce")
+    return fechas
+
+
+def _a_numero(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    return pd.to_numeric(serie, errors="coerce")
+
+
+def normalizar_intentos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Detecta las columnas, convierte tipos (fecha, monto, http) descartando
+    valores inválidos y renombra a los nombres canónicos. Trabaja fila a fila,
+    así que sirve tanto para el archivo completo como para un bloque.
+    """
+    col_fecha = detectar_columna(df, COLUMNAS_POSIBLES["fecha"])
+    col_id = detectar_columna(df, COLUMNAS_POSIBLES["id_suscripcion"])
+    col_monto = detectar_columna(df, COLUMNAS_POSIBLES["monto"])
+    col_http = detectar_columna(df, COLUMNAS_POSIBLES["http_status_code"])
+    col_detalle = detectar_columna(df, COLUMNAS_POSIBLES["detalle"], requerido=False)
+
+    # solo las columnas reconocidas (si hay variantes duplicadas, la primera)
+    df = df[[c for c in (col_fecha, col_id, col_monto, col_http, col_detalle) if c]]
+
+    df[col_fecha] = _convertir_fechas(df[col_fecha])
+    df[col_monto] = _a_numero(df[col_monto])
+    df[col_http] = _a_numero(df[col_http])
+
+    # filtrar y renombrar sin copias extra del frame (solo se filtra si hace falta)
+    validas = np.ones(len(df), dtype=bool)
+    for col in (col_fecha, col_id, col_monto, col_http):
+        validas &= df[col].notna().to_numpy()
+    if not validas.all():
+        df = df[validas]
+
+    canonicos = {
+        col_fecha: "fecha",
+        col_id: "id_suscripcion",
+        col_monto: "monto",
+        col_http: "http_status_code",
+        col_detalle: "detalle",
+    }
+    df.columns = [canonicos[c] for c in df.columns]
+    if not col_detalle:
         df["detalle"] = "SIN_DETALLE"
 
+    return df
+
+
+def filas_unicas(df: pd.DataFrame) -> np.ndarray:
+    """
+    Máscara de la primera aparición de cada fila (como drop_duplicates).
+    Compara un hash de 64 bits por fila en lugar de todas las columnas (el
+    detalle es texto libre); solo las filas cuyo hash se repite se comparan
+    columna a columna, así que una colisión no descarta filas distintas.
+    """
+    clave = pd.Series(pd.util.hash_pandas_object(df, index=False).to_numpy())
+    repetidas = clave.duplicated(keep=False).to_numpy()
+    unicas = np.ones(len(df), dtype=bool)
+    if repetidas.any():
+        unicas[repetidas] = ~df[repetidas].duplicated().to_numpy()
+    return unicas
+
+
+def limpiar_intentos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Limpieza de un log crudo (o de una partición por suscripción): normaliza,
+    compacta tipos, descarta duplicados exactos y suscripciones con menos de
+    2 intentos, y ordena por suscripción y fecha. El filtro y el orden salen
+    de un único take con el tamaño de grupo de cada suscripción.
+    """
+    df = normalizar_intentos(df)
+
+    # tipos compactos antes de deduplicar: category para id/detalle, int16
+    # para el HTTP status (el hash usa los códigos y no los strings)
+    df = compactar_tipos(df, "id_suscripcion", "detalle")
+    fuera_int16 = df["http_status_code"].abs().max() > np.iinfo(np.int16).max
+    df["http_status_code"] = df["http_status_code"].astype(np.int32 if fuera_int16 else np.int16)
+
+    pos = np.flatnonzero(filas_unicas(df))
+
     # nos quedamos solo con suscripciones que tienen al menos 2 intentos (coherente con la tesis)
-    counts = df["id_suscripcion"].value_counts()
-    ids_validos = counts[counts >= 2].index
-    df = df[df["id_suscripcion"].isin(ids_validos)].copy()
+    codigos = df["id_suscripcion"].cat.codes.to_numpy()[pos]
+    tamanios = np.bincount(codigos, minlength=len(df["id_suscripcion"].cat.categories))
+    con_dos = tamanios[codigos] >= 2
+    pos, codigos = pos[con_dos], codigos[con_dos]
+
+    # orden estable por (suscripción, fecha), igual que sort_values
+    fechas = df["fecha"].to_numpy().view(np.int64)[pos]
+    orden = pos[np.lexsort((fechas, codigos))]
+    return df.take(orden).reset_index(drop=True)
+
+
+def _particion_por_suscripcion(ids: pd.Series, n: int) -> np.ndarray:
+    """Partición (0..n-1) de cada fila según un hash de su id de suscripción."""
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        hash_cat = pd.util.hash_array(ids.cat.categories.to_numpy())
+        return (hash_cat[ids.cat.codes.to_numpy()] % n).astype(np.int32)
+    return (pd.util.hash_array(ids.to_numpy()) % n).astype(np.int32)
+
+
+def _unir_particiones(partes: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Une las particiones limpias en el mismo resultado que limpiar_intentos
+    sobre el log completo: categorías unificadas (ordenadas, como astype) y
+    orden por suscripción y fecha. Las suscripciones no se repiten entre
+    particiones, así que basta un orden estable por el código del id.
+    """
+    from pandas.api.types import union_categoricals
+
+    columnas = {}
+    for col in partes[0].columns:
+        valores = [p[col] for p in partes]
+        if isinstance(valores[0].dtype, pd.CategoricalDtype):
+            columnas[col] = pd.Series(union_categoricals(valores, sort_categories=True))
+        else:
+            columnas[col] = pd.concat(valores, ignore_index=True)
+    df = pd.DataFrame(columnas)
+    orden = np.argsort(df["id_suscripcion"].cat.codes.to_numpy(), kind="stable")
+    return df.take(orden).reset_index(drop=True)
+
+
+def cargar_y_limpiar(path_excel: str, jobs: int = 1) -> pd.DataFrame:
+    """
+    Carga el log y lo limpia (ver limpiar_intentos). Con jobs > 1 las filas
+    se reparten por hash del id de suscripción entre procesos (las
+    suscripciones son independientes) y el resultado es idéntico al de un
+    solo proceso.
+    """
+    if not os.path.isfile(path_excel):
+        raise FileNotFoundError(f"No se encontró {path_excel}")
 
-    df = df.sort_values(["id_suscripcion", "fecha"]).reset_index(drop=True)
+    df = leer_intentos(path_excel)
+    if jobs <= 1 or len(df) < MIN_FILAS_LIMPIEZA_PARALELA:
+        return limpiar_intentos(df)
 
-    return df
+    col_id = detectar_columna(df, COLUMNAS_POSIBLES["id_suscripcion"])
+    particion = _particion_por_suscripcion(df[col_id], jobs)
+    orden = np.argsort(particion, kind="stable")
+    cortes = np.searchsorted(particion[orden], np.arange(1, jobs))
+    partes = [df.take(idx) for idx in np.split(orden, cortes)]
+    del df
+
+    limpias = joblib.Parallel(n_jobs=jobs, backend="loky")(
+        joblib.delayed(limpiar_intentos)(parte) for parte in partes
+    )
+    return _unir_particiones(limpias)
 
 
 # ==============================
 # 2) Dataset de (fallo + segundo intento) y features
 # ==============================
 
-def construir_pares(df: pd.DataFrame) -> pd.DataFrame:
-    pares = []
-    for sid, g in df.groupby("id_suscripcion"):
-        g = g.sort_values("fecha").reset_index(drop=True)
-        i = 0
-        while i < len(g) - 1:
-            fail = g.iloc[i]
-            if int(fail["http_status_code"]) == 201:
-                i += 1
-                continue
-            second = g.iloc[i + 1]
-            pares.append(
-                {
-                    "id_suscripcion": sid,
-                    "fecha_fail": fail["fecha"],
-                    "fecha_second": second["fecha"],
-                    "monto": float(fail["monto"]),
-                    "http_fail": int(fail["http_status_code"]),
-                    "detalle_fail": str(fail["detalle"]),
-                    "http_second": int(second["http_status_code"]),
-                }
-            )
-            i += 2
+def _etiquetas(nombres: List[str]) -> np.ndarray:
+    """
+    Array object con un string por etiqueta: indexarlo con un array de
+    posiciones da una columna que comparte esos objetos en lugar de crear un
+    string por fila.
+    """
+    etiquetas = np.empty(len(nombres), dtype=object)
+    etiquetas[:] = nombres
+    return etiquetas
+
+
+_CATEGORIAS_HTTP = _etiquetas(["cliente_4xx", "servicio_5xx", "exito_201", ""])
+_BUCKETS_HORARIOS = _etiquetas(["madrugada", "manana", "tarde", "noche"])
+
+
+def categorizar_http(codes: pd.Series) -> pd.Series:
+    """Categoría de error a partir del HTTP status (vectorizado)."""
+    valores = codes.to_numpy().astype(np.int64)
+    pos = np.select(
+        [
+            (valores >= 400) & (valores < 500),
+            (valores >= 500) & (valores < 600),
+            valores == 201,
+        ],
+        [0, 1, 2],
+        default=3,
+    )
+    cat = _CATEGORIAS_HTTP[pos]
+    otros = pos == 3
+    if otros.any():
+        unicos, inversa = np.unique(valores[otros], return_inverse=True)
+        cat[otros] = _etiquetas([f"otro_{c}" for c in unicos])[inversa]
+    return pd.Series(cat, index=codes.index)
+
+
+def bucket_horario(horas: pd.Series) -> pd.Series:
+    """Bucket horario del reintento: madrugada [0,6), manana [6,12), tarde [12,18), noche."""
+    pos = np.select(
+        [(horas >= 0) & (horas < 6), (horas >= 6) & (horas < 12), (horas >= 12) & (horas < 18)],
+        [0, 1, 2],
+        default=3,
+    )
+    return pd.Series(_BUCKETS_HORARIOS[pos], index=horas.index)
 
-    df_pares = pd.DataFrame(pares)
-    if df_pares.empty:
-        raise ValueError("No se encontraron pares (fallo + segundo intento).")
 
+def seleccionar_pares(sid: np.ndarray, status: np.ndarray) -> np.ndarray:
+    """
+    Índices (posiciones) de los intentos fallidos que abren un par, sobre
+    arrays ya ordenados por (id_suscripcion, fecha). El segundo intento del
+    par es siempre la posición siguiente.
+
+    Reproduce el recorrido secuencial por suscripción: un 201 no abre par y
+    se avanza 1; un fallo abre par con el intento siguiente y se avanza 2.
+    Dentro de cada racha de fallos consecutivos (que empieza al inicio de la
+    suscripción o después de un 201) abren par los fallos en posición par de
+    la racha, siempre que exista un intento siguiente en la misma suscripción.
+    """
+    if len(sid) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    abre, tiene_siguiente = _marcar_aperturas(sid, status)
+    return np.flatnonzero(abre & tiene_siguiente)
+
+
+def _marcar_aperturas(sid: np.ndarray, status: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (abre, tiene_siguiente): abre marca los fallos que abrirían un par según
+    el recorrido secuencial; tiene_siguiente, si hay otro intento después en
+    la misma suscripción. Un fallo que abre sin siguiente queda pendiente.
+    """
+    n = len(sid)
+    pos = np.arange(n)
+    fallo = status != 201
+
+    nuevo_grupo = np.ones(n, dtype=bool)
+    nuevo_grupo[1:] = sid[1:] != sid[:-1]
+
+    previo_exito = np.zeros(n, dtype=bool)
+    previo_exito[1:] = ~fallo[:-1]
+
+    inicio_racha = fallo & (nuevo_grupo | previo_exito)
+    inicio_pos = np.maximum.accumulate(np.where(inicio_racha, pos, 0))
+    offset = pos - inicio_pos
+
+    tiene_siguiente = np.zeros(n, dtype=bool)
+    tiene_siguiente[:-1] = ~nuevo_grupo[1:]
+
+    return fallo & (offset % 2 == 0), tiene_siguiente
+
+
+def _detalle_como_texto(detalle: pd.Series) -> np.ndarray:
+    """str() de cada detalle; cualquier faltante (NaN/None) queda como "nan"."""
+    if isinstance(detalle.dtype, pd.CategoricalDtype):
+        # un str() por categoría; el código -1 (faltante) toma el "nan" del final
+        textos = _etiquetas([str(c) for c in detalle.cat.categories] + ["nan"])
+        return textos[detalle.cat.codes.to_numpy()]
+    return detalle.astype(str).where(detalle.notna(), "nan").to_numpy()
+
+
+def derivar_features(df_pares: pd.DataFrame) -> pd.DataFrame:
+    """Agrega etiqueta y variables derivadas a un DataFrame de pares (in place)."""
     # etiqueta objetivo: éxito en segundo intento
     df_pares["target_exito_second"] = (df_pares["http_second"] == 201).astype(int)
+    return derivar_features_reintento(df_pares)
+
 
+def derivar_features_reintento(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Variables del modelo a partir de fecha_fail, fecha_second y http_fail (in
+    place). No usa el resultado del reintento, así que sirve también para
+    reintentos pendientes (ver puntuar-reintentos.py).
+    """
     # variables de tiempo
-    df_pares["delta_horas"] = (
-        df_pares["fecha_second"] - df_pares["fecha_fail"]
-    ).dt.total_seconds() / 3600.0
-    df_pares["delta_horas"] = df_pares["delta_horas"].clip(lower=0)
-
-    df_pares["retry_hour"] = df_pares["fecha_second"].dt.hour
-    df_pares["retry_dayofweek"] = df_pares["fecha_second"].dt.dayofweek
-    df_pares["retry_is_weekend"] = df_pares["retry_dayofweek"].isin([5, 6]).astype(int)
-
-    # categoría de error
-    def cat_http(code: int) -> str:
-        if 400 <= code < 500:
-            return "cliente_4xx"
-        elif 500 <= code < 600:
-            return "servicio_5xx"
-        elif code == 201:
-            return "exito_201"
-        else:
-            return f"otro_{int(code)}"
-
-    df_pares["error_categoria"] = df_pares["http_fail"].apply(cat_http)
-
-    # bucket horario
-    def bucket_hora(h: int) -> str:
-        if 0 <= h < 6:
-            return "madrugada"
-        elif 6 <= h < 12:
-            return "manana"
-        elif 12 <= h < 18:
-            return "tarde"
-        else:
-            return "noche"
+    df["delta_horas"] = (df["fecha_second"] - df["fecha_fail"]).dt.total_seconds() / 3600.0
+    df["delta_horas"] = df["delta_horas"].clip(lower=0)
+
+    df["retry_hour"] = df["fecha_second"].dt.hour
+    df["retry_dayofweek"] = df["fecha_second"].dt.dayofweek
+    df["retry_is_weekend"] = df["retry_dayofweek"].isin([5, 6]).astype(int)
+
+    # categoría de error y bucket horario
+    df["error_categoria"] = categorizar_http(df["http_fail"])
+    df["retry_hora_bucket"] = bucket_horario(df["retry_hour"])
+
+    return df
+
+
+def construir_pares(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Construye los pares (fallo + segundo intento) de forma columnar: un único
+    ordenamiento estable por (id_suscripcion, fecha) y la selección de pares
+    con operaciones vectorizadas (ver seleccionar_pares).
+
+    Solo se ordenan las posiciones (np.lexsort) y las dos columnas que usa la
+    selección; monto, fecha y detalle se leen únicamente en las filas de los
+    pares, sin copiar el log completo.
+    """
+    ids = df["id_suscripcion"]
+    if ids.isna().any():
+        df = df[ids.notna()]
+        ids = df["id_suscripcion"]
+
+    # con id categórico se ordena y compara por los códigos enteros (mismo
+    # orden que sort_values); si no, por los códigos de factorize ordenado
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        codigos = ids.cat.codes.to_numpy()
+    else:
+        codigos = pd.factorize(ids, sort=True)[0]
+    fecha = df["fecha"].to_numpy()
+    orden = np.lexsort((fecha, codigos))  # estable, como sort_values(kind="mergesort")
+
+    sid = codigos[orden]
+    status = df["http_status_code"].to_numpy()[orden].astype(np.int64)
+
+    idx_fail = seleccionar_pares(sid, status)
+    if len(idx_fail) == 0:
+        raise ValueError("No se encontraron pares (fallo + segundo intento).")
+    pos_fail = orden[idx_fail]
+    pos_second = orden[idx_fail + 1]
+
+    df_pares = pd.DataFrame(
+        {
+            "id_suscripcion": ids.iloc[pos_fail].reset_index(drop=True),
+            "fecha_fail": fecha[pos_fail],
+            "fecha_second": fecha[pos_second],
+            "monto": df["monto"].to_numpy()[pos_fail].astype(float),
+            "http_fail": status[idx_fail],
+            "detalle_fail": _detalle_como_texto(df["detalle"].iloc[pos_fail]),
+            "http_second": status[idx_fail + 1],
+        }
+    )
+
+    return derivar_features(df_pares)
+
 
-    df_pares["retry_hora_bucket"] = df_pares["retry_hour"].apply(bucket_hora)
+# ==============================
+# 2b) Modo streaming (out-of-core)
+# ==============================
+
+CHUNK_FILAS = 500_000
+DIR_PARES_STREAMING = os.path.join("data", "pares")
 
-    return df_pares
+
+def iterar_intentos(path: str, chunk_filas: int = CHUNK_FILAS) -> Iterator[pd.DataFrame]:
+    """
+    Lee el log de intentos por bloques de chunk_filas filas (CSV o Parquet).
+    Un Excel no se puede leer por bloques: se usa su caché Parquet si existe.
+    """
+    if _tiene_extension(path, FORMATOS_EXCEL):
+        path_cache = ruta_cache_parquet(path)
+        if not cache_parquet_vigente(path, path_cache):
+            raise ValueError(
+                f"{path} no se puede leer por bloques; conviértalo antes con --convertir-parquet"
+            )
+        path = path_cache
+
+    if _tiene_extension(path, FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path)
+        columnas = [c for c in pf.schema_arrow.names if _es_columna_candidata(c)]
+        for batch in pf.iter_batches(batch_size=chunk_filas, columns=columnas):
+            yield batch.to_pandas()
+    elif _tiene_extension(path, FORMATOS_CSV):
+        yield from pd.read_csv(path, usecols=_es_columna_candidata, chunksize=chunk_filas)
+    else:
+        raise ValueError(f"Formato no soportado: {path} (use .csv o .parquet)")
+
+
+def _pares_de_bloque(bloque: pd.DataFrame, pendientes: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aplica el recorrido de construir_pares a un bloque, continuando desde los
+    fallos pendientes (sin segundo intento aún) de bloques anteriores.
+
+    Todos los pendientes son anteriores en fecha a cualquier fila del bloque,
+    así que basta con ponerlos primero y ordenar de forma estable por id: cada
+    suscripción retoma exactamente en el estado en que quedó. Retorna
+    (pares, nuevos_pendientes).
+    """
+    df = pd.concat([pendientes, bloque], ignore_index=True) if len(pendientes) else bloque
+    df = df.sort_values("id_suscripcion", kind="mergesort")
+
+    sid = df["id_suscripcion"].to_numpy()
+    status = df["http_status_code"].to_numpy().astype(np.int64)
+    abre, tiene_siguiente = _marcar_aperturas(sid, status)
+
+    idx_fail = np.flatnonzero(abre & tiene_siguiente)
+    idx_second = idx_fail + 1
+    nuevos_pendientes = df.iloc[np.flatnonzero(abre & ~tiene_siguiente)]
+
+    fecha = df["fecha"].to_numpy()
+    df_pares = pd.DataFrame(
+        {
+            "id_suscripcion": sid[idx_fail],
+            "fecha_fail": fecha[idx_fail],
+            "fecha_second": fecha[idx_second],
+            "monto": df["monto"].to_numpy()[idx_fail].astype(float),
+            "http_fail": status[idx_fail],
+            "detalle_fail": _detalle_como_texto(df["detalle"].iloc[idx_fail]),
+            "http_second": status[idx_second],
+        }
+    )
+    return df_pares, nuevos_pendientes
+
+
+def construir_pares_streaming(path: str, dir_salida: str = DIR_PARES_STREAMING,
+                              chunk_filas: int = CHUNK_FILAS) -> Dict[str, int]:
+    """
+    Equivalente out-of-core de cargar_y_limpiar + construir_pares: lee el log
+    por bloques y escribe los pares de cada bloque como un archivo más del
+    dataset Parquet en dir_salida. La memoria queda acotada por el tamaño del
+    bloque más el estado por suscripción (su último fallo sin segundo intento).
+
+    Requiere que el archivo esté ordenado por fecha (como sale de un export
+    cronológico). Las filas con la fecha máxima de cada bloque se retienen
+    para el bloque siguiente, de modo que los intentos con la misma fecha
+    (y por lo tanto los duplicados exactos) se procesan siempre juntos.
+    El filtro de >= 2 intentos no hace falta: una suscripción con un solo
+    intento nunca forma un par.
+    """
+    import shutil
+
+    if os.path.isdir(dir_salida):
+        shutil.rmtree(dir_salida)
+    os.makedirs(dir_salida)
+
+    pendientes = pd.DataFrame()
+    retenidas = pd.DataFrame()
+    ultima_fecha = None
+    stats = {"filas_leidas": 0, "bloques": 0, "pares": 0}
+
+    def procesar(bloque: pd.DataFrame) -> None:
+        nonlocal pendientes
+        bloque = bloque[filas_unicas(bloque)]
+        df_pares, pendientes = _pares_de_bloque(bloque, pendientes)
+        if not df_pares.empty:
+            derivar_features(df_pares)
+            parte = os.path.join(dir_salida, f"part-{stats['bloques']:05d}.parquet")
+            df_pares.to_parquet(parte, index=False)
+            stats["pares"] += len(df_pares)
+        stats["bloques"] += 1
+
+    for chunk in iterar_intentos(path, chunk_filas):
+        stats["filas_leidas"] += len(chunk)
+        chunk = normalizar_intentos(chunk)
+        if chunk.empty:
+            continue
+
+        bloque = pd.concat([retenidas, chunk], ignore_index=True) if len(retenidas) else chunk
+        bloque = bloque.sort_values("fecha", kind="mergesort")
+
+        if ultima_fecha is not None and bloque["fecha"].iloc[0] <= ultima_fecha:
+            raise ValueError(
+                f"El archivo no está ordenado por fecha ({bloque['fecha'].iloc[0]} <= {ultima_fecha}); "
+                "el modo streaming requiere un log cronológico"
+            )
+
+        fecha_max = bloque["fecha"].iloc[-1]
+        es_max = (bloque["fecha"] == fecha_max).to_numpy()
+        retenidas = bloque[es_max]
+        listas = bloque[~es_max]
+        if len(listas):
+            ultima_fecha = listas["fecha"].iloc[-1]
+            procesar(listas)
+
+    if len(retenidas):
+        procesar(retenidas)
+
+    if stats["pares"] == 0:
+        raise ValueError("No se encontraron pares (fallo + segundo intento).")
+    return stats
+
+
+def leer_dataset_pares(dir_pares: str = DIR_PARES_STREAMING) -> pd.DataFrame:
+    """
+    Lee el dataset de pares escrito por construir_pares_streaming en el mismo
+    orden que construir_pares (por suscripción y fecha del fallo).
+    """
+    partes = sorted(
+        os.path.join(dir_pares, f) for f in os.listdir(dir_pares) if f.endswith(".parquet")
+    )
+    df_pares = pd.concat([pd.read_parquet(p) for p in partes], ignore_index=True)
+    return df_pares.sort_values(["id_suscripcion", "fecha_fail"], kind="mergesort").reset_index(drop=True)
+
+
+# ==============================
+# 2c) Almacén incremental de pares
+# ==============================
+
+DIR_ALMACEN_PARES = os.path.join("data", "almacen_pares")
+VERSION_ALMACEN = 1
+
+
+def _rutas_almacen(dir_almacen: str, corrida: int) -> Dict[str, str]:
+    """Archivos del almacén; estado y pendientes llevan el número de corrida."""
+    return {
+        "pares": os.path.join(dir_almacen, "pares"),
+        "estado": os.path.join(dir_almacen, f"estado-{corrida:05d}.parquet"),
+        "pendientes": os.path.join(dir_almacen, f"pendientes-{corrida:05d}.parquet"),
+        "meta": os.path.join(dir_almacen, "almacen.json"),
+    }
+
+
+def _leer_meta_almacen(path_meta: str) -> Dict:
+    import json
+
+    try:
+        with open(path_meta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _escribir_parquet_atomico(df: pd.DataFrame, path: str) -> None:
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _motivo_reconstruccion(meta: Dict, path: str, rutas: Dict[str, str]) -> str:
+    """Por qué el almacén no sirve para una corrida incremental ("" si sirve)."""
+    if not meta:
+        return "no existe el almacén"
+    if meta.get("version") != VERSION_ALMACEN:
+        return f"versión del almacén {meta.get('version')} (se espera {VERSION_ALMACEN})"
+    if meta.get("origen") != os.path.abspath(path):
+        return f"el almacén se construyó con {meta.get('origen')}"
+    faltantes = [p for p in [rutas["estado"], rutas["pendientes"]] +
+                 [os.path.join(rutas["pares"], parte) for parte in meta.get("partes", [])]
+                 if not os.path.isfile(p)]
+    if faltantes:
+        return f"faltan archivos del almacén ({faltantes[0]})"
+    return ""
+
+
+def _limpiar_almacen(dir_almacen: str, meta: Dict, rutas: Dict[str, str]) -> None:
+    """Borra estados anteriores y partes no registradas en almacen.json."""
+    vigentes = {rutas["estado"], rutas["pendientes"], rutas["meta"], rutas["pares"]}
+    for archivo in os.listdir(dir_almacen):
+        path = os.path.join(dir_almacen, archivo)
+        if path not in vigentes:
+            os.remove(path)
+    for archivo in os.listdir(rutas["pares"]):
+        if archivo not in meta["partes"]:
+            os.remove(os.path.join(rutas["pares"], archivo))
+
+
+def actualizar_almacen_pares(path: str, dir_almacen: str = DIR_ALMACEN_PARES,
+                             reconstruir: bool = False) -> Dict:
+    """
+    Mantiene un almacén persistente de pares con sus features en dir_almacen
+    y en cada corrida procesa solo los intentos nuevos de path:
+
+    - pares/part-NNNNN.parquet: los pares nuevos (con features) de cada
+      corrida; se leen con leer_dataset_pares.
+    - estado-NNNNN.parquet: por suscripción, la fecha del último intento
+      visto y cuántos intentos (sin duplicados) tenía hasta ahí.
+    - pendientes-NNNNN.parquet: el último fallo de cada suscripción que abre
+      un par y todavía no tiene segundo intento (el estado del recorrido de
+      construir_pares, como en el modo streaming).
+    - almacen.json: origen, corrida vigente, partes escritas y totales.
+
+    Un intento es nuevo si su fecha es posterior al último intento visto de
+    su suscripción. Para que el resultado sea idéntico a reconstruir, los
+    intentos ya vistos tienen que seguir iguales: si el conteo por
+    suscripción hasta la última fecha vista no coincide con el estado (filas
+    borradas, intentos tardíos o con la misma fecha que el último visto) el
+    almacén se reconstruye completo, igual que con reconstruir=True. El log
+    se sigue leyendo completo en cada corrida (para un Excel conviene la
+    caché de --convertir-parquet); lo que se evita es rearmar los pares y
+    sus features.
+    """
+    import json
+    import shutil
+
+    meta = {} if reconstruir else _leer_meta_almacen(os.path.join(dir_almacen, "almacen.json"))
+    rutas = _rutas_almacen(dir_almacen, meta.get("corrida", 0))
+    motivo = "--full-rebuild" if reconstruir else _motivo_reconstruccion(meta, path, rutas)
+
+    df = normalizar_intentos(leer_intentos(path))
+    df = df[filas_unicas(df)]
+    ids = df["id_suscripcion"]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        df["id_suscripcion"] = ids.astype(ids.cat.categories.dtype)
+
+    if not motivo:
+        estado = pd.read_parquet(rutas["estado"]).set_index("id_suscripcion")
+        ultima_vista = df["id_suscripcion"].map(estado["ultima_fecha"])
+        vistas = (df["fecha"] <= ultima_vista).to_numpy()
+        conteo = df.loc[vistas, "id_suscripcion"].value_counts()
+        if not conteo.reindex(estado.index, fill_value=0).astype(np.int64).equals(estado["n_intentos"]):
+            motivo = "cambiaron intentos ya procesados"
+
+    if motivo:
+        print(f"Reconstrucción completa del almacén de pares ({motivo})")
+        if os.path.isdir(dir_almacen):
+            shutil.rmtree(dir_almacen)
+        meta = {"version": VERSION_ALMACEN, "origen": os.path.abspath(path),
+                "corrida": 0, "partes": [], "pares": 0}
+        pendientes = pd.DataFrame()
+        vistas = np.zeros(len(df), dtype=bool)
+    else:
+        pendientes = pd.read_parquet(rutas["pendientes"])
+    meta["corrida"] += 1
+    rutas = _rutas_almacen(dir_almacen, meta["corrida"])
+    os.makedirs(rutas["pares"], exist_ok=True)
+
+    # mismo orden que cargar_y_limpiar; los pendientes se anteponen en _pares_de_bloque
+    nuevas = df[~vistas].sort_values(["id_suscripcion", "fecha"])
+    df_pares, pendientes = _pares_de_bloque(nuevas, pendientes)
+
+    if not df_pares.empty:
+        derivar_features(df_pares)
+        parte = f"part-{len(meta['partes']):05d}.parquet"
+        _escribir_parquet_atomico(df_pares, os.path.join(rutas["pares"], parte))
+        meta["partes"].append(parte)
+        meta["pares"] += len(df_pares)
+
+    pendientes = pendientes.copy()
+    pendientes["detalle"] = pendientes["detalle"].astype(str).where(pendientes["detalle"].notna())
+    _escribir_parquet_atomico(pendientes, rutas["pendientes"])
+
+    estado = df.groupby("id_suscripcion", sort=False)["fecha"].agg(ultima_fecha="max", n_intentos="size")
+    _escribir_parquet_atomico(estado.reset_index(), rutas["estado"])
+
+    # almacen.json al final: si la corrida se interrumpe antes, la siguiente
+    # parte del estado anterior y los archivos nuevos se descartan
+    meta.update({"filas": len(df), "fecha_max": str(df["fecha"].max())})
+    tmp_meta = rutas["meta"] + ".tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_meta, rutas["meta"])
+    _limpiar_almacen(dir_almacen, meta, rutas)
+
+    return {
+        "reconstruido": bool(motivo),
+        "filas": len(df),
+        "filas_nuevas": len(nuevas),
+        "pares_nuevos": len(df_pares),
+        "pares": meta["pares"],
+        "partes": len(meta["partes"]),
+    }
+
+
+# Tipos de las variables numéricas del modelo (retry_* caben en int8). monto y
+# delta_horas quedan en float64, como las reciben la Lambda, el scorer compilado
+# y el modelo portable: en float32 los árboles cortan sobre valores redondeados
+# y las probabilidades de entrenamiento/test no serían las de producción.
+TIPOS_NUMERICOS = {
+    "monto": np.float64,
+    "delta_horas": np.float64,
+    "retry_hour": np.int8,
+    "retry_dayofweek": np.int8,
+    "retry_is_weekend": np.int8,
+}
 
 
 def preparar_features(df_pares: pd.DataFrame):
-    num_cols = ["monto", "delta_horas", "retry_hour", "retry_dayofweek", "retry_is_weekend"]
+    """
+    X e y con tipos compactos: las categóricas como category (un código por
+    fila en lugar de un string) y las numéricas según TIPOS_NUMERICOS. Se
+    convierte columna a columna desde df_pares (filtrando las filas con
+    faltantes en cada columna), así que id, fechas y HTTP nunca se copian.
+    El ColumnTransformer recibe las columnas category tal cual.
+    """
+    num_cols = list(TIPOS_NUMERICOS)
     cat_cols = ["error_categoria", "detalle_fail", "retry_hora_bucket"]
+    target = "target_exito_second"
+
+    validas = np.ones(len(df_pares), dtype=bool)
+    for col in num_cols + cat_cols + [target]:
+        validas &= df_pares[col].notna().to_numpy()
+    todas = validas.all()
+
+    def columna(col: str) -> pd.Series:
+        return df_pares[col] if todas else df_pares[col][validas]
 
-    df = df_pares.dropna(subset=num_cols + cat_cols + ["target_exito_second"]).copy()
-    X = df[num_cols + cat_cols]
-    y = df["target_exito_second"].astype(int)
+    X = pd.DataFrame(
+        {**{col: columna(col).astype(TIPOS_NUMERICOS[col]) for col in num_cols},
+         **{col: columna(col).astype("category") for col in cat_cols}}
+    )
+    y = columna(target).astype(np.int8)
     return X, y, num_cols, cat_cols
 
 
@@ -193,8 +928,315 @@ def construir_preprocesador(num_cols, cat_cols):
     return pre
 
 
-def evaluar_modelo(nombre: str, modelo, X_test, y_test, threshold: float = 0.5) -> Dict[str, float]:
-    proba = modelo.predict_proba(X_test)[:, 1]
+def construir_modelos(num_cols, cat_cols, memory=None) -> Dict[str, Pipeline]:
+    """
+    Pipelines (preprocesador + clasificador) de las familias evaluadas.
+    Con memory (joblib.Memory o ruta) el ajuste del preprocesador se cachea.
+    """
+    modelos = {}
+
+    # 1) Regresión Logística
+    modelos["logistic_regression"] = Pipeline(
+        steps=[
+            ("preprocess", construir_preprocesador(num_cols, cat_cols)),
+            ("clf", LogisticRegression(max_iter=1000, class_weight="balanced", solver="liblinear"))
+        ],
+        memory=memory,
+    )
+
+    # 2) Random Forest
+    modelos["random_forest"] = Pipeline(
+        steps=[
+            ("preprocess", construir_preprocesador(num_cols, cat_cols)),
+            ("clf", RandomForestClassifier(
+                n_estimators=200,
+                max_depth=None,
+                min_samples_leaf=1,
+                class_weight="balanced",
+                random_state=42,
+                n_jobs=-1
+            ))
+        ],
+        memory=memory,
+    )
+
+    # 3) XGBoost (opcional)
+    if HAS_XGB:
+        modelos["xgboost"] = Pipeline(
+            steps=[
+                ("preprocess", construir_preprocesador(num_cols, cat_cols)),
+                ("clf", XGBClassifier(
+                    objective="binary:logistic",
+                    eval_metric="logloss",
+                    n_estimators=200,
+                    max_depth=5,
+                    learning_rate=0.1,
+                    subsample=0.9,
+                    colsample_bytree=0.9,
+                    random_state=42,
+                    n_jobs=-1
+                ))
+            ],
+            memory=memory,
+        )
+
+    return modelos
+
+
+# Espacios de búsqueda por familia (parámetros del paso "clf" del Pipeline)
+ESPACIOS_BUSQUEDA = {
+    "logistic_regression": {
+        "clf__C": [0.01, 0.1, 1.0, 10.0],
+    },
+    "random_forest": {
+        "clf__n_estimators": [100, 200],
+        "clf__max_depth": [None, 10, 20],
+        "clf__min_samples_leaf": [1, 5],
+    },
+    "xgboost": {
+        "clf__n_estimators": [100, 200],
+        "clf__max_depth": [3, 5, 7],
+        "clf__learning_rate": [0.05, 0.1],
+    },
+}
+
+DIR_CACHE_PREPROCESO = os.path.join("models", "cache_preproceso")
+
+
+def _buscar_familia(nombre: str, modelo: Pipeline, espacio: Dict, X_train, y_train,
+                    estrategia: str, cv_folds: int, n_jobs: int, dir_cache: str) -> Tuple[str, Dict]:
+    """Búsqueda de una familia; se ejecuta dentro de un proceso del pool."""
+    from sklearn.base import clone
+
+    if estrategia == "halving":
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV as Busqueda
+        extra = {"factor": 3}
+    else:
+        Busqueda = GridSearchCV
+        extra = {}
+
+    # el preprocesador de cada fold se ajusta una vez y se reutiliza entre candidatos
+    modelo = clone(modelo).set_params(memory=joblib.Memory(dir_cache, verbose=0))
+    # paralelismo en los folds/candidatos, no dentro de cada árbol
+    n_jobs_clf = modelo.get_params().get("clf__n_jobs")
+    if n_jobs_clf is not None:
+        modelo.set_params(clf__n_jobs=1)
+
+    cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
+    busqueda = Busqueda(modelo, espacio, scoring="f1", cv=cv, n_jobs=n_jobs, refit=True, **extra)
+
+    t0 = time.perf_counter()
+    busqueda.fit(X_train, y_train)
+    segundos = time.perf_counter() - t0
+
+    mejor = busqueda.best_estimator_
+    mejor.set_params(memory=None)
+    if n_jobs_clf is not None:
+        mejor.set_params(clf__n_jobs=n_jobs_clf)
+
+    return nombre, {
+        "modelo": mejor,
+        "mejores_params": busqueda.best_params_,
+        "mejor_f1_cv": float(busqueda.best_score_),
+        "candidatos": len(busqueda.cv_results_["params"]),
+        "segundos": segundos,
+    }
+
+
+def buscar_hiperparametros(modelos: Dict[str, Pipeline], X_train, y_train,
+                           estrategia: str = "grid", jobs: int = 1, cv_folds: int = 5,
+                           dir_cache: str = DIR_CACHE_PREPROCESO) -> Dict[str, Dict]:
+    """
+    Búsqueda (GridSearchCV o HalvingGridSearchCV) con StratifiedKFold para
+    cada familia de ESPACIOS_BUSQUEDA. Las familias corren en paralelo en un
+    pool de procesos y los `jobs` disponibles se reparten entre ellas (el
+    resto de paralelismo va a los candidatos/folds de cada búsqueda).
+
+    Retorna {nombre: {modelo, mejores_params, mejor_f1_cv, candidatos, segundos}}
+    con el mejor modelo ya reajustado sobre todo X_train.
+    """
+    familias = [n for n in modelos if n in ESPACIOS_BUSQUEDA]
+    if not familias:
+        return {}
+
+    jobs = max(1, jobs)
+    n_pool = min(jobs, len(familias))
+    n_jobs_busqueda = max(1, jobs // n_pool)
+    os.makedirs(dir_cache, exist_ok=True)
+
+    resultados = joblib.Parallel(n_jobs=n_pool, backend="loky")(
+        joblib.delayed(_buscar_familia)(
+            nombre, modelos[nombre], ESPACIOS_BUSQUEDA[nombre], X_train, y_train,
+            estrategia, cv_folds, n_jobs_busqueda, dir_cache,
+        )
+        for nombre in familias
+    )
+    return dict(resultados)
+
+
+# ------------------------------
+# Validación cruzada con matriz compartida
+# ------------------------------
+
+FAMILIAS_CV = ("random_forest", "xgboost")
+DIR_CACHE_CV = os.path.join("models", "cache_cv")
+FILAS_BLOQUE_CODIFICACION = 250_000
+# Tope del .npy de la CV compartida: denso, así que crece con el ancho del one-hot
+MAX_MB_MATRIZ_CV = 4096
+
+
+def _layout_folds(y_train, cv_folds: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Orden circular de filas para que el train de cada fold sea contiguo.
+
+    Con StratifiedKFold los folds F0..F(K-1) se colocan uno tras otro y se
+    repiten F0..F(K-2) al final: el test del fold i es el bloque i y su train
+    son los K-1 bloques siguientes (i+1 .. i+K-1), un único tramo de filas.
+    Retorna (filas de X_train en ese orden, inicio de cada bloque [2K-1 + 1]).
+    """
+    cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
+    tests = [test for _, test in cv.split(np.zeros(len(y_train)), y_train)]
+    bloques = tests + tests[:-1]
+    inicios = np.concatenate([[0], np.cumsum([len(b) for b in bloques])])
+    return np.concatenate(bloques), inicios
+
+
+def codificar_en_disco(preprocesador: ColumnTransformer, X: pd.DataFrame, filas: np.ndarray,
+                       path: str, bloque: int = FILAS_BLOQUE_CODIFICACION,
+                       max_mb: Optional[float] = None) -> Tuple[int, int]:
+    """
+    Escribe preprocesador.transform(X.iloc[filas]) como un .npy float32 denso,
+    por bloques de filas (nunca se materializa la matriz completa en memoria).
+    Las filas repetidas en `filas` se codifican de nuevo. Retorna la forma.
+
+    Antes de crear el archivo calcula su tamaño (filas x columnas codificadas
+    x 4 bytes) y lanza ValueError si supera max_mb o el espacio libre: un
+    detalle_fail con miles de categorías distintas da miles de columnas.
+    """
+    import shutil
+
+    n_cols = preprocesador.transform(X.iloc[:1]).shape[1]
+    mb = len(filas) * n_cols * np.dtype(np.float32).itemsize / 2**20
+    libre_mb = shutil.disk_usage(os.path.dirname(os.path.abspath(path))).free / 2**20
+    limite, motivo = min((max_mb if max_mb is not None else np.inf, "tope --cv-max-mb"),
+                         (libre_mb, "espacio libre"))
+    if mb > limite:
+        raise ValueError(
+            f"La matriz codificada de la CV compartida ocuparía {mb:,.1f} MB "
+            f"({len(filas)} filas x {n_cols} columnas float32), más que el {motivo} "
+            f"({limite:,.1f} MB). El ancho lo define el one-hot de las categóricas "
+            f"(sobre todo detalle_fail): agrupe los detalles poco frecuentes, suba "
+            f"--cv-max-mb o no use --cv-compartida."
+        )
+    destino = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(filas), n_cols))
+    for ini in range(0, len(filas), bloque):
+        parte = preprocesador.transform(X.iloc[filas[ini:ini + bloque]])
+        if hasattr(parte, "toarray"):
+            parte = parte.toarray()
+        destino[ini:ini + len(parte)] = parte
+    destino.flush()
+    del destino
+    return len(filas), n_cols
+
+
+def _ajustar_fold(nombre: str, clf, path_X: str, path_y: str, fold: int,
+                  train: Tuple[int, int], test: Tuple[int, int]) -> Dict:
+    """Ajusta un fold sobre vistas del .npy mapeado; se ejecuta en un proceso del pool."""
+    from sklearn.base import clone
+
+    X = np.load(path_X, mmap_mode="r")
+    y = np.load(path_y, mmap_mode="r")
+
+    clf = clone(clf)
+    # paralelismo entre folds, no dentro de cada modelo
+    if "n_jobs" in clf.get_params():
+        clf.set_params(n_jobs=1)
+
+    t0 = time.perf_counter()
+    clf.fit(X[train[0]:train[1]], y[train[0]:train[1]])
+    segundos = time.perf_counter() - t0
+
+    y_test = np.asarray(y[test[0]:test[1]])
+    proba = clf.predict_proba(X[test[0]:test[1]])[:, 1]
+    y_pred = (proba >= 0.5).astype(int)
+    return {
+        "modelo": nombre,
+        "fold": fold,
+        "n_train": train[1] - train[0],
+        "n_test": test[1] - test[0],
+        "auc_roc": roc_auc_score(y_test, proba),
+        "f1": f1_score(y_test, y_pred, zero_division=0),
+        "precision": precision_score(y_test, y_pred, zero_division=0),
+        "recall": recall_score(y_test, y_pred, zero_division=0),
+        "segundos_fit": segundos,
+    }
+
+
+def validacion_cruzada_compartida(modelos: Dict[str, Pipeline], num_cols, cat_cols, X_train, y_train,
+                                  cv_folds: int = 5, jobs: int = 1, familias=FAMILIAS_CV,
+                                  dir_cache: str = DIR_CACHE_CV, max_mb: Optional[float] = MAX_MB_MATRIZ_CV) -> pd.DataFrame:
+    """
+    Validación cruzada estratificada de los clasificadores de `familias` sin
+    copiar X_train a cada proceso.
+
+    El preprocesador (mismo ColumnTransformer de los Pipelines) se ajusta una
+    vez sobre X_train y la matriz codificada se escribe una vez en un .npy
+    float32 en dir_cache, con las filas en el orden de _layout_folds. Cada
+    tarea del pool (familia x fold) mapea ese archivo y ajusta solo el paso
+    "clf" sobre X[a:b], una vista contigua: las páginas las comparte el page
+    cache entre todos los procesos, así que la memoria no crece con `jobs`
+    (salvo lo que cada modelo asigne al entrenar). Con dir_cache en /dev/shm
+    la matriz queda en memoria compartida sin tocar disco.
+
+    El preprocesador ve todo X_train (escalas y categorías), no solo el
+    train de cada fold; para árboles no cambia las particiones posibles.
+
+    La matriz es densa y tiene (2K-1)/K veces las filas de X_train, con una
+    columna por categoría del one-hot: si detalle_fail tiene miles de valores
+    distintos puede ser mucho más grande que X_train. Si superaría max_mb (o
+    el espacio libre) se lanza ValueError antes de escribirla.
+
+    Retorna una fila por (modelo, fold) con AUC, F1, precision y recall
+    (umbral 0.5) y el tiempo de ajuste.
+    """
+    import shutil
+    import tempfile
+
+    familias = [f for f in familias if f in modelos]
+    if not familias:
+        return pd.DataFrame()
+
+    filas, inicios = _layout_folds(y_train, cv_folds)
+    os.makedirs(dir_cache, exist_ok=True)
+    dir_tmp = tempfile.mkdtemp(prefix="cv_", dir=dir_cache)
+    try:
+        path_X = os.path.join(dir_tmp, "X.npy")
+        path_y = os.path.join(dir_tmp, "y.npy")
+        preprocesador = construir_preprocesador(num_cols, cat_cols).fit(X_train)
+        codificar_en_disco(preprocesador, X_train, filas, path_X, max_mb=max_mb)
+        np.save(path_y, np.asarray(y_train)[filas].astype(np.int8))
+
+        tareas = [
+            (nombre, fold, (int(inicios[fold + 1]), int(inicios[fold + cv_folds])),
+             (int(inicios[fold]), int(inicios[fold + 1])))
+            for nombre in familias for fold in range(cv_folds)
+        ]
+        resultados = joblib.Parallel(n_jobs=max(1, jobs), backend="loky")(
+            joblib.delayed(_ajustar_fold)(
+                nombre, modelos[nombre].named_steps["clf"], path_X, path_y, fold, train, test,
+            )
+            for nombre, fold, train, test in tareas
+        )
+    finally:
+        shutil.rmtree(dir_tmp, ignore_errors=True)
+    return pd.DataFrame(resultados)
+
+
+def evaluar_modelo(nombre: str, modelo, X_test, y_test, threshold: float = 0.5,
+                   proba: np.ndarray = None) -> Dict[str, float]:
+    if proba is None:
+        proba = modelo.predict_proba(X_test)[:, 1]
     y_pred = (proba >= threshold).astype(int)
 
     acc = accuracy_score(y_test, y_pred)
@@ -228,108 +1270,792 @@ def evaluar_modelo(nombre: str, modelo, X_test, y_test, threshold: float = 0.5)
     }
 
 
-def main():
-    print("=== 1) Carga y limpieza ===")
-    df = cargar_y_limpiar(EXCEL_PATH)
-    print(f"Registros tras limpieza: {len(df)}")
+N_UMBRALES = 1000
+OBJETIVOS_UMBRAL = ("f1", "accuracy", "youden", "uplift")
+
+
+def barrido_umbrales(y_true, proba: np.ndarray, n_umbrales: int = N_UMBRALES) -> pd.DataFrame:
+    """
+    Métricas para n_umbrales + 1 umbrales equiespaciados en [0, 1] a partir de
+    un único vector de probabilidades: se ordena una vez (descendente) y con
+    la suma acumulada de positivos se obtienen TP/FP para todos los umbrales;
+    searchsorted da cuántas predicciones quedan >= cada umbral.
+
+    uplift = tasa de éxito entre los reintentados (precision) - tasa base.
+    """
+    y = np.asarray(y_true).astype(np.int64)
+    p = np.asarray(proba, dtype=np.float64)
+    n = len(y)
+
+    orden = np.argsort(-p, kind="mergesort")
+    p_desc = p[orden]
+    tp_acum = np.concatenate([[0], np.cumsum(y[orden])])
+    positivos = int(tp_acum[-1])
+
+    umbrales = np.linspace(0.0, 1.0, n_umbrales + 1)
+    # k = número de probabilidades >= umbral (p_desc negado queda ascendente)
+    k = np.searchsorted(-p_desc, -umbrales, side="right")
+    tp = tp_acum[k]
+    fp = k - tp
+    fn = positivos - tp
+    tn = n - positivos - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(k > 0, tp / np.maximum(k, 1), 0.0)
+        recall = tp / positivos if positivos else np.zeros_like(umbrales)
+        f1 = np.where(k + positivos > 0, 2 * tp / np.maximum(k + positivos, 1), 0.0)
+        fpr = fp / (n - positivos) if n > positivos else np.zeros_like(umbrales)
+
+    tasa_base = positivos / n if n else 0.0
+    return pd.DataFrame({
+        "threshold": umbrales,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "accuracy": (tp + tn) / n if n else np.zeros_like(umbrales),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "youden": recall - fpr,
+        "frac_reintentos": k / n if n else np.zeros_like(umbrales),
+        "uplift": np.where(k > 0, precision - tasa_base, 0.0),
+    })
+
+
+def elegir_umbral(barrido: pd.DataFrame, objetivo: str = "f1", cobertura_minima: float = 0.0) -> pd.Series:
+    """
+    Fila del barrido que maximiza el objetivo entre los umbrales que reintentan
+    al menos cobertura_minima de los casos (con uplift conviene exigir una
+    cobertura, si no gana un umbral que reintenta un puñado de casos).
+    En empate se queda el umbral más bajo.
+    """
+    if objetivo not in OBJETIVOS_UMBRAL:
+        raise ValueError(f"Objetivo desconocido: {objetivo} (use {OBJETIVOS_UMBRAL})")
+    candidatos = barrido[barrido["frac_reintentos"] >= cobertura_minima]
+    if candidatos.empty:
+        candidatos = barrido
+    return candidatos.loc[candidatos[objetivo].idxmax()]
+
+
+# ------------------------------
+# Uplift de negocio
+# ------------------------------
+
+TOP_FRAC_UPLIFT = 0.7
+N_PUNTOS_UPLIFT = 100
+N_BOOTSTRAP = 1000
+BINS_BOOTSTRAP = 1000
+LOTE_BOOTSTRAP = 256
+COLUMNAS_SEGMENTO = ("error_categoria", "retry_hora_bucket")
+
+
+def _bootstrap_tasas(y_desc: np.ndarray, k: np.ndarray, n_bootstrap: int,
+                     seed: int, bins: int = BINS_BOOTSTRAP,
+                     lote: int = LOTE_BOOTSTRAP) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Remuestreo bootstrap de la tasa de éxito del top-k (para cada k) y de la
+    tasa base, sin materializar los remuestreos fila a fila.
+
+    y_desc son las etiquetas ordenadas por probabilidad descendente, que se
+    agrupan en `bins` tramos contiguos. Un remuestreo con reposición de n
+    filas equivale a repartir n extracciones entre los tramos (multinomial
+    con prob. tamaño/n) y, dentro de cada tramo, contar los éxitos de sus
+    extracciones (binomial con la tasa del tramo). El top-k del remuestreo
+    son sus primeras k extracciones en ese orden; del tramo donde se alcanza
+    k se toma la parte proporcional. El costo es O(n_bootstrap * bins) y los
+    remuestreos se sortean en lotes de `lote`.
+
+    Retorna (tasas_top [n_bootstrap, len(k)], tasas_base [n_bootstrap]).
+    """
+    n = len(y_desc)
+    bordes = np.unique(np.linspace(0, n, min(n, bins) + 1).astype(np.int64))
+    tamanios = np.diff(bordes)
+    tasa_tramo = np.add.reduceat(y_desc, bordes[:-1]) / tamanios
+    n_tramos = len(tamanios)
+
+    k = np.maximum(np.asarray(k, dtype=np.int64), 1)
+    rng = np.random.default_rng(seed)
+    tasas = np.empty((n_bootstrap, len(k)))
+    bases = np.empty(n_bootstrap)
+
+    for ini in range(0, n_bootstrap, lote):
+        b = min(lote, n_bootstrap - ini)
+        extracciones = rng.multinomial(n, tamanios / n, size=b)
+        exitos = rng.binomial(extracciones, tasa_tramo)
+        extr_acum = np.cumsum(extracciones, axis=1)
+        exitos_acum = np.cumsum(exitos, axis=1)
+
+        # primer tramo con extr_acum >= k, para todas las filas en un solo
+        # searchsorted: cada fila se desplaza n + 1 para que el vector plano
+        # siga siendo creciente
+        desplazamiento = (np.arange(b, dtype=np.int64) * (n + 1))[:, None]
+        plano = (extr_acum + desplazamiento).ravel()
+        tramo = np.searchsorted(plano, (k[None, :] + desplazamiento).ravel()).reshape(b, len(k))
+        tramo -= (np.arange(b) * n_tramos)[:, None]
+
+        filas = np.arange(b)[:, None]
+        previo = np.maximum(tramo - 1, 0)
+        hay_previo = tramo > 0
+        extr_previas = np.where(hay_previo, extr_acum[filas, previo], 0)
+        exitos_previos = np.where(hay_previo, exitos_acum[filas, previo], 0)
+        parte = (k[None, :] - extr_previas) / extracciones[filas, tramo]
+        exitos_top = exitos_previos + parte * exitos[filas, tramo]
+
+        tasas[ini:ini + b] = exitos_top / k[None, :]
+        bases[ini:ini + b] = exitos_acum[:, -1] / n
+    return tasas, bases
+
+
+def curva_uplift(y_true, proba: np.ndarray, fracciones: np.ndarray = None,
+                 n_bootstrap: int = N_BOOTSTRAP, alpha: float = 0.05,
+                 seed: int = 42) -> pd.DataFrame:
+    """
+    Curva de ganancia de la política "reintentar solo el top_frac más
+    probable" para cada fracción (por defecto 1%, 2%, ..., 100%), a partir de
+    un único argsort: tasa de éxito de los reintentados, éxitos capturados y
+    perdidos, reintentos ahorrados y uplift sobre reintentar todo.
+
+    Con n_bootstrap > 0 agrega intervalos de confianza percentil (1 - alpha)
+    para la tasa del modelo y el uplift (ver _bootstrap_tasas).
+    """
+    y = np.asarray(y_true).astype(np.int64)
+    p = np.asarray(proba, dtype=np.float64)
+    n = len(y)
+    if fracciones is None:
+        fracciones = np.arange(1, N_PUNTOS_UPLIFT + 1) / N_PUNTOS_UPLIFT
+    fracciones = np.asarray(fracciones, dtype=np.float64)
+
+    y_desc = y[np.argsort(-p, kind="mergesort")]
+    exitos_acum = np.concatenate([[0], np.cumsum(y_desc)])
+    total_exitos = int(exitos_acum[-1])
+    tasa_base = total_exitos / n if n else np.nan
+
+    # mismo redondeo que int(len * top_frac)
+    k = (n * fracciones).astype(np.int64)
+    exitos_top = exitos_acum[k]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasa_modelo = np.where(k > 0, exitos_top / np.maximum(k, 1), np.nan)
+
+    curva = pd.DataFrame({
+        "top_frac": fracciones,
+        "reintentos": k,
+        "reintentos_ahorrados": n - k,
+        "tasa_base": tasa_base,
+        "tasa_modelo": tasa_modelo,
+        "uplift": tasa_modelo - tasa_base,
+        "exitos_capturados": exitos_top / total_exitos if total_exitos else np.nan,
+        "exitos_perdidos": total_exitos - exitos_top,
+    })
+
+    if n_bootstrap > 0 and n > 0:
+        tasas, bases = _bootstrap_tasas(y_desc, k, n_bootstrap, seed)
+        q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        ic_tasa = np.percentile(tasas, q, axis=0)
+        ic_uplift = np.percentile(tasas - bases[:, None], q, axis=0)
+        sin_casos = k == 0
+        for nombre, ic in (("tasa_modelo", ic_tasa), ("uplift", ic_uplift)):
+            curva[f"{nombre}_ic_inf"] = np.where(sin_casos, np.nan, ic[0])
+            curva[f"{nombre}_ic_sup"] = np.where(sin_casos, np.nan, ic[1])
+    return curva
+
+
+def uplift_por_segmento(y_true, proba: np.ndarray, segmentos: pd.DataFrame,
+                        top_frac: float = TOP_FRAC_UPLIFT) -> pd.DataFrame:
+    """
+    Desglose de la política global (reintentar el top_frac más probable de
+    todos los casos) por cada valor de cada columna de `segmentos`: casos,
+    fracción reintentada, tasa base y con modelo, uplift y éxitos perdidos.
+    Los conteos salen de bincount sobre los códigos de cada columna.
+    """
+    y = np.asarray(y_true).astype(np.int64)
+    p = np.asarray(proba, dtype=np.float64)
+    n = len(y)
+    k = int(n * top_frac)
+    reintentado = np.zeros(n, dtype=bool)
+    reintentado[np.argsort(-p, kind="mergesort")[:k]] = True
+
+    tablas = []
+    for col in segmentos.columns:
+        codigos, valores = pd.factorize(segmentos[col], sort=True)
+        g = len(valores)
+        casos = np.bincount(codigos, minlength=g)
+        exitos = np.bincount(codigos, weights=y, minlength=g)
+        n_rein = np.bincount(codigos[reintentado], minlength=g)
+        exitos_rein = np.bincount(codigos[reintentado], weights=y[reintentado], minlength=g)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tasa_base = exitos / casos
+            tasa_modelo = np.where(n_rein > 0, exitos_rein / np.maximum(n_rein, 1), np.nan)
+        tablas.append(pd.DataFrame({
+            "segmento": col,
+            "valor": np.asarray(valores, dtype=object),
+            "casos": casos,
+            "reintentos": n_rein,
+            "frac_reintentada": n_rein / casos,
+            "tasa_base": tasa_base,
+            "tasa_modelo": tasa_modelo,
+            "uplift": tasa_modelo - tasa_base,
+            "exitos_perdidos": (exitos - exitos_rein).astype(np.int64),
+        }))
+    return pd.concat(tablas, ignore_index=True)
+
+
+DIR_LAMBDA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws", "lambda")
+
+
+def exportar_modelo_portable(modelo: Pipeline, path: str, X_check=None) -> Dict:
+    """
+    Exporta el Pipeline al formato portable (.npz) que la Lambda evalúa solo
+    con NumPy (ver aws/lambda/portable_model.py). Falla si sus probabilidades
+    no coinciden con las del Pipeline sobre X_check (una muestra de
+    PARITY_CHECK_ROWS filas si es más grande).
+    """
+    if DIR_LAMBDA not in sys.path:
+        sys.path.insert(0, DIR_LAMBDA)
+    from portable_model import export_pipeline
+
+    return export_pipeline(modelo, path, X_check)
+
+
+# ------------------------------
+# Registro de modelos (A/B en la Lambda)
+# ------------------------------
+
+DIR_REGISTRO = "models/registro"
+ARCHIVO_REGISTRO = "registro.json"
+# Versiones que conserva el registro además de las que tienen ruta de tráfico
+VERSIONES_REGISTRO = 5
+
+
+def leer_registro(path: str) -> Dict:
+    """registro.json existente o uno vacío (ver aws/lambda/model_registry.py)."""
+    import json
+
+    if DIR_LAMBDA not in sys.path:
+        sys.path.insert(0, DIR_LAMBDA)
+    from model_registry import REGISTRY_FORMAT
+
+    if not os.path.exists(path):
+        return {"formato": REGISTRY_FORMAT, "rutas": {}, "versiones": []}
+    with open(path, encoding="utf-8") as f:
+        registro = json.load(f)
+    if registro.get("formato") != REGISTRY_FORMAT:
+        raise ValueError(f"{path}: formato de registro {registro.get('formato')} no soportado")
+    return registro
+
+
+def registrar_modelo(modelo: Pipeline, nombre: str, metricas: pd.Series, objetivo_umbral: str,
+                     dir_registro: str = DIR_REGISTRO, ruta_pct: Optional[float] = None,
+                     conservar: int = VERSIONES_REGISTRO, datos: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """
+    Guarda el modelo elegido de la corrida en dir_registro/<corrida>/<modelo>.pkl
+    (con su umbral óptimo, como mejor_modelo.pkl) y lo agrega como versión
+    "<corrida>-<modelo>" a dir_registro/registro.json, con sus métricas de test
+    (su fila de metrics_resultados.csv) y el SHA-256 del archivo. La corrida es
+    la fecha y hora de ejecución.
+
+    Rutas de tráfico: en un registro nuevo, 100% a esta versión. Con ruta_pct
+    recibe ese porcentaje y las rutas existentes se escalan al resto; si no,
+    las rutas no cambian y la versión solo se usa pidiéndola con "model_version".
+
+    Retención: se conservan las `conservar` versiones más recientes y las que
+    tienen ruta; las demás salen del registro y se borran sus archivos.
+
+    Retorna el registro actualizado y las versiones eliminadas.
+    """
+    import json
+
+    if conservar < 1:
+        raise ValueError("Se debe conservar al menos una versión del registro")
+    path = os.path.join(dir_registro, ARCHIVO_REGISTRO)
+    registro = leer_registro(path)
+
+    corrida = time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(os.path.join(dir_registro, corrida), exist_ok=True)
+    archivo = f"{corrida}/{nombre}.pkl"
+    path_modelo = os.path.join(dir_registro, archivo)
+    joblib.dump(modelo, path_modelo, compress=0)
+
+    version = f"{corrida}-{nombre}"
+    registro["versiones"].append({
+        "version": version,
+        "modelo": nombre,
+        "archivo": archivo,
+        "sha256": _hash_archivo(path_modelo),  # la Lambda lo verifica al descargar
+        "umbral": float(metricas["threshold"]),
+        "objetivo_umbral": objetivo_umbral,
+        "metricas": {
+            k: (None if pd.isna(v) else float(v))
+            for k, v in metricas.items() if k != "threshold"
+        },
+        "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "datos": datos,
+    })
+
+    rutas = registro.get("rutas") or {}
+    if not rutas:
+        rutas = {version: 100.0}
+    elif ruta_pct is not None:
+        if not 0 < ruta_pct <= 100:
+            raise ValueError("El porcentaje de tráfico debe estar en (0, 100]")
+        total = sum(rutas.values())
+        rutas = {v: round(p / total * (100 - ruta_pct), 4) for v, p in rutas.items()}
+        rutas = {v: p for v, p in rutas.items() if p > 0}
+        rutas[version] = float(ruta_pct)
+    registro["rutas"] = rutas
+
+    # Retención: las versiones se agregan en orden, las últimas son las más recientes
+    recientes = {v["version"] for v in registro["versiones"][-conservar:]}
+    eliminadas = [v for v in registro["versiones"] if v["version"] not in recientes and v["version"] not in rutas]
+    registro["versiones"] = [v for v in registro["versiones"] if v not in eliminadas]
+
+    # Escritura atómica: la Lambda o el servidor pueden estar leyéndolo
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registro, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+    # Los archivos se borran recién con el registro ya escrito sin esas versiones
+    for entrada in eliminadas:
+        path_viejo = os.path.join(dir_registro, entrada["archivo"])
+        if os.path.exists(path_viejo):
+            os.remove(path_viejo)
+        carpeta = os.path.dirname(path_viejo)
+        if os.path.isdir(carpeta) and not os.listdir(carpeta):
+            os.rmdir(carpeta)
+    return registro, [v["version"] for v in eliminadas]
 
-    print("\n=== 2) Construcción de pares (fallo + segundo intento) ===")
-    df_pares = construir_pares(df)
+
+# ==============================
+# 4) Perfilado por etapa (--profile)
+# ==============================
+
+DIR_MODELOS = "models"
+TOP_CPROFILE = 30
+
+
+def _memoria_proceso_mb() -> Tuple[Optional[float], Optional[float]]:
+    """(RSS actual, pico de RSS) del proceso en MB; (None, None) sin /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            campos = dict(linea.split(":", 1) for linea in f if ":" in linea)
+        return int(campos["VmRSS"].split()[0]) / 1024, int(campos["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _reiniciar_pico_rss() -> bool:
+    """Reinicia el pico de RSS (VmHWM) del proceso; solo Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _cpu_hijos_s() -> float:
+    """CPU de los procesos hijos ya terminados (pools de la búsqueda)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return uso.ru_utime + uso.ru_stime
+
+
+class PerfilEtapas:
+    """
+    Tiempo de pared, CPU y memoria de cada etapa de main(). Inactivo (sin
+    --profile), etapa() no mide nada.
+
+    - CPU: time.process_time() (todos los hilos del proceso) más la de los
+      procesos hijos que terminaron durante la etapa.
+    - Memoria: RSS al terminar y pico de RSS de la etapa (se reinicia VmHWM
+      al empezar cada una; si no se puede, es el pico acumulado). Con
+      tracemalloc=True también el pico de memoria asignada por Python y
+      NumPy según tracemalloc (más lento).
+    - Con cprofile=True cada etapa corre bajo cProfile y al guardar se
+      conserva solo el perfil de la más lenta (los tiempos incluyen el
+      costo del profiler).
+    """
+
+    def __init__(self, activo: bool = False, tracemalloc: bool = False, cprofile: bool = False):
+        self.activo = activo
+        self.tracemalloc = activo and tracemalloc
+        self.cprofile = activo and cprofile
+        self.etapas: List[Dict] = []
+        self._perfiles: Dict[str, object] = {}
+        self.pico_por_etapa = activo and _reiniciar_pico_rss()
+        self._inicio = time.perf_counter()
+        if self.tracemalloc:
+            import tracemalloc as tm
+            tm.start()
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        if not self.activo:
+            yield
+            return
+
+        if self.pico_por_etapa:
+            _reiniciar_pico_rss()
+        if self.tracemalloc:
+            import tracemalloc as tm
+            tm.reset_peak()
+        perfil = None
+        if self.cprofile:
+            import cProfile
+            perfil = cProfile.Profile()
+
+        t0, cpu0, hijos0 = time.perf_counter(), time.process_time(), _cpu_hijos_s()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield
+        finally:
+            if perfil is not None:
+                perfil.disable()
+                self._perfiles[nombre] = perfil
+            pared = time.perf_counter() - t0
+            cpu = time.process_time() - cpu0
+            cpu_hijos = _cpu_hijos_s() - hijos0
+            rss, pico = _memoria_proceso_mb()
+            registro = {
+                "etapa": nombre,
+                "pared_s": round(pared, 3),
+                "cpu_s": round(cpu, 3),
+                "cpu_hijos_s": round(cpu_hijos, 3),
+                "rss_mb": None if rss is None else round(rss, 1),
+                "pico_rss_mb": None if pico is None else round(pico, 1),
+            }
+            if self.tracemalloc:
+                import tracemalloc as tm
+                registro["pico_tracemalloc_mb"] = round(tm.get_traced_memory()[1] / 2**20, 1)
+            self.etapas.append(registro)
+
+    def etapa_mas_lenta(self) -> Optional[str]:
+        if not self.etapas:
+            return None
+        return max(self.etapas, key=lambda e: e["pared_s"])["etapa"]
+
+    def guardar(self, dir_salida: str = DIR_MODELOS) -> Dict[str, str]:
+        """Escribe perfil_etapas.json y perfil_etapas.txt (y el .prof de la etapa más lenta)."""
+        import json
+
+        if not self.etapas:
+            return {}
+        os.makedirs(dir_salida, exist_ok=True)
+        rutas = {
+            "json": os.path.join(dir_salida, "perfil_etapas.json"),
+            "txt": os.path.join(dir_salida, "perfil_etapas.txt"),
+        }
+        lenta = self.etapa_mas_lenta()
+        reporte = {
+            "pared_total_s": round(time.perf_counter() - self._inicio, 3),
+            "pico_rss_por_etapa": self.pico_por_etapa,
+            "etapa_mas_lenta": lenta,
+            "etapas": self.etapas,
+        }
+
+        texto_cprofile = ""
+        perfil = self._perfiles.get(lenta)
+        if perfil is not None:
+            import io
+            import pstats
+
+            nombre = "".join(c if c.isalnum() else "_" for c in lenta)
+            rutas["cprofile"] = os.path.join(dir_salida, f"perfil_{nombre}.prof")
+            perfil.dump_stats(rutas["cprofile"])
+            reporte["cprofile"] = rutas["cprofile"]
+            buffer = io.StringIO()
+            pstats.Stats(perfil, stream=buffer).sort_stats("cumulative").print_stats(TOP_CPROFILE)
+            texto_cprofile = buffer.getvalue()
+
+        with open(rutas["json"], "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        with open(rutas["txt"], "w", encoding="utf-8") as f:
+            f.write(self.resumen())
+            if texto_cprofile:
+                f.write(f"\ncProfile de la etapa más lenta ({lenta}), top {TOP_CPROFILE} por tiempo acumulado:\n")
+                f.write(texto_cprofile)
+        return rutas
+
+    def resumen(self) -> str:
+        """Tabla legible de las etapas."""
+        con_tracemalloc = self.tracemalloc
+        cabecera = f"{'etapa':<34} {'pared s':>9} {'CPU s':>9} {'CPU hijos':>10} {'RSS MB':>9} {'pico MB':>9}"
+        if con_tracemalloc:
+            cabecera += f" {'tracemalloc MB':>15}"
+        lineas = [cabecera, "-" * len(cabecera)]
+
+        def mb(valor) -> str:
+            return "-" if valor is None else f"{valor:.1f}"
+
+        for e in self.etapas:
+            linea = (f"{e['etapa']:<34} {e['pared_s']:>9.2f} {e['cpu_s']:>9.2f} {e['cpu_hijos_s']:>10.2f} "
+                     f"{mb(e['rss_mb']):>9} {mb(e['pico_rss_mb']):>9}")
+            if con_tracemalloc:
+                linea += f" {mb(e.get('pico_tracemalloc_mb')):>15}"
+            lineas.append(linea)
+        total = sum(e["pared_s"] for e in self.etapas)
+        lineas.append("-" * len(cabecera))
+        lineas.append(f"{'total etapas':<34} {total:>9.2f} {sum(e['cpu_s'] for e in self.etapas):>9.2f}")
+        if not self.pico_por_etapa:
+            lineas.append("(pico de RSS acumulado: no se pudo reiniciar VmHWM por etapa)")
+        return "\n".join(lineas) + "\n"
+
+
+def _fraccion_top(valor: str) -> float:
+    """Tipo de --uplift-top: una fracción en (0, 1]."""
+    import argparse
+
+    try:
+        frac = float(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{valor!r} no es un número")
+    if not 0 < frac <= 1:
+        raise argparse.ArgumentTypeError(f"{valor} fuera de (0, 1]: es la fracción de casos que se reintenta")
+    return frac
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluación de algoritmos de reintentos de pago")
+    parser.add_argument(
+        "--datos", default=EXCEL_PATH,
+        help=f"log de intentos en .xlsx, .csv o .parquet (por defecto {EXCEL_PATH})",
+    )
+    parser.add_argument(
+        "--convertir-parquet", action="store_true",
+        help="convierte el Excel de --datos a una caché Parquet junto a él y termina",
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="construye los pares leyendo --datos por bloques (log ordenado por fecha)",
+    )
+    parser.add_argument(
+        "--chunk-filas", type=int, default=CHUNK_FILAS,
+        help=f"filas por bloque en modo streaming (por defecto {CHUNK_FILAS})",
+    )
+    parser.add_argument(
+        "--dir-pares", default=DIR_PARES_STREAMING,
+        help=f"dataset Parquet de pares del modo streaming (por defecto {DIR_PARES_STREAMING})",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="mantiene un almacén de pares y procesa solo los intentos nuevos de --datos",
+    )
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help="reconstruye desde cero el almacén de pares del modo incremental",
+    )
+    parser.add_argument(
+        "--dir-almacen", default=DIR_ALMACEN_PARES,
+        help=f"almacén de pares del modo incremental (por defecto {DIR_ALMACEN_PARES})",
+    )
+    parser.add_argument(
+        "--jobs-limpieza", type=int, default=1,
+        help="procesos para la limpieza del log, repartido por suscripción (por defecto 1)",
+    )
+    parser.add_argument(
+        "--busqueda", choices=["ninguna", "grid", "halving"], default="ninguna",
+        help="búsqueda de hiperparámetros con CV estratificada antes de evaluar (por defecto ninguna)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="procesos para la búsqueda de hiperparámetros y --cv-compartida (por defecto 1)",
+    )
+    parser.add_argument(
+        "--cv-compartida", action="store_true",
+        help="validación cruzada de random_forest y xgboost sobre una matriz codificada compartida (usa --cv-folds y --jobs)",
+    )
+    parser.add_argument(
+        "--cv-max-mb", type=float, default=MAX_MB_MATRIZ_CV,
+        help=f"con --cv-compartida, tamaño máximo (MB) de la matriz densa en disco: (2K-1)/K x filas de train x "
+             f"columnas codificadas x 4 bytes (por defecto {MAX_MB_MATRIZ_CV})",
+    )
+    parser.add_argument(
+        "--cv-folds", type=int, default=5,
+        help="folds de la validación cruzada estratificada (por defecto 5)",
+    )
+    parser.add_argument(
+        "--objetivo-umbral", choices=OBJETIVOS_UMBRAL, default="f1",
+        help="métrica que maximiza el umbral de decisión de cada modelo (por defecto f1)",
+    )
+    parser.add_argument(
+        "--cobertura-minima", type=float, default=0.0,
+        help="fracción mínima de casos reintentados que debe cubrir el umbral (por defecto 0)",
+    )
+    parser.add_argument(
+        "--uplift-top", type=_fraccion_top, default=TOP_FRAC_UPLIFT,
+        help=f"fracción más probable, en (0, 1], que se reintenta en el resumen de uplift (por defecto {TOP_FRAC_UPLIFT})",
+    )
+    parser.add_argument(
+        "--uplift-bootstrap", type=int, default=N_BOOTSTRAP,
+        help=f"remuestreos bootstrap para los intervalos del uplift; 0 los omite (por defecto {N_BOOTSTRAP})",
+    )
+    parser.add_argument(
+        "--registrar", action="store_true",
+        help="agrega el mejor modelo de esta corrida al registro de modelos que sirve la Lambda",
+    )
+    parser.add_argument(
+        "--registro", default=DIR_REGISTRO,
+        help=f"con --registrar, carpeta del registro (por defecto {DIR_REGISTRO})",
+    )
+    parser.add_argument(
+        "--registro-ruta", type=float, default=None, metavar="PCT",
+        help="con --registrar, porcentaje de tráfico para la versión nueva; el resto se reparte entre las rutas actuales",
+    )
+    parser.add_argument(
+        "--registro-conservar", type=int, default=VERSIONES_REGISTRO, metavar="N",
+        help=f"con --registrar, versiones recientes que se conservan además de las que tienen ruta "
+             f"(por defecto {VERSIONES_REGISTRO}); las demás se borran",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="mide tiempo, CPU y memoria de cada etapa y los guarda en models/perfil_etapas.{json,txt}",
+    )
+    parser.add_argument(
+        "--profile-tracemalloc", action="store_true",
+        help="con --profile, agrega el pico de memoria por etapa según tracemalloc (más lento)",
+    )
+    parser.add_argument(
+        "--profile-cprofile", action="store_true",
+        help="con --profile, guarda el cProfile de la etapa más lenta en models/perfil_<etapa>.prof",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.convertir_parquet:
+        convertir_a_parquet(args.datos)
+        return
+
+    perfil = PerfilEtapas(args.profile, tracemalloc=args.profile_tracemalloc, cprofile=args.profile_cprofile)
+
+    if args.streaming:
+        print("=== 1-2) Carga y construcción de pares por bloques (streaming) ===")
+        with perfil.etapa("carga_y_pares"):
+            stats = construir_pares_streaming(args.datos, args.dir_pares, args.chunk_filas)
+            df_pares = leer_dataset_pares(args.dir_pares)
+        print(f"Filas leídas: {stats['filas_leidas']} en {stats['bloques']} bloques")
+    elif args.incremental or args.full_rebuild:
+        print("=== 1-2) Carga y pares incrementales (almacén de pares) ===")
+        with perfil.etapa("carga_y_pares"):
+            stats = actualizar_almacen_pares(args.datos, args.dir_almacen, reconstruir=args.full_rebuild)
+            df_pares = leer_dataset_pares(os.path.join(args.dir_almacen, "pares"))
+        print(f"Registros: {stats['filas']} ({stats['filas_nuevas']} nuevos) -> "
+              f"{stats['pares_nuevos']} pares nuevos en {args.dir_almacen}")
+    else:
+        print("=== 1) Carga y limpieza ===")
+        with perfil.etapa("carga"):
+            df = cargar_y_limpiar(args.datos, jobs=args.jobs_limpieza)
+        print(f"Registros tras limpieza: {len(df)}")
+
+        print("\n=== 2) Construcción de pares (fallo + segundo intento) ===")
+        with perfil.etapa("pares"):
+            df_pares = construir_pares(df)
+            del df
     print(f"Casos (pares) construidos: {len(df_pares)}")
     print("Distribución global de la etiqueta:")
     print(df_pares["target_exito_second"].value_counts(normalize=True))
 
     print("\n=== 3) Features y split estratificado ===")
-    X, y, num_cols, cat_cols = preparar_features(df_pares)
+    with perfil.etapa("features"):
+        X, y, num_cols, cat_cols = preparar_features(df_pares)
+        del df_pares
     print("Distribución etiqueta después de limpiar NaN:")
     print(y.value_counts(normalize=True))
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.2,
-        stratify=y,
-        random_state=42
-    )
+    with perfil.etapa("split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X,
+            y,
+            test_size=0.2,
+            stratify=y,
+            random_state=42
+        )
 
     print(f"Tamaño train: {len(X_train)}, test: {len(X_test)}")
 
-    pre = construir_preprocesador(num_cols, cat_cols)
-
     # -------- Modelos --------
-    modelos = {}
-
-    # 1) Regresión Logística
-    pipe_log = Pipeline(
-        steps=[
-            ("preprocess", pre),
-            ("clf", LogisticRegression(max_iter=1000, class_weight="balanced", solver="liblinear"))
-        ]
-    )
-    modelos["logistic_regression"] = pipe_log
-
-    # 2) Random Forest
-    pipe_rf = Pipeline(
-        steps=[
-            ("preprocess", pre),
-            ("clf", RandomForestClassifier(
-                n_estimators=200,
-                max_depth=None,
-                min_samples_leaf=1,
-                class_weight="balanced",
-                random_state=42,
-                n_jobs=-1
-            ))
-        ]
-    )
-    modelos["random_forest"] = pipe_rf
-
-    # 3) XGBoost (opcional)
-    if HAS_XGB:
-        pipe_xgb = Pipeline(
-            steps=[
-                ("preprocess", pre),
-                ("clf", XGBClassifier(
-                    objective="binary:logistic",
-                    eval_metric="logloss",
-                    n_estimators=200,
-                    max_depth=5,
-                    learning_rate=0.1,
-                    subsample=0.9,
-                    colsample_bytree=0.9,
-                    random_state=42,
-                    n_jobs=-1
-                ))
-            ]
-        )
-        modelos["xgboost"] = pipe_xgb
+    modelos = construir_modelos(num_cols, cat_cols)
+
+    if args.cv_compartida:
+        print(f"\n=== 3a) Validación cruzada con matriz compartida ({args.cv_folds} folds, jobs={args.jobs}) ===")
+        with perfil.etapa("validacion_cruzada"):
+            df_cv = validacion_cruzada_compartida(
+                modelos, num_cols, cat_cols, X_train, y_train, cv_folds=args.cv_folds, jobs=args.jobs,
+                max_mb=args.cv_max_mb,
+            )
+        if df_cv.empty:
+            print(f"Ninguna de {', '.join(FAMILIAS_CV)} está disponible.")
+        else:
+            for nombre, g in df_cv.groupby("modelo", sort=False):
+                print(f"{nombre}: AUC={g['auc_roc'].mean():.4f}±{g['auc_roc'].std():.4f} "
+                      f"F1={g['f1'].mean():.4f}±{g['f1'].std():.4f} (fit medio {g['segundos_fit'].mean():.1f}s)")
+            os.makedirs("models", exist_ok=True)
+            df_cv.to_csv("models/cv_resultados.csv", index=False)
+            print("Resultados por fold guardados en models/cv_resultados.csv")
+
+    ajustados = set()
+    if args.busqueda != "ninguna":
+        print(f"\n=== 3b) Búsqueda de hiperparámetros ({args.busqueda}, jobs={args.jobs}) ===")
+        with perfil.etapa("busqueda"):
+            busquedas = buscar_hiperparametros(
+                modelos, X_train, y_train,
+                estrategia=args.busqueda, jobs=args.jobs, cv_folds=args.cv_folds,
+            )
+        for nombre, res in busquedas.items():
+            modelos[nombre] = res["modelo"]
+            ajustados.add(nombre)
+            print(f"{nombre}: F1 CV={res['mejor_f1_cv']:.4f} en {res['segundos']:.1f}s -> {res['mejores_params']}")
+
+        os.makedirs("models", exist_ok=True)
+        pd.DataFrame([
+            {"modelo": n, "mejor_f1_cv": r["mejor_f1_cv"], "segundos": r["segundos"],
+             "candidatos": r["candidatos"], "mejores_params": r["mejores_params"]}
+            for n, r in busquedas.items()
+        ]).to_csv("models/busqueda_resultados.csv", index=False)
+        print("Resultados de búsqueda guardados en models/busqueda_resultados.csv")
 
     resultados = []
+    barridos = []
+    probas = {}
     mejor_modelo = None
     mejor_nombre = None
     mejor_f1 = -1
+    mejor_valor = -np.inf
+    mejor_umbral = None
 
     print("\n=== 4) Entrenamiento y evaluación ===")
     for nombre, modelo in modelos.items():
-        modelo.fit(X_train, y_train)
-
-        # probamos 3 thresholds para ver cuál da mejor F1
-        best_metrics = None
-        best_t = 0.5
-        for t in [0.3, 0.4, 0.5]:
-            metrics = evaluar_modelo(nombre, modelo, X_test, y_test, threshold=t)
-            if metrics["f1"] > (best_metrics["f1"] if best_metrics else -1):
-                best_metrics = metrics
-                best_t = t
-
+        if nombre not in ajustados:
+            with perfil.etapa(f"entrenar:{nombre}"):
+                modelo.fit(X_train, y_train)
+
+        with perfil.etapa(f"evaluar:{nombre}"):
+            # barrido fino de umbrales sobre una sola predicción del test
+            proba = modelo.predict_proba(X_test)[:, 1]
+            probas[nombre] = proba
+            barrido = barrido_umbrales(y_test, proba)
+            barridos.append(barrido.assign(modelo=nombre))
+            fila = elegir_umbral(barrido, args.objetivo_umbral, args.cobertura_minima)
+            best_t = round(float(fila["threshold"]), 6)
+
+            best_metrics = evaluar_modelo(nombre, modelo, X_test, y_test, threshold=best_t, proba=proba)
         best_metrics["modelo"] = nombre
         best_metrics["threshold"] = best_t
         resultados.append(best_metrics)
+        print(f"Umbral óptimo ({args.objetivo_umbral}): {best_t:.3f} -> {args.objetivo_umbral}={fila[args.objetivo_umbral]:.4f}")
 
-        if best_metrics["f1"] > mejor_f1:
+        if fila[args.objetivo_umbral] > mejor_valor:
+            mejor_valor = fila[args.objetivo_umbral]
             mejor_f1 = best_metrics["f1"]
             mejor_modelo = modelo
             mejor_nombre = nombre
+            mejor_umbral = best_t
 
     df_res = pd.DataFrame(resultados)
     # Crear carpeta models si no existe
@@ -339,33 +2065,79 @@ def main():
     print("\nMétricas guardadas en models/metrics_resultados.csv")
     print(df_res)
 
-    if mejor_modelo is not None:
-        joblib.dump(mejor_modelo, "models/mejor_modelo.pkl")
-        print(f"\nMejor modelo: {mejor_nombre} (F1={mejor_f1:.4f}) guardado en models/mejor_modelo.pkl")
+    pd.concat(barridos, ignore_index=True).to_csv("models/barrido_umbrales.csv", index=False)
+    print("Curvas de umbral guardadas en models/barrido_umbrales.csv")
 
-    # -------- 5) Uplift de negocio --------
-    print("\n=== 5) Uplift de negocio (baseline vs modelo) ===")
     if mejor_modelo is not None:
-        proba = mejor_modelo.predict_proba(X_test)[:, 1]
-        baseline_rate = y_test.mean()
-
-        df_eval = pd.DataFrame({"y": y_test, "proba": proba})
-        df_eval = df_eval.sort_values("proba", ascending=False).reset_index(drop=True)
+        # El umbral viaja con el modelo: la Lambda lo usa si THRESHOLD=auto
+        mejor_modelo.umbral_optimo_ = mejor_umbral
+        mejor_modelo.objetivo_umbral_ = args.objetivo_umbral
+
+        with perfil.etapa("guardar_modelo"):
+            # Sin compresión: la Lambda carga los arrays con joblib.load(mmap_mode="r")
+            joblib.dump(mejor_modelo, "models/mejor_modelo.pkl", compress=0)
+            print(
+                f"\nMejor modelo: {mejor_nombre} (F1={mejor_f1:.4f}, umbral={mejor_umbral:.3f}) "
+                "guardado en models/mejor_modelo.pkl"
+            )
 
-        # por ejemplo, reintentamos solo el 70% más probable
-        top_frac = 0.7
-        n_top = int(len(df_eval) * top_frac)
-        df_top = df_eval.iloc[:n_top]
+            # Sin paridad con el pickle (ValueError) la corrida falla: la Lambda
+            # serviría con el .npz probabilidades distintas a las evaluadas
+            info = exportar_modelo_portable(mejor_modelo, "models/mejor_modelo.npz", X_test)
+            print(
+                f"Modelo portable guardado en models/mejor_modelo.npz "
+                f"({info['n_bytes'] / 1024:.1f} KiB, diferencia máx. vs pickle {info['max_abs_diff']:.1e})"
+            )
 
-        ml_rate = df_top["y"].mean()
-        uplift = ml_rate - baseline_rate
+        if args.registrar:
+            with perfil.etapa("registro"):
+                registro, eliminadas = registrar_modelo(
+                    mejor_modelo, mejor_nombre, df_res.set_index("modelo").loc[mejor_nombre],
+                    args.objetivo_umbral, dir_registro=args.registro, ruta_pct=args.registro_ruta,
+                    conservar=args.registro_conservar, datos=args.datos,
+                )
+            rutas = ", ".join(f"{v}={p:g}%" for v, p in registro["rutas"].items())
+            print(f"Versión {registro['versiones'][-1]['version']} agregada a "
+                  f"{os.path.join(args.registro, ARCHIVO_REGISTRO)} (rutas: {rutas})")
+            if eliminadas:
+                print(f"Versiones eliminadas por retención: {', '.join(eliminadas)}")
 
-        print(f"Tasa baseline (reintentar todo): {baseline_rate:.4f}")
-        print(f"Tasa con modelo (top 70%):      {ml_rate:.4f}")
-        print(f"Uplift (puntos porcentuales):  {uplift*100:.2f}%")
+    # -------- 5) Uplift de negocio --------
+    print("\n=== 5) Uplift de negocio (baseline vs modelo) ===")
+    if mejor_modelo is not None:
+        top_frac = args.uplift_top
+        with perfil.etapa("uplift"):
+            proba = probas[mejor_nombre]
+            # curva completa (1%..100%) más el top_frac pedido
+            fracciones = np.union1d(np.arange(1, N_PUNTOS_UPLIFT + 1) / N_PUNTOS_UPLIFT, [top_frac])
+            curva = curva_uplift(y_test, proba, fracciones, n_bootstrap=args.uplift_bootstrap)
+            segmentos = uplift_por_segmento(y_test, proba, X_test[list(COLUMNAS_SEGMENTO)], top_frac)
+
+        fila = curva.set_index("top_frac").loc[top_frac]
+        print(f"Tasa baseline (reintentar todo): {fila['tasa_base']:.4f}")
+        print(f"Tasa con modelo (top {top_frac:.0%}):      {fila['tasa_modelo']:.4f}")
+        print(f"Uplift (puntos porcentuales):  {fila['uplift']*100:.2f}%")
+        if "uplift_ic_inf" in curva:
+            print(f"IC 95% del uplift ({args.uplift_bootstrap} remuestreos): "
+                  f"[{fila['uplift_ic_inf']*100:.2f}%, {fila['uplift_ic_sup']*100:.2f}%]")
+        print(f"Reintentos ahorrados: {int(fila['reintentos_ahorrados'])} "
+              f"(éxitos perdidos: {int(fila['exitos_perdidos'])})")
+
+        curva.to_csv("models/uplift_curva.csv", index=False)
+        segmentos.to_csv("models/uplift_segmentos.csv", index=False)
+        print("Curva de uplift guardada en models/uplift_curva.csv; "
+              "desglose por segmento en models/uplift_segmentos.csv")
     else:
         print("No hay modelo entrenado para calcular uplift.")
 
+    if perfil.activo:
+        print("\n=== Perfil por etapa (--profile) ===")
+        print(perfil.resumen(), end="")
+        rutas = perfil.guardar()
+        print(f"Perfil guardado en {rutas['json']} y {rutas['txt']}")
+        if "cprofile" in rutas:
+            print(f"cProfile de la etapa más lenta ({perfil.etapa_mas_lenta()}) en {rutas['cprofile']}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,304 @@
+"""
+Puntuación masiva (offline) de reintentos pendientes.
+
+Para backfills y análisis what-if: lee un CSV o Parquet de reintentos por
+bloques, deriva las mismas variables que construir_pares (delta_horas,
+retry_hour, retry_dayofweek, retry_is_weekend, error_categoria,
+retry_hora_bucket), puntúa cada bloque con una sola llamada vectorizada y
+escribe un Parquet con las columnas de entrada más probabilidad_exito y
+reintentar. Al final reporta filas/s.
+
+Columnas de entrada (sin distinguir mayúsculas; ver COLUMNAS_PENDIENTES):
+- fecha_fail:   fecha del intento fallido
+- fecha_second: fecha prevista del reintento (o fecha_reintento)
+- monto
+- http_fail:    HTTP status del intento fallido
+- detalle_fail: descripción del error (opcional, SIN_DETALLE si falta)
+Si el archivo ya trae las variables del modelo (las del evento de la Lambda)
+se usan tal cual. Las filas con fechas, monto o status inválidos se
+conservan con probabilidad vacía.
+
+El modelo puede ser el Pipeline (mejor_modelo.pkl) o su exportación portable
+(mejor_modelo.npz, ver aws/lambda/portable_model.py). Con --procesos N los
+bloques se puntúan en N procesos; el orden de salida es el de entrada.
+
+Uso:
+    python puntuar-reintentos.py pendientes.parquet
+    python puntuar-reintentos.py pendientes.csv --salida puntuados.parquet --procesos 4
+    python puntuar-reintentos.py pendientes.parquet --modelo models/mejor_modelo.npz --umbral 0.5
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+_spec = importlib.util.spec_from_file_location(
+    "evaluacion", os.path.join(RAIZ, "ejecutar-evaluacion-algoritmos.py")
+)
+evaluacion = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(evaluacion)
+
+MODELO_PATH = os.path.join("models", "mejor_modelo.pkl")
+CHUNK_FILAS = 200_000
+UMBRAL_POR_DEFECTO = 0.3  # mismo valor que DEFAULT_THRESHOLD en la Lambda
+
+NUM_COLS = ["monto", "delta_horas", "retry_hour", "retry_dayofweek", "retry_is_weekend"]
+CAT_COLS = ["error_categoria", "detalle_fail", "retry_hora_bucket"]
+FEATURE_COLS = NUM_COLS + CAT_COLS
+
+# Nombres aceptados para cada columna de un reintento pendiente
+COLUMNAS_PENDIENTES = {
+    "fecha_fail": ["fecha_fail", "fecha"],
+    "fecha_second": ["fecha_second", "fecha_reintento"],
+    "monto": ["monto"],
+    "http_fail": ["http_fail", "http_status_code", "status_code"],
+    "detalle_fail": ["detalle_fail", "detalle", "descripcion_error"],
+}
+
+# Modelo del proceso (se carga una vez por proceso en cargar_modelo)
+_modelo = None
+
+
+# ==============================
+# Lectura por bloques
+# ==============================
+
+def iterar_bloques(path: str, chunk_filas: int = CHUNK_FILAS) -> Iterator[pd.DataFrame]:
+    """
+    Lee un CSV o Parquet por bloques de chunk_filas filas. Las columnas de un
+    CSV se leen como texto: el tipo no depende de lo que haya en cada bloque
+    (features_pendientes convierte las que usa el modelo).
+    """
+    if evaluacion._tiene_extension(path, evaluacion.FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_filas):
+            yield batch.to_pandas()
+    elif evaluacion._tiene_extension(path, evaluacion.FORMATOS_CSV):
+        yield from pd.read_csv(path, chunksize=chunk_filas, dtype=str)
+    else:
+        raise ValueError(f"Formato no soportado: {path} (use .csv o .parquet)")
+
+
+def esquema_salida(path: str):
+    """
+    Esquema Arrow del Parquet de salida, fijo desde antes del primer bloque:
+    las columnas de entrada (las del Parquet, o texto para un CSV) más
+    probabilidad_exito y reintentar. Inferirlo del primer bloque falla cuando
+    un bloque posterior trae otro tipo (ej. monto entero y luego con decimales,
+    o un detalle vacío y luego con texto).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if evaluacion._tiene_extension(path, evaluacion.FORMATOS_PARQUET):
+        entrada = list(pq.read_schema(path).remove_metadata())
+    else:
+        entrada = [pa.field(col, pa.string()) for col in pd.read_csv(path, nrows=0).columns]
+    return pa.schema(entrada + [
+        pa.field("probabilidad_exito", pa.float64()),
+        pa.field("reintentar", pa.bool_()),
+    ])
+
+
+# ==============================
+# Features
+# ==============================
+
+def features_pendientes(bloque: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Retorna (X, validas): X con FEATURE_COLS para las filas válidas del bloque
+    y la máscara de esas filas. Si el bloque ya trae las variables del modelo
+    no se derivan.
+    """
+    if all(col in bloque.columns for col in FEATURE_COLS):
+        X = bloque[FEATURE_COLS].copy()
+        for col in NUM_COLS:
+            X[col] = pd.to_numeric(X[col], errors="coerce")
+        validas = X.notna().all(axis=1).to_numpy()
+        X = X[validas]
+        for col in CAT_COLS:
+            X[col] = X[col].astype(str)
+        return X, validas
+
+    det = evaluacion.detectar_columna
+    col_detalle = det(bloque, COLUMNAS_PENDIENTES["detalle_fail"], requerido=False)
+    df = pd.DataFrame({
+        "fecha_fail": pd.to_datetime(bloque[det(bloque, COLUMNAS_PENDIENTES["fecha_fail"])], errors="coerce"),
+        "fecha_second": pd.to_datetime(bloque[det(bloque, COLUMNAS_PENDIENTES["fecha_second"])], errors="coerce"),
+        "monto": pd.to_numeric(bloque[det(bloque, COLUMNAS_PENDIENTES["monto"])], errors="coerce"),
+        "http_fail": pd.to_numeric(bloque[det(bloque, COLUMNAS_PENDIENTES["http_fail"])], errors="coerce"),
+    })
+    validas = df.notna().all(axis=1).to_numpy()
+    df = df[validas]
+
+    # mismo texto de detalle que en el entrenamiento (ver normalizar_intentos y construir_pares)
+    if col_detalle:
+        df["detalle_fail"] = evaluacion._detalle_como_texto(bloque[col_detalle][validas])
+    else:
+        df["detalle_fail"] = "SIN_DETALLE"
+
+    evaluacion.derivar_features_reintento(df)
+    return df[FEATURE_COLS], validas
+
+
+# ==============================
+# Modelo y puntuación
+# ==============================
+
+def cargar_modelo(path: str):
+    """Carga el modelo del proceso: Pipeline (.pkl) o modelo portable (.npz)."""
+    global _modelo
+
+    if path.lower().endswith(".npz"):
+        sys.path.insert(0, evaluacion.DIR_LAMBDA)
+        from portable_model import load_portable_model
+
+        _modelo = load_portable_model(path)
+    else:
+        import joblib
+
+        _modelo = joblib.load(path, mmap_mode="r")
+    return _modelo
+
+
+def predecir(X: pd.DataFrame) -> np.ndarray:
+    if hasattr(_modelo, "transform_columns"):
+        return _modelo.predict_proba_matrix(_modelo.transform_columns(X))
+    return _modelo.predict_proba(X)[:, 1]
+
+
+def puntuar_bloque(bloque: pd.DataFrame, umbral: float) -> pd.DataFrame:
+    """Agrega probabilidad_exito y reintentar (vacías en filas inválidas)."""
+    X, validas = features_pendientes(bloque)
+
+    proba = np.full(len(bloque), np.nan)
+    if len(X):
+        proba[validas] = predecir(X)
+
+    reintentar = pd.array(proba >= umbral, dtype="boolean")
+    reintentar[~validas] = pd.NA
+
+    bloque = bloque.reset_index(drop=True)
+    bloque["probabilidad_exito"] = proba
+    bloque["reintentar"] = reintentar
+    return bloque
+
+
+def resolver_umbral(umbral: Optional[float]) -> float:
+    """--umbral si se indicó; si no, el umbral óptimo guardado en el modelo."""
+    if umbral is not None:
+        return umbral
+    return float(getattr(_modelo, "umbral_optimo_", UMBRAL_POR_DEFECTO))
+
+
+# ==============================
+# Ejecución
+# ==============================
+
+def puntuar_archivo(path_entrada: str, path_salida: str, path_modelo: str, umbral: Optional[float] = None,
+                    chunk_filas: int = CHUNK_FILAS, procesos: int = 1) -> dict:
+    """
+    Puntúa path_entrada por bloques y escribe path_salida (Parquet). Con
+    procesos > 1 se mantienen como máximo 2 bloques por proceso en vuelo para
+    acotar la memoria.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    t0 = time.perf_counter()
+    cargar_modelo(path_modelo)
+    umbral = resolver_umbral(umbral)
+    t_modelo = time.perf_counter() - t0
+
+    stats = {"filas": 0, "invalidas": 0, "reintentar": 0, "bloques": 0, "umbral": umbral}
+    esquema = esquema_salida(path_entrada)
+    writer = None
+    path_tmp = path_salida + ".tmp"
+
+    def escribir(puntuado: pd.DataFrame) -> None:
+        nonlocal writer
+        tabla = pa.Table.from_pandas(puntuado, schema=esquema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path_tmp, esquema)
+        writer.write_table(tabla)
+        stats["filas"] += len(puntuado)
+        stats["invalidas"] += int(puntuado["probabilidad_exito"].isna().sum())
+        stats["reintentar"] += int(puntuado["reintentar"].sum())
+        stats["bloques"] += 1
+
+    t1 = time.perf_counter()
+    try:
+        bloques = iterar_bloques(path_entrada, chunk_filas)
+        if procesos <= 1:
+            for bloque in bloques:
+                escribir(puntuar_bloque(bloque, umbral))
+        else:
+            with ProcessPoolExecutor(procesos, initializer=cargar_modelo, initargs=(path_modelo,)) as pool:
+                en_vuelo = []
+                for bloque in bloques:
+                    en_vuelo.append(pool.submit(puntuar_bloque, bloque, umbral))
+                    if len(en_vuelo) >= 2 * procesos:
+                        escribir(en_vuelo.pop(0).result())
+                for futuro in en_vuelo:
+                    escribir(futuro.result())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError(f"{path_entrada} no tiene filas")
+    os.replace(path_tmp, path_salida)
+
+    segundos = time.perf_counter() - t1
+    stats.update({
+        "carga_modelo_s": round(t_modelo, 3),
+        "segundos": round(segundos, 3),
+        "filas_s": round(stats["filas"] / segundos, 1) if segundos > 0 else 0.0,
+    })
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="reintentos pendientes en .csv o .parquet")
+    parser.add_argument("--salida", default=None,
+                        help="Parquet de salida (por defecto <entrada>_puntuado.parquet)")
+    parser.add_argument("--modelo", default=MODELO_PATH,
+                        help=f"modelo .pkl o .npz (por defecto {MODELO_PATH})")
+    parser.add_argument("--umbral", type=float, default=None,
+                        help="umbral de decisión (por defecto el umbral óptimo guardado en el modelo)")
+    parser.add_argument("--chunk-filas", type=int, default=CHUNK_FILAS,
+                        help=f"filas por bloque (por defecto {CHUNK_FILAS})")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="procesos que puntúan bloques en paralelo (por defecto 1)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for path in (args.entrada, args.modelo):
+        if not os.path.isfile(path):
+            raise SystemExit(f"No existe {path}")
+
+    salida = args.salida or f"{os.path.splitext(args.entrada)[0]}_puntuado.parquet"
+    stats = puntuar_archivo(args.entrada, salida, args.modelo, args.umbral, args.chunk_filas, args.procesos)
+
+    print(f"Modelo cargado en {stats['carga_modelo_s']:.2f}s (umbral {stats['umbral']:.4f})")
+    print(f"Filas puntuadas: {stats['filas']} en {stats['bloques']} bloques "
+          f"({stats['invalidas']} inválidas, {stats['reintentar']} a reintentar)")
+    print(f"Tiempo: {stats['segundos']:.2f}s -> {stats['filas_s']:,.0f} filas/s")
+    print(f"Resultado guardado en {salida}")
+
+
+if __name__ == "__main__":
+    main()